@@ -9,21 +9,16 @@ from gui.windows import gearInformation, information
 from item.generator import Currency, Item, parse_item_info
 from utils import config
 from utils.common import get_response
-from utils.config import (
-    ADV_SEARCH,
-    BASE_SEARCH,
-    BASIC_SEARCH,
-    HIDEOUT,
-    OPEN_TRADE,
-    OPEN_WIKI,
-    SHOW_INFO,
-)
+from utils.history import start_history, stop_history
 from utils.input import (
     Keyboard,
     get_clipboard,
     start_stash_scroll,
     stop_stash_scroll,
 )
+from utils.journal import start_journal, stop_journal
+from utils.logger import start_logging, stop_logging
+from utils.ninja import start_refresh, stop_refresh
 from utils.parse import (
     adv_search,
     basic_search,
@@ -31,14 +26,44 @@ from utils.parse import (
     search_ninja_base,
 )
 from utils.web import (
-    find_latest_update,
+    clear_league_caches,
+    get_item_modifiers,
     get_leagues,
     open_exchange_site,
     open_trade_site,
+    start_update_check,
     wiki_lookup,
-    get_item_modifiers,
 )
 
+HOTKEY_SETTINGS = {
+    "BASIC_SEARCH",
+    "ADV_SEARCH",
+    "BASE_SEARCH",
+    "OPEN_WIKI",
+    "OPEN_TRADE",
+    "SHOW_INFO",
+    "HIDEOUT",
+}
+
+GUI_SETTINGS = {
+    "USE_GUI",
+    "TIMEOUT_GUI",
+    "GUI_BG1",
+    "GUI_BG2",
+    "GUI_FONT",
+    "GUI_FONT_SIZE",
+    "GUI_FONT_COLOR",
+    "GUI_HEADER_COLOR",
+}
+
+# Settings that are only used at startup
+RESTART_SETTINGS = {
+    "STASHTAB_SCROLLING",
+    "LOG_FILE",
+    "JOURNAL_FILE",
+    "HISTORY_FILE",
+}
+
 
 def hotkey_handler(keyboard, hotkey):
     """Based on the given hotkey, setup the logic for the triggered key
@@ -101,36 +126,38 @@ def watch_keyboard(keyboard):
     """
 
     # Use the "f5" key to go to hideout
-    keyboard.add_hotkey(HIDEOUT, lambda: keyboard.write("\n/hideout\n"))
+    keyboard.add_hotkey(
+        config.HIDEOUT, lambda: keyboard.write("\n/hideout\n")
+    )
 
     # Basic search
     keyboard.add_hotkey(
-        BASIC_SEARCH, lambda: hotkey_handler(keyboard, "Basic")
+        config.BASIC_SEARCH, lambda: hotkey_handler(keyboard, "Basic")
     )
 
     # Open item in the Path of Exile Wiki
     keyboard.add_hotkey(
-        OPEN_WIKI, lambda: hotkey_handler(keyboard, "Wiki")
+        config.OPEN_WIKI, lambda: hotkey_handler(keyboard, "Wiki")
     )
 
     # Open item search in pathofexile.com/trade
     keyboard.add_hotkey(
-        OPEN_TRADE, lambda: hotkey_handler(keyboard, "Trade")
+        config.OPEN_TRADE, lambda: hotkey_handler(keyboard, "Trade")
     )
 
     # poe.ninja base check
     keyboard.add_hotkey(
-        BASE_SEARCH, lambda: hotkey_handler(keyboard, "Base")
+        config.BASE_SEARCH, lambda: hotkey_handler(keyboard, "Base")
     )
 
     # Show item info
     keyboard.add_hotkey(
-        SHOW_INFO, lambda: hotkey_handler(keyboard, "Info")
+        config.SHOW_INFO, lambda: hotkey_handler(keyboard, "Info")
     )
 
     # Adv Search
     keyboard.add_hotkey(
-        ADV_SEARCH, lambda: hotkey_handler(keyboard, "Adv")
+        config.ADV_SEARCH, lambda: hotkey_handler(keyboard, "Adv")
     )
 
 
@@ -171,24 +198,91 @@ def check_league():
     return True
 
 
+def load_league_data():
+    ninja_bases = get_ninja_bases(config.LEAGUE)
+    if ninja_bases:
+        logging.info(f"[*] Loaded {len(ninja_bases)} bases and their prices.")
+    # Currency rates and other prices are loaded in the background
+    start_refresh(config.LEAGUE)
+
+
+def print_hotkeys():
+    logging.info(
+        f"[{(config.BASIC_SEARCH)}]:".rjust(15) + " For simple search.\n" +
+        f"[{(config.ADV_SEARCH)}]:".rjust(15) + " For advanced search.\n" +
+        f"[{(config.BASE_SEARCH)}]:".rjust(15) + " For item base price\n" +
+        f"[{(config.OPEN_WIKI)}]:".rjust(15) + " To open the item on wiki.\n" +
+        f"[{(config.OPEN_TRADE)}]:".rjust(15) + " To open the item on trade site.\n" +
+        f"[{(config.SHOW_INFO)}]:".rjust(15) + " To see item stats (Does not work with all items).\n" +
+        f"[{(config.HIDEOUT)}]:".rjust(15) + " To go to hideout.\n" +
+        "[*] Hotkeys can be changed in settings.cfg\n" +
+        "[*] Watching hotkeys (Ctrl+C to stop) ..."
+    )
+
+
+def apply_settings(keyboard, changed, league):
+    """Apply settings that were changed in settings.cfg while running.
+
+    Only what changed is reloaded, stats and items are league independent
+    and are kept.
+
+    :param keyboard: Keyboard object the hotkeys are registered with
+    :param changed: Names of the changed settings
+    :param league: The league that was in use before the change
+    """
+    logging.info("[*] Reloaded settings.cfg")
+
+    if changed & HOTKEY_SETTINGS:
+        keyboard.clear_hotkeys()
+        watch_keyboard(keyboard)
+        print_hotkeys()
+
+    if "LEAGUE" in changed:
+        if not check_league():
+            config.LEAGUE = league
+            logging.info(
+                f"[!] Staying in the {Fore.MAGENTA}{league}{Fore.RESET} league"
+            )
+        elif config.LEAGUE != league:
+            clear_league_caches()
+            load_league_data()
+
+    if "NINJA_REFRESH_INTERVAL" in changed:
+        start_refresh(config.LEAGUE)
+
+    if changed & GUI_SETTINGS:
+        # Windows are styled when they are created, so closing the open
+        # ones is all it takes to restyle them.
+        close_all_windows()
+        if "USE_GUI" in changed and config.USE_GUI:
+            init_gui()
+
+    for name in changed & RESTART_SETTINGS:
+        logging.info(f"[!] Restart to apply the new {name} setting")
+
+
 if __name__ == "__main__":
     loglevel = logging.INFO
     if len(sys.argv) > 1 and sys.argv[1] in ("-d", "--debug"):
         loglevel = logging.DEBUG
-    logging.basicConfig(format="%(message)s", level=loglevel)
-
-    find_latest_update()
 
     init(autoreset=True)  # Colorama
 
+    config.update_settings_file()
+
+    # Console and file output is written by a background thread so that
+    # slow terminals do not hold up the lookups.
+    start_logging(loglevel, config.LOG_FILE)
+    start_journal(config.JOURNAL_FILE)
+    start_history(config.HISTORY_FILE)
+
+    # Look for a new release while we load everything else
+    update_check = start_update_check()
+
     # Get some basic setup stuff
     valid_league = check_league()
     if valid_league:
-        NINJA_BASES = get_ninja_bases(config.LEAGUE)
-        if NINJA_BASES:
-            logging.info(
-                f"[*] Loaded {len(NINJA_BASES)} bases and their prices."
-            )
+        load_league_data()
 
         get_item_modifiers()
 
@@ -199,29 +293,35 @@ if __name__ == "__main__":
 
         init_gui()
 
-        logging.info(
-            f"[{(BASIC_SEARCH)}]:".rjust(15) + " For simple search.\n" +
-            f"[{(ADV_SEARCH)}]:".rjust(15) + " For advanced search.\n" +
-            f"[{(BASE_SEARCH)}]:".rjust(15) + " For item base price\n" +
-            f"[{(OPEN_WIKI)}]:".rjust(15) + " To open the item on wiki.\n" +
-            f"[{(OPEN_TRADE)}]:".rjust(15) + " To open the item on trade site.\n" +
-            f"[{(SHOW_INFO)}]:".rjust(15) + " To see item stats (Does not work with all items).\n" +
-            f"[{(HIDEOUT)}]:".rjust(15) + " To go to hideout.\n" +
-            "[*] Hotkeys can be changed in settings.cfg\n" +
-            "[*] Watching hotkeys (Ctrl+C to stop) ..."
-        )
+        print_hotkeys()
+
+        # Only bother the user about updates once the hotkeys are armed
+        update_check.armed.set()
+
+        watcher = config.SettingsWatcher()
 
         try:
-            while True:
+            while not update_check.installed.is_set():
                 keyboard.poll()
                 check_timeout_gui()
+
+                league = config.LEAGUE
+                changed = watcher.poll()
+                if changed:
+                    apply_settings(keyboard, changed, league)
+
                 time.sleep(0.2)
         except KeyboardInterrupt:
             pass
 
+        stop_refresh()
         stop_stash_scroll()
         close_all_windows()
         logging.info(f"[!] Exiting, user requested termination.")
 
+    stop_history()
+    stop_journal()
+    stop_logging()
+
     # Apparently things go bad if we don't call this, so here it is!
     deinit()  # Colorama
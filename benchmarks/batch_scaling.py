@@ -0,0 +1,65 @@
+"""Measure how parsing many items scales over worker processes.
+
+Usage: python -m benchmarks.batch_scaling [-n 2000] [--workers 1 2 4 8]
+
+Parses n distinct item texts (the sample items, with the numbers in
+every repeat raised by one) with parse_items for each number of
+workers, pool startup included.
+"""
+import argparse
+import logging
+import os
+import re
+import time
+
+from benchmarks.mocks import offline_session
+from item.batch import parse_items
+from tests.sampleItems import items
+
+NUMBER = re.compile(r"\d+")
+
+
+def get_texts(n: int) -> list:
+    """n item texts, none the same as another"""
+    texts = []
+    for i in range(n):
+        repeat = i // len(items)
+        texts.append(
+            NUMBER.sub(
+                lambda m: str(int(m[0]) + repeat), items[i % len(items)]
+            )
+        )
+    return texts
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("-n", type=int, default=2000)
+    parser.add_argument(
+        "--workers", type=int, nargs="+", default=[1, 2, 4, 8]
+    )
+    args = parser.parse_args()
+
+    logging.disable(logging.INFO)
+    texts = get_texts(args.n)
+
+    print(f"items: {args.n}, cpus: {os.cpu_count()}")
+    with offline_session():
+        parse_items(items, 1)  # Load the mods and bases
+
+        baseline = None
+        for workers in args.workers:
+            start = time.perf_counter()
+            results = parse_items(texts, workers)
+            elapsed = time.perf_counter() - start
+
+            errors = sum(1 for _, error in results if error)
+            baseline = baseline or elapsed
+            print(
+                f"{workers:>2} workers: {args.n / elapsed:8.0f} items/s"
+                f"  speedup {baseline / elapsed:4.2f}x  errors {errors}"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+"""Measure the cost of reading the listing times of trade results.
+
+Usage: python -m benchmarks.listing_times
+
+Times the old strptime based conversion against utils.pricing's fixed
+format parser over 1,000 synthetic listings from the last week, and the
+price statistics that read them.
+"""
+import random
+import time
+from datetime import datetime, timezone
+from timeit import repeat
+
+from utils.pricing import get_price_stats, parse_timestamp
+
+LISTINGS = 1000
+REPEAT = 5
+
+
+def make_listings(n):
+    """Fetch results of n sellers, listed at random times this week"""
+    now = time.time()
+    rng = random.Random(0)
+    return [
+        {
+            "listing": {
+                "account": {"name": "account%d" % x},
+                "price": {"amount": rng.randint(1, 50), "currency": "chaos"},
+                "indexed": time.strftime(
+                    "%Y-%m-%dT%H:%M:%SZ",
+                    time.gmtime(now - rng.randint(0, 7 * 24 * 60 * 60)),
+                ),
+            }
+        }
+        for x in range(n)
+    ]
+
+
+def with_strptime(trade_info):
+    return [
+        datetime.strptime(trade["listing"]["indexed"], "%Y-%m-%dT%H:%M:%SZ")
+        .replace(tzinfo=timezone.utc)
+        .timestamp()
+        for trade in trade_info
+    ]
+
+
+def with_parser(trade_info):
+    return [
+        parse_timestamp(trade["listing"]["indexed"]) for trade in trade_info
+    ]
+
+
+def report(name, func, trade_info):
+    best = min(repeat(lambda: func(trade_info), number=1, repeat=REPEAT))
+    print(f"{name:10} {best * 1e6 / len(trade_info):8.2f} us/listing")
+
+
+def main():
+    trade_info = make_listings(LISTINGS)
+    assert with_strptime(trade_info) == with_parser(trade_info)
+
+    print(f"listings:  {LISTINGS}")
+    report("strptime", with_strptime, trade_info)
+    report("parser", with_parser, trade_info)
+    report("stats", get_price_stats, trade_info)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+"""Compare lookup latency with console logging on and off.
+
+Usage: python -m benchmarks.logging_latency [-n 200] [--console-delay 0.5]
+
+Console output goes to stderr, redirect it (2>/dev/null) to only see the
+report. --console-delay adds a sleep (in ms) to every console write to
+simulate a slow Windows console.
+"""
+import argparse
+import logging
+import sys
+import time
+
+from benchmarks.mocks import offline_session
+from gui.gui import close_all_windows, init_gui
+from tests.sampleItems import items
+from utils.logger import start_logging, stop_logging
+from utils.parse import basic_search
+
+
+class SlowStream:
+    def __init__(self, stream, delay):
+        self.stream = stream
+        self.delay = delay
+
+    def write(self, data):
+        time.sleep(self.delay)
+        return self.stream.write(data)
+
+    def flush(self):
+        self.stream.flush()
+
+
+def reset_root():
+    root = logging.getLogger()
+    for handler in root.handlers[:]:
+        root.removeHandler(handler)
+    root.setLevel(logging.INFO)
+    return root
+
+
+def run(n):
+    start = time.perf_counter()
+    for _ in range(n):
+        basic_search(items[0])
+        close_all_windows()
+    return (time.perf_counter() - start) / n * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("-n", type=int, default=200)
+    parser.add_argument("--console-delay", type=float, default=0.0)
+    args = parser.parse_args()
+
+    if args.console_delay:
+        sys.stderr = SlowStream(sys.stderr, args.console_delay / 1000)
+
+    with offline_session():
+        init_gui()
+        basic_search(items[0])  # Warm up the mod and item caches
+
+        reset_root().addHandler(logging.NullHandler())
+        off = run(args.n)
+
+        reset_root().addHandler(logging.StreamHandler())
+        direct = run(args.n)
+
+        reset_root()
+        start_logging(logging.INFO)
+        queued = run(args.n)
+        stop_logging()
+
+    print(f"lookups per mode: {args.n}")
+    print(f"console off:       {off:8.3f} ms/lookup")
+    print(f"console (direct):  {direct:8.3f} ms/lookup")
+    print(f"console (queued):  {queued:8.3f} ms/lookup")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+import json
+from contextlib import ExitStack
+from datetime import datetime, timezone
+from unittest.mock import patch
+
+import requests_mock
+
+from tests.mocks import (
+    ButtonMock,
+    FrameMock,
+    LabelMock,
+    TkMock,
+    ToplevelMock,
+    makeFetchURL,
+    mock_get_monitors,
+    mockResponse,
+)
+from utils import config
+
+LOOKUP_URL = "https://www.pathofexile.com/api/trade/search/Standard"
+STATS_URL = "https://www.pathofexile.com/api/trade/data/stats"
+ITEMS_URL = "https://www.pathofexile.com/api/trade/data/items"
+
+
+def mock_listings(n, amount=1, currency="chaos"):
+    """Fetch response with n listings from different accounts"""
+    indexed = datetime.strftime(
+        datetime.now(timezone.utc), "%Y-%m-%dT%H:%M:%SZ"
+    )
+    return {
+        "result": [
+            {
+                "id": "result%d" % x,
+                "listing": {
+                    "account": {"name": "account%d" % x},
+                    "price": {
+                        "type": "~",
+                        "amount": amount + x,
+                        "currency": currency,
+                    },
+                    "indexed": indexed,
+                },
+            }
+            for x in range(n)
+        ]
+    }
+
+
+def offline_session(results=10):
+    """Patch out the GUI and every web request a lookup makes.
+
+    :param results: Number of results every trade search returns
+    :return: ExitStack that undoes the patches when closed
+    """
+    stack = ExitStack()
+    for target, mock in (
+        ("tkinter.Tk", TkMock),
+        ("tkinter.Toplevel", ToplevelMock),
+        ("tkinter.Frame", FrameMock),
+        ("tkinter.Label", LabelMock),
+        ("tkinter.Button", ButtonMock),
+        ("screeninfo.get_monitors", mock_get_monitors),
+    ):
+        stack.enter_context(patch(target, mock))
+
+    mock = stack.enter_context(requests_mock.Mocker())
+    with open("tests/mockModifiers.txt") as f:
+        mock.get(STATS_URL, json=json.load(f))
+    with open("tests/mockItems.txt") as f:
+        mock.get(ITEMS_URL, json=json.load(f))
+    response = mockResponse(results)
+    mock.post(LOOKUP_URL, json=response)
+    mock.get(makeFetchURL(response), json=mock_listings(min(results, 10)))
+
+    config.LEAGUE = "Standard"
+    return stack
@@ -0,0 +1,43 @@
+"""Measure how much memory the loaded mod database takes.
+
+Usage: python -m benchmarks.mod_memory
+
+Loads the mods from the mocked stats API and builds every lookup dict,
+then reports the memory traced by tracemalloc. The stats API response is
+freed once loading is done, so what is left is held by the mods and
+their indexes.
+"""
+import gc
+import logging
+import tracemalloc
+
+from benchmarks.mocks import offline_session
+from item.modDatabase import get_mod_database
+from utils import web
+
+
+def main():
+    logging.disable(logging.INFO)
+
+    with offline_session():
+        gc.collect()
+        tracemalloc.start()
+
+        web.get_item_modifiers()
+        web.get_item_modifiers_by_text(None)
+        web.get_item_modifiers_by_id(None)
+        get_mod_database()
+
+        gc.collect()
+        held, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+    mods = len(web.mod_list)
+    print(f"mods:    {mods}")
+    print(f"held:    {held / 1024:8.1f} KiB")
+    print(f"peak:    {peak / 1024:8.1f} KiB")
+    print(f"per mod: {held / mods:8.0f} bytes")
+
+
+if __name__ == "__main__":
+    main()
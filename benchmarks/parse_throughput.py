@@ -0,0 +1,59 @@
+"""Measure how many items per second we can parse.
+
+Usage: python -m benchmarks.parse_throughput [-n 200]
+
+Parses every sample item n times, once only lexing all of its lines
+into tokens, once building the full item (mod lookups included) and once
+through the parsed item cache, like repeated hotkeys on one item.
+"""
+import argparse
+import logging
+import time
+
+from benchmarks.mocks import offline_session
+from item.generator import build_item, parse_item_info
+from item.lexer import lex
+from tests.sampleItems import items
+
+
+def lex_all(text):
+    return [region.tokens() for region in lex(text)]
+
+
+def run(func, n):
+    """Call func on every sample item n times
+
+    :return: items per second
+    """
+    start = time.perf_counter()
+    for _ in range(n):
+        for text in items:
+            func(text)
+    return n * len(items) / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("-n", type=int, default=200)
+    args = parser.parse_args()
+
+    # "Unable to find mod" and friends are not what we are measuring
+    logging.disable(logging.INFO)
+
+    with offline_session():
+        # Warm up the mod and item caches
+        for text in items:
+            parse_item_info(text)
+
+        lexed = run(lex_all, args.n)
+        parsed = run(build_item, args.n)
+        cached = run(parse_item_info, args.n)
+
+    print(f"items per run: {args.n * len(items)}")
+    print(f"lex:   {lexed:10.0f} items/s")
+    print(f"parse: {parsed:10.0f} items/s")
+    print(f"cache: {cached:10.0f} items/s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+"""Measure how long importing Accounting.py takes.
+
+Usage: python -m benchmarks.startup_importtime [--top 15] [--budget 500]
+
+Runs "python -X importtime -c 'import Accounting'" in a fresh interpreter
+and reports the slowest imports. Exits with 1 if the import chain takes
+longer than --budget milliseconds, or if a module that should only be
+loaded on first use was imported.
+
+-X importtime needs Python 3.7 or newer to run it, the app itself runs
+on 3.6.
+"""
+import argparse
+import os
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Only needed once we actually show a window, download an update, look
+# at a currency item or scroll stash tabs.
+LAZY_MODULES = (
+    "tkinter",
+    "screeninfo",
+    "tqdm",
+    "utils.currency",
+    "utils.stashScroll",
+)
+
+
+def importtime(module="Accounting"):
+    """Import the module in a fresh interpreter.
+
+    :return: list of (self us, cumulative us, module name)
+    """
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=ROOT,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+        universal_newlines=True,
+    )
+    if result.returncode != 0:
+        raise RuntimeError(result.stderr)
+
+    times = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "[us]" in line:
+            continue
+        self_us, cumulative, name = line[len("import time:") :].split("|")
+        times.append((int(self_us), int(cumulative), name.strip()))
+    return times
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--top", type=int, default=15)
+    parser.add_argument("--budget", type=float, default=None)
+    parser.add_argument("--runs", type=int, default=5)
+    args = parser.parse_args()
+
+    runs = [importtime() for _ in range(args.runs)]
+    totals = sorted(
+        next(c for _, c, name in times if name == "Accounting") / 1000
+        for times in runs
+    )
+    # Best run has the least noise
+    best = min(runs, key=lambda t: t[-1][1])
+
+    median = totals[len(totals) // 2]
+    print(f"Accounting import: {totals[0]:.1f} ms (median {median:.1f} ms)")
+    print(f"\n{'cumulative ms':>14}{'self ms':>10}  module")
+    for self_us, cumulative, name in sorted(best, key=lambda t: -t[1])[
+        : args.top
+    ]:
+        print(f"{cumulative / 1000:>14.1f}{self_us / 1000:>10.1f}  {name}")
+
+    imported = {name.strip() for _, _, name in best}
+    eager = [m for m in LAZY_MODULES if m in imported]
+    if eager:
+        print(f"\n[!] Imported at startup: {', '.join(eager)}")
+
+    if eager or (args.budget and totals[0] > args.budget):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
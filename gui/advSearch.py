@@ -1,17 +1,11 @@
-import tkinter
 import time
+import traceback
+
 from gui.gui import ActiveWindow, close_all_windows, close_display_windows
 from item.generator import Currency, Item, ModInfo
-from utils.common import get_response, price_item
 from utils import config
-from utils.config import (
-    GUI_BG1,
-    GUI_BG2,
-    GUI_FONT,
-    GUI_FONT_COLOR,
-    GUI_FONT_SIZE,
-    MIN_RESULTS,
-)
+from utils.common import get_response, price_item
+from utils.config import MIN_RESULTS
 from utils.web import open_exchange_site, open_trade_site
 
 
@@ -74,8 +68,9 @@ class AdvancedSearch(ActiveWindow):
         """
         Add all of the components necessary for the GUI to display information.
         """
+        import tkinter
 
-        masterFrame = tkinter.Frame(self.frame, bg=GUI_BG1)
+        masterFrame = tkinter.Frame(self.frame, bg=config.GUI_BG1)
         masterFrame.place(relwidth=1, relheight=1)
 
         self.create_label_header("Advanced Search", 0, 0, "WE", 6)
@@ -90,19 +85,19 @@ class AdvancedSearch(ActiveWindow):
                 self.searchable_mods.append(mod)
                 self.selected[mod.mod.id] = tkinter.IntVar()
                 # CheckButton
-                bgColor = GUI_BG2 if j % 2 else GUI_BG1
+                bgColor = config.GUI_BG2 if j % 2 else config.GUI_BG1
                 cb = tkinter.Checkbutton(
                     self.frame,
                     text=mod.mod.text,
                     variable=self.selected[mod.mod.id],
                     bg=bgColor,
-                    fg=GUI_FONT_COLOR,
+                    fg=config.GUI_FONT_COLOR,
                     activebackground=bgColor,
-                    activeforeground=GUI_FONT_COLOR,
+                    activeforeground=config.GUI_FONT_COLOR,
                 )
                 #cb.select()
                 cb.grid(row=j + 2, sticky="W", columnspan=3)
-                cb.config(font=(GUI_FONT, GUI_FONT_SIZE))
+                cb.config(font=(config.GUI_FONT, config.GUI_FONT_SIZE))
 
                 # Entry
                 if mod.min or mod.max:  # If mod has values
@@ -114,7 +109,7 @@ class AdvancedSearch(ActiveWindow):
                     e = tkinter.Entry(
                         self.frame,
                         bg=bgColor,
-                        fg=GUI_FONT_COLOR,
+                        fg=config.GUI_FONT_COLOR,
                         width=5,
                         textvariable=val,
                         exportselection=0,
@@ -128,7 +123,7 @@ class AdvancedSearch(ActiveWindow):
                     e2 = tkinter.Entry(
                         self.frame,
                         bg=bgColor,
-                        fg=GUI_FONT_COLOR,
+                        fg=config.GUI_FONT_COLOR,
                         width=5,
                         textvariable=val2,
                         exportselection=0,
@@ -143,19 +138,19 @@ class AdvancedSearch(ActiveWindow):
             self.selected[mod.mod.id] = tkinter.IntVar()
 
             # CheckButton
-            bgColor = GUI_BG2 if j % 2 else GUI_BG1
+            bgColor = config.GUI_BG2 if j % 2 else config.GUI_BG1
             cb = tkinter.Checkbutton(
                 self.frame,
                 text=mod.mod.text,
                 variable=self.selected[mod.mod.id],
                 bg=bgColor,
-                fg=GUI_FONT_COLOR,
+                fg=config.GUI_FONT_COLOR,
                 activebackground=bgColor,
-                activeforeground=GUI_FONT_COLOR,
+                activeforeground=config.GUI_FONT_COLOR,
             )
             cb.select()
             cb.grid(row=j + 2, sticky="W", columnspan=3)
-            cb.config(font=(GUI_FONT, GUI_FONT_SIZE))
+            cb.config(font=(config.GUI_FONT, config.GUI_FONT_SIZE))
 
             # Entry
             if mod.min or mod.max:  # If mod has values
@@ -167,7 +162,7 @@ class AdvancedSearch(ActiveWindow):
                 e = tkinter.Entry(
                     self.frame,
                     bg=bgColor,
-                    fg=GUI_FONT_COLOR,
+                    fg=config.GUI_FONT_COLOR,
                     width=5,
                     textvariable=val,
                     exportselection=0,
@@ -181,7 +176,7 @@ class AdvancedSearch(ActiveWindow):
                 e2 = tkinter.Entry(
                     self.frame,
                     bg=bgColor,
-                    fg=GUI_FONT_COLOR,
+                    fg=config.GUI_FONT_COLOR,
                     width=5,
                     textvariable=val2,
                     exportselection=0,
@@ -195,29 +190,29 @@ class AdvancedSearch(ActiveWindow):
             self.frame,
             text="Search",
             command=self.search,
-            bg=GUI_BG1,
-            fg=GUI_FONT_COLOR,
+            bg=config.GUI_BG1,
+            fg=config.GUI_FONT_COLOR,
         )
         s.grid(column=0, row=j + 2, columnspan=2, sticky="WE")
-        s.config(font=(GUI_FONT, GUI_FONT_SIZE))
+        s.config(font=(config.GUI_FONT, config.GUI_FONT_SIZE))
         s = tkinter.Button(
             self.frame,
             text="Open on Trade",
             command=self.open_trade,
-            bg=GUI_BG1,
-            fg=GUI_FONT_COLOR,
+            bg=config.GUI_BG1,
+            fg=config.GUI_FONT_COLOR,
         )
         s.grid(column=2, row=j + 2, columnspan=2, sticky="WE")
-        s.config(font=(GUI_FONT, GUI_FONT_SIZE))
+        s.config(font=(config.GUI_FONT, config.GUI_FONT_SIZE))
         s = tkinter.Button(
             self.frame,
             text="Close",
             command=self.close,
-            bg=GUI_BG1,
-            fg=GUI_FONT_COLOR,
+            bg=config.GUI_BG1,
+            fg=config.GUI_FONT_COLOR,
         )
         s.grid(column=4, row=j + 2, columnspan=2, sticky="WE")
-        s.config(font=(GUI_FONT, GUI_FONT_SIZE))
+        s.config(font=(config.GUI_FONT, config.GUI_FONT_SIZE))
 
 
 advancedSearch = AdvancedSearch()
@@ -1,4 +1,5 @@
-from datetime import datetime, timezone
+import time
+from datetime import timedelta
 from math import floor
 
 import timeago
@@ -9,6 +10,7 @@ from gui.gui import DisplayWindow
 from item.generator import Item
 from utils import config
 from utils.config import MIN_RESULTS
+from utils.ninja import format_price
 
 
 class BaseResults(DisplayWindow):
@@ -58,6 +60,50 @@ class BaseResults(DisplayWindow):
         self.currency = None
 
 
+class NinjaPrice(DisplayWindow):
+    """DisplayWindow for prices taken from poe.ninja instead of /trade."""
+
+    def __init__(self):
+        super().__init__()
+        self.name = None
+        self.details = ()
+        self.price = None
+        self.updated = None
+
+    def add_ninja_price(self, name, price, updated, details=()):
+        """
+        :param name: Name of the item
+        :param price: Chaos value of the item
+        :param updated: time.time() of when poe.ninja was asked
+        :param details: Lines telling which version of the item was priced
+        """
+        self.name = name
+        self.details = details
+        self.price = price
+        self.updated = updated
+
+    def add_components(self):
+        self.create_label_header(self.name, 0, 0, "WE")
+
+        row = 1
+        for line in self.details:
+            self.create_label_header(line, 0, row, "WE")
+            row += 1
+
+        self.create_label_BG1(
+            "Price: %s" % format_price(self.price), 0, row, "WE"
+        )
+        age = timedelta(seconds=time.time() - self.updated)
+        self.create_label_BG2(
+            "poe.ninja, %s" % timeago.format(age), 0, row + 1, "WE"
+        )
+
+        self.name = None
+        self.details = ()
+        self.price = None
+        self.updated = None
+
+
 class NotEnoughInformation(DisplayWindow):
     """Window to display when we determine there is not enough information to accurately price"""
 
@@ -162,23 +208,22 @@ class PriceInformation(DisplayWindow):
 
         counter = 0
         count = 0
-        # dict{price: [count , time]}
+        # dict{price: [count, time listed in seconds since the epoch]}
+        now = time.time()
         for price, values in self.data.items():
-            date = datetime.now().replace(tzinfo=timezone.utc)
-            now = values[1]
-            time = timeago.format(now, date)
+            listed = timeago.format(timedelta(seconds=now - values[1]))
             count += values[0]
             if counter % 2:
                 self.create_label_BG1("", 0, counter + 2, "WE", 3)
                 self.create_label_BG1(price + "  ", 0, counter + 2, "E")
                 self.create_label_BG1(
-                    time + " (" + str(values[0]) + ")", 1, counter + 2, "E", 2
+                    listed + " (" + str(values[0]) + ")", 1, counter + 2, "E", 2
                 )
             else:
                 self.create_label_BG2("", 0, counter + 2, "WE", 3)
                 self.create_label_BG2(price + "  ", 0, counter + 2, "E")
                 self.create_label_BG2(
-                    time + " (" + str(values[0]) + ")", 1, counter + 2, "E", 2
+                    listed + " (" + str(values[0]) + ")", 1, counter + 2, "E", 2
                 )
             counter += 1
 
@@ -206,6 +251,7 @@ class PriceInformation(DisplayWindow):
 
 priceInformation = PriceInformation()
 notEnoughInformation = NotEnoughInformation()
+ninjaPrice = NinjaPrice()
 baseResults = BaseResults()
 information = Information()
 gearInformation = GearInformation()
@@ -0,0 +1,57 @@
+import logging
+import os
+from multiprocessing import Pool
+
+from item.generator import build_item
+from utils import web
+
+
+def init_worker(snapshot: dict):
+    """Seed a worker process with the mod and item caches"""
+    web.load_index_snapshot(snapshot)
+    # Failures are returned with the results, thousands of
+    # "Unable to find mod" lines from several processes are just noise.
+    logging.disable(logging.INFO)
+
+
+def parse_text(text: str):
+    """Parse a single item, catching whatever goes wrong
+
+    The items are parsed once each, so this skips the cache and copying
+    of parse_item_info.
+
+    :return: tuple of the item (or None) and the error (or None)
+    """
+    try:
+        return build_item(text), None
+    except Exception as e:
+        return None, e
+
+
+def parse_items(texts: list, workers: int = None) -> list:
+    """Parse many items at once, like a saved stash tab or a paste of
+    several items, across a pool of processes.
+
+    The mods and item bases are loaded once here and handed to the
+    workers, so they never go online themselves.
+
+    :param texts: Item texts, as copied from the game
+    :param workers: Number of processes, defaults to the number of CPUs.
+        With 1 the items are parsed in this process.
+    :return: list of (item, error) tuples in the order of texts. item is
+        None if the text is not an item or it failed to parse, error is
+        the exception raised while parsing, if any.
+    """
+    texts = list(texts)
+    workers = workers or os.cpu_count() or 1
+    if workers == 1 or len(texts) < 2:
+        return [parse_text(text) for text in texts]
+
+    snapshot = web.get_index_snapshot()
+    # Send the texts in a few large chunks per worker, one item per
+    # message is mostly pickling overhead.
+    chunksize = max(1, len(texts) // (workers * 4))
+    # multiprocessing.Pool, ProcessPoolExecutor takes an initializer
+    # only since Python 3.7
+    with Pool(workers, init_worker, (snapshot,)) as pool:
+        return pool.map(parse_text, texts, chunksize)
@@ -1,17 +1,38 @@
+import copy
+import hashlib
 import logging
-import re
+from collections import OrderedDict
 from math import floor
+from threading import Lock
 
 from colorama import Fore
 
+from item import pseudo
 from item.itemModifier import ItemModifierType
-from utils.currency import currency_global
+from item.lexer import TokenType, lex
+from item.modDatabase import (
+    NO_MOD,
+    ModFlag,
+    get_mod_database,
+    get_mod_flags,
+    get_mod_number,
+)
+from item.query import (
+    EXCHANGE,
+    MISC_FILTERS,
+    NAME_SEARCH,
+    QUERY,
+    SOCKET_FILTERS,
+    STAT_FILTERS,
+    TYPE_FILTERS,
+    QueryBuilder,
+)
+from utils import journal, ninja
 from utils.web import (
     get_base,
     get_item_modifiers_by_id,
     get_item_modifiers_by_text,
     get_ninja_bases,
-    is_duplicate_mod_type,
 )
 
 
@@ -20,12 +41,39 @@ def round_mod(number):
 
 
 class ModInfo:
-    def __init__(self, mod, m_min, m_max, option, can_reduce=True):
+    __slots__ = (
+        "mod",
+        "min",
+        "max",
+        "option",
+        "can_reduce",
+        "_number",
+        "_flags",
+    )
+
+    def __init__(self, mod, m_min, m_max, option, can_reduce=True, flags=None):
         self.mod = mod
         self.min = m_min
         self.max = m_max
         self.option = option
         self.can_reduce = can_reduce
+        self._number = None
+        # Overrides the flags of the mod database, see item.pseudo
+        self._flags = flags
+
+    @property
+    def number(self) -> int:
+        """Number of the mod in the mod database, see item.modDatabase"""
+        if self._number is None:
+            self._number = get_mod_number(self.mod)
+        return self._number
+
+    @property
+    def flags(self) -> int:
+        """ModFlag bits of the mod, see item.modDatabase"""
+        if self._flags is not None:
+            return self._flags
+        return get_mod_flags(self.number)
 
 
 class BaseItem:
@@ -41,30 +89,30 @@ class BaseItem:
         self.online = "any"
 
     def print(self):
-        print("[!] Found: ", self.name)
+        logging.info("[!] Found: %s", self.name)
+
+    def get_query(self) -> QueryBuilder:
+        """Base trade query for all items"""
+        query = QueryBuilder()
+        query.set(QUERY + ("status", "option"), self.online)
+        return query
 
     def get_json(self):
-        """Base JSON for all items"""
-        json = {
-            "query": {
-                "status": {"option": self.online},
-                "filters": {
-                    "misc_filters": {"filters": {}},
-                    "type_filters": {"filters": {}},
-                    "socket_filters": {
-                        "filters": {"sockets": {}, "links": {}},
-                    },
-                },
-                "stats": [{"type": "and", "filters": []}],
-            },
-            "sort": {"price": "asc"},
-        }
-        return json
+        """The trade query of the item, see get_query"""
+        return self.get_query().build()
 
-    def add_mods(self, json, modifiers):
+    def get_ninja_price(self):
+        """Price of the item in the poe.ninja price indexes
+
+        :return: ninja.IndexPrice, or None if poe.ninja has no price for
+            this kind of item
+        """
+        return None
+
+    def add_mods(self, query, modifiers):
         """Add the modifiers found in the given list.
 
-        :param json: JSON of the item to modify
+        :param query: QueryBuilder of the item to modify
         :param modifiers: Modifier list to transform
         """
         mods = []
@@ -74,13 +122,16 @@ class BaseItem:
                 "value": {"option": e.option, "max": e.max, "min": e.min,},
             }
             mods.append(data)
-        json["query"]["stats"][0]["filters"] = mods
-        return json
+        return query.set(STAT_FILTERS, mods)
 
     def create_pseudo_mods(self):
         return {}
 
-    def relax_modifiers(self):
+    def relax_modifiers(self, factor=0.1):
+        """Widen the searched values, to find items that are close
+
+        :param factor: Fraction the values are lowered (or raised) by
+        """
         pass
 
     def remove_duplicate_mods(self):
@@ -95,45 +146,29 @@ class BaseItem:
     def remove_all_mods(self):
         self.mods = []
 
-    def set_name(self, json, name):
-        json["query"]["name"] = name
-        return json
-
-    def set_type(self, json, item_type):
-        json["query"]["type"] = item_type
-        return json
-
-    def set_ilevel(self, json, ilevel):
-        json["query"]["filters"]["misc_filters"]["filters"]["ilvl"] = {
-            "min": ilevel
-        }
-        return json
-
-    def set_quality(self, json, quality):
-        json["query"]["filters"]["misc_filters"]["filters"]["quality"] = {
-            "min": quality
-        }
-        return json
-
-    def set_rarity(self, json, rarity):
-        json["query"]["filters"]["type_filters"]["filters"]["rarity"] = {
-            "option": rarity
-        }
-        return json
-
-    def set_category(self, json, category):
-        json["query"]["filters"]["type_filters"]["filters"]["category"] = {
-            "option": category
-        }
-        return json
-
-    def set_influence(self, json, influences):
+    def set_name(self, query, name):
+        return query.set(QUERY + ("name",), name)
+
+    def set_type(self, query, item_type):
+        return query.set(QUERY + ("type",), item_type)
+
+    def set_ilevel(self, query, ilevel):
+        return query.set(MISC_FILTERS + ("ilvl",), {"min": ilevel})
+
+    def set_quality(self, query, quality):
+        return query.set(MISC_FILTERS + ("quality",), {"min": quality})
+
+    def set_rarity(self, query, rarity):
+        return query.set(TYPE_FILTERS + ("rarity",), {"option": rarity})
+
+    def set_category(self, query, category):
+        return query.set(TYPE_FILTERS + ("category",), {"option": category})
+
+    def set_influence(self, query, influences):
         for influence in influences:
             text = "%s_item" % influence
-            json["query"]["filters"]["misc_filters"]["filters"][text] = {
-                "option": "true"
-            }
-        return json
+            query.set(MISC_FILTERS + (text,), {"option": "true"})
+        return query
 
 
 class Item(BaseItem):
@@ -177,48 +212,40 @@ class Item(BaseItem):
 
     def print(self):
         super().print()
-        logging.info(f"[Base] {self.base}")
-        logging.info(f"[Item Level] {self.ilevel}")
-        logging.info(f"[Quality] {self.quality}")
+        logging.info("[Base] %s", self.base)
+        logging.info("[Item Level] %s", self.ilevel)
+        logging.info("[Quality] %s", self.quality)
         for mod in self.mods:
-            t = f"[Mod] {mod.mod.text}"
+            t = "[Mod] %s"
+            args = [mod.mod.text]
             if mod.min:
-                t += f": [{Fore.YELLOW}{mod.min}{Fore.RESET}]"
+                t += ": [%s%s%s]"
+                args += [Fore.YELLOW, mod.min, Fore.RESET]
             if mod.max:
-                t += f": [{Fore.YELLOW}{mod.max}{Fore.RESET}]"
-
-            logging.info(t)
-
-    def get_json(self):
-        json = super().get_json()
-        json = self.set_type(json, self.base)
-        json = self.set_rarity(json, self.rarity)
-        json = self.set_ilevel(json, self.ilevel)
-        json = self.set_category(json, self.category)
-        # json = self.set_quality(json, self.quality)
-        json = self.set_influence(json, self.influence)
-        json = self.add_mods(json, self.mods)
-
-        if self.synthesised:
-            json["query"]["filters"]["misc_filters"]["filters"][
-                "synthesised_item"
-            ] = {"option": self.synthesised}
-        if self.corrupted:
-            json["query"]["filters"]["misc_filters"]["filters"][
-                "corrupted"
-            ] = {"option": self.corrupted}
-        if self.mirrored:
-            json["query"]["filters"]["misc_filters"]["filters"]["mirrored"] = {
-                "option": self.mirrored
-            }
-        if self.veiled:
-            json["query"]["filters"]["misc_filters"]["filters"]["veiled"] = {
-                "option": self.veiled
-            }
-        if self.identified:
-            json["query"]["filters"]["misc_filters"]["filters"][
-                "identified"
-            ] = {"option": self.identified}
+                t += ": [%s%s%s]"
+                args += [Fore.YELLOW, mod.max, Fore.RESET]
+
+            logging.info(t, *args)
+
+    def get_query(self):
+        query = super().get_query()
+        query = self.set_type(query, self.base)
+        query = self.set_rarity(query, self.rarity)
+        query = self.set_ilevel(query, self.ilevel)
+        query = self.set_category(query, self.category)
+        # query = self.set_quality(query, self.quality)
+        query = self.set_influence(query, self.influence)
+        query = self.add_mods(query, self.mods)
+
+        for name, option in (
+            ("synthesised_item", self.synthesised),
+            ("corrupted", self.corrupted),
+            ("mirrored", self.mirrored),
+            ("veiled", self.veiled),
+            ("identified", self.identified),
+        ):
+            if option:
+                query.set(MISC_FILTERS + (name,), {"option": option})
 
         if self.sockets:
             sockets = self.sockets.lower()
@@ -228,37 +255,46 @@ class Item(BaseItem):
             w_sockets = sockets.count("w")
             a_sockets = sockets.count("a")
 
-            links = 0
-            counter = 0
-            for c in sockets:
-                if c == " ":
-                    if counter > links:
-                        links = counter
-                    counter = 0
-                elif c == "-":
-                    counter += 1
-            if counter > links:
-                links = counter
-            links = links + 1
+            links = self.get_links()
             sockets = r_sockets + b_sockets + g_sockets + w_sockets + a_sockets
 
-            if sockets == 6 or links >= 5:
-                json["query"]["filters"]["socket_filters"]["filters"]
-                if sockets == 6:
-                    json["query"]["filters"]["socket_filters"]["filters"][
-                        "sockets"
-                    ] = {"min": 6}
+            if sockets == 6:
+                query.set(SOCKET_FILTERS + ("sockets",), {"min": 6})
 
-                # If we have 5 or more links, we'll include that in the query
-                if links >= 5:
-                    json["query"]["filters"]["socket_filters"]["filters"][
-                        "links"
-                    ] = {"min": links}
+            # If we have 5 or more links, we'll include that in the query
+            if links >= 5:
+                query.set(SOCKET_FILTERS + ("links",), {"min": links})
 
         if self.rarity == "unique" and self.identified:
-            json = self.set_name(json, self.name.replace(" " + self.base, ""))
+            query = self.set_name(
+                query, self.name.replace(" " + self.base, "")
+            )
 
-        return json
+        return query
+
+    def get_links(self) -> int:
+        """Size of the largest group of linked sockets"""
+        if not self.sockets:
+            return 0
+        links = 0
+        counter = 0
+        for c in self.sockets:
+            if c == " ":
+                if counter > links:
+                    links = counter
+                counter = 0
+            elif c == "-":
+                counter += 1
+        if counter > links:
+            links = counter
+        return links + 1
+
+    def get_ninja_price(self):
+        if self.rarity == "unique" and self.identified:
+            return ninja.get_unique_price(
+                self.name, self.base, self.get_links()
+            )
+        return None
 
     def create_pseudo_mods(self):
         """Turn certain modifiers into their pseudo variants to find more matches
@@ -266,192 +302,23 @@ class Item(BaseItem):
         if self.rarity == "unique":
             return
 
-        # Combine life and resists for pseudo-stats
-        total_ele_resists = 0
-        total_chaos_resist = 0
-        total_life = 0
-
-        solo_resist_ids = {
-            "explicit.stat_3372524247",  # Explicit fire resist
-            "explicit.stat_1671376347",  # Explicit lightning resist
-            "explicit.stat_4220027924",  # Explicit cold resist
-            "implicit.stat_3372524247",  # Implicit fire resist
-            "implicit.stat_1671376347",  # Implicit lightning resist
-            "implicit.stat_4220027924",  # Implicit cold resist
-            "crafted.stat_3372524247",  # Crafted fire resist
-            "crafted.stat_1671376347",  # Crafted lightning resist
-            "crafted.stat_4220027924",  # Crafted cold resist
-        }
-
-        dual_resist_ids = {
-            "explicit.stat_2915988346",  # Explicit fire and cold resists
-            "explicit.stat_3441501978",  # Explicit fire and lightning resists
-            "explicit.stat_4277795662",  # Explicit cold and lightning resists
-            "implicit.stat_2915988346",  # Implicit fire and cold resists
-            "implicit.stat_3441501978",  # Implicit fire and lightning resists
-            "implicit.stat_4277795662",  # Implicit cold and lightning resists
-            "crafted.stat_2915988346",  # Crafted fire and cold resists
-            "crafted.stat_3441501978",  # Crafted fire and lightning resists
-            "crafted.stat_4277795662",  # Crafted cold and lightning resists
-        }
-
-        triple_resist_ids = {
-            "explicit.stat_2901986750",  # Explicit all-res
-            "implicit.stat_2901986750",  # Implicit all-res
-            "crafted.stat_2901986750",  # Crafted all-res
-        }
-
-        solo_chaos_resist_ids = {
-            "explicit.stat_2923486259",  # Explicit chaos resist
-            "implicit.stat_2923486259",  # Implicit chaos resist
-        }
-
-        dual_chaos_resist_ids = {
-            "crafted.stat_378817135",  # Crafted fire and chaos resists
-            "crafted.stat_3393628375",  # Crafted cold and chaos resists
-            "crafted.stat_3465022881",  # Crafted lightning and chaos resists
-        }
-
-        life_ids = {
-            "explicit.stat_3299347043",  # Explicit maximum life
-            "implicit.stat_3299347043",  # Implicit maximum life
-            "crafted.stat_3299347043",  # Crafted maximum life
-        }
-
-        spell_crit = 0
-        global_crit = 0
-        global_multi = 0
-        increased_ele_attacks = 0
-
-        rMods = []
-        nMods = []
-        for mod in self.mods:
-            if mod.mod.id in solo_resist_ids:
-                total_ele_resists += float(mod.min)
-                rMods.append(mod)
-            elif mod.mod.id in dual_resist_ids:
-                total_ele_resists += 2 * float(mod.min)
-                rMods.append(mod)
-            elif mod.mod.id in triple_resist_ids:
-                total_ele_resists += 3 * float(mod.min)
-                rMods.append(mod)
-            elif mod.mod.id in solo_chaos_resist_ids:
-                total_chaos_resist += float(mod.min)
-                rMods.append(mod)
-            elif mod.mod.id in dual_chaos_resist_ids:
-                total_ele_resists += float(mod.min)
-                total_chaos_resist += float(mod.min)
-                rMods.append(mod)
-            elif mod.mod.id in life_ids:
-                total_life += float(mod.min)
-                rMods.append(mod)
-            # Life gained from strength
-            elif mod.mod.id == "explicit.stat_4080418644":
-                total_life += (float(mod.min) / 10) * 5
-                nMods.append(mod)
-            elif "increased Critical Strike Chance for Spells" in mod.mod.text:
-                spell_crit += float(mod.min)
-                rMods.append(mod)
-            elif "Global Critical Strike Chance" in mod.mod.text:
-                global_crit += float(mod.min)
-                nMods.append(mod)
-            elif "Global Critical Strike Multiplier" in mod.mod.text:
-                global_multi += float(mod.min)
-                rMods.append(mod)
-            elif (
-                "increased Elemental Damage with Attack Skills" in mod.mod.text
-            ):
-                increased_ele_attacks += float(mod.min)
-                rMods.append(mod)
-            else:
-                nMods.append(mod)
-
-        self.mods = nMods
-
-        if spell_crit != 0:
-            spell_crit += global_crit
-            modType = get_item_modifiers_by_id(
-                "pseudo.pseudo_critical_strike_chance_for_spells"
-            )
-            mod = ModInfo(modType, spell_crit, None, None)
-            self.mods.append(mod)
-
-        if global_multi != 0:
-            modType = get_item_modifiers_by_id(
-                "pseudo.pseudo_global_critical_strike_multiplier"
-            )
-            mod = ModInfo(modType, global_multi, None, None)
-            self.mods.append(mod)
-
-        if increased_ele_attacks != 0:
-            modType = get_item_modifiers_by_id(
-                "pseudo.pseudo_increased_elemental_damage_with_attack_skills"
-            )
-            mod = ModInfo(modType, increased_ele_attacks, None, None)
-            self.mods.append(mod)
-
-        if total_ele_resists > 0:
-            modType = get_item_modifiers_by_id(
-                "pseudo.pseudo_total_elemental_resistance"
-            )
-            mod = ModInfo(modType, total_ele_resists, None, None)
-            self.mods.append(mod)
-
-            logging.info(
-                "[o] Combining the "
-                + Fore.CYAN
-                + f"elemental resistance"
-                + Fore.RESET
-                + " mods from the list into a pseudo-parameter"
-            )
-            logging.info(
-                "[+] Pseudo-mod "
-                + Fore.GREEN
-                + f"+{total_ele_resists}% total Elemental Resistance (pseudo)"
-                + Fore.RESET
-            )
-
-        if total_chaos_resist > 0:
-            modType = get_item_modifiers_by_id(
-                "pseudo.pseudo_total_chaos_resistance"
-            )
-            mod = ModInfo(modType, total_chaos_resist, None, None)
-            self.mods.append(mod)
-
-            logging.info(
-                "[o] Combining the "
-                + Fore.CYAN
-                + f"chaos resistance"
-                + Fore.RESET
-                + " mods from the list into a pseudo-parameter"
-            )
-            logging.info(
-                "[+] Pseudo-mod "
-                + Fore.GREEN
-                + f"+{total_chaos_resist}% total Chaos Resistance (pseudo)"
-            )
-
-        if total_life > 0:
-            modType = get_item_modifiers_by_id("pseudo.pseudo_total_life")
-            mod = ModInfo(modType, total_life, None, None)
-            self.mods.append(mod)
-            logging.info(
-                "[o] Combining the "
-                + Fore.CYAN
-                + f"maximum life"
-                + Fore.RESET
-                + " mods from the list into a pseudo-parameter"
-            )
+        self.mods, rMods, totals, bad = pseudo.aggregate(self.mods)
+        for pseudo_id, total in totals.items():
+            modType = get_item_modifiers_by_id(pseudo_id)
+            if not modType:
+                continue
+            flags = ModFlag.BAD if pseudo_id in bad else None
+            self.mods.append(ModInfo(modType, total, None, None, flags=flags))
             logging.info(
-                "[+] Pseudo-mod "
-                + Fore.GREEN
-                + f"+{total_life} to maximum Life (pseudo)"
-                + Fore.RESET
+                "[+] Pseudo-mod %s%s (pseudo)%s",
+                Fore.GREEN,
+                modType.text.replace("#", f"{total:g}", 1),
+                Fore.RESET,
             )
 
         return rMods
 
-    def relax_modifiers(self):
+    def relax_modifiers(self, factor=0.1):
         if self.rarity == "unique":  # dont do this on uniques
             return
 
@@ -459,20 +326,21 @@ class Item(BaseItem):
             if mod.can_reduce:
                 if mod.max:
                     if mod.max > 0:
-                        mod.max = round_mod(mod.max * 1.1)
+                        mod.max = round_mod(mod.max * (1 + factor))
                     else:
-                        mod.max = round_mod(mod.max * 0.9)
+                        mod.max = round_mod(mod.max * (1 - factor))
                 if mod.min:
                     if mod.min > 0:
-                        mod.min = round_mod(mod.min * 0.9)
+                        mod.min = round_mod(mod.min * (1 - factor))
                     else:
-                        mod.min = round_mod(mod.min * 1.1)
+                        mod.min = round_mod(mod.min * (1 + factor))
 
     def remove_duplicate_mods(self):
+        duplicate = get_mod_database().duplicate
         nMods = []
         restr = ""
         for mod in self.mods:
-            if is_duplicate_mod_type(mod.mod):
+            if mod.number != NO_MOD and duplicate[mod.number]:
                 restr += f"    {mod.mod.text}\n"
             else:
                 nMods.append(mod)
@@ -487,42 +355,13 @@ class Item(BaseItem):
         if self.rarity == "unique":  # dont do this on uniques
             return ""
 
-        # TODO Add more, move to config ( config parse does not support multiple lines atm, prob need to write a custom one)
-        bad_mod_list = [
-            "Physical Attack Damage Leeched as Life",
-            "to maximum Mana",
-            "Life gained for each Enemy hit by Attacks",
-            "of Physical Attack Damage Leeched as Mana",
-            "increased Mana Regeneration Rate",
-            "Life gained on Kill",
-            "Mana gained on Kill",
-            "Reflects # Physical Damage to Melee Attackers",
-            "Life gained for each Enemy hit by Attacks",
-            "to Armour",
-            "increased Rarity of Items found",
-            "increased Stun Duration",
-            "Regenerate",
-            "Regeneration",
-            "increased Stun and Block Recovery",
-            "Minions have",
-            "additional Physical Damage Reduction against Abyssal Monsters",
-            "reduced Enemy Stun Threshold",
-            "increased Damage against Abyssal Monsters",
-            "increased Movement Speed if you haven't taken Damage Recently",
-            "increased Projectile Speed",
-        ]
-
         nMods = []
-        found = False
         restr = ""
         for mod in self.mods:
-            for bad in bad_mod_list:
-                if bad in mod.mod.text:
-                    found = True
-                    restr += f"    {mod.mod.text}\n"
-            if not found:
+            if mod.flags & ModFlag.BAD:
+                restr += f"    {mod.mod.text}\n"
+            else:
                 nMods.append(mod)
-            found = False
         self.mods = nMods
         if restr != "":
             restr = "[!] Removed some mods From Search:\n" + restr
@@ -593,48 +432,31 @@ class Armour(Item):
                 except Exception:
                     pass
 
-        statList = [
-            "maximum Energy Shield",
-            "increased maximum Energy Shield",
-            "increased Energy Shield",
-            "increased Armour",
-            "to Armour",
-            "to Evasion Rating",
-            "increased Evasion Rating",
+        self.mods = [
+            mod for mod in self.mods if not mod.flags & ModFlag.DEFENCE
         ]
 
-        nMods = []
-        for mod in self.mods:
-            mod_text = mod.mod.text
-            found = False
-            for s in statList:
-                if s in mod_text:
-                    found = True
-                    break
-            if not found:
-                nMods.append(mod)
-
-        self.mods = nMods
-
-    def relax_modifiers(self):
-        super().relax_modifiers()
+    def relax_modifiers(self, factor=0.1):
+        super().relax_modifiers(factor)
         if self.armour:
-            self.armour = round_mod(self.armour * 0.9)
+            self.armour = round_mod(self.armour * (1 - factor))
         if self.evasion:
-            self.evasion = round_mod(self.evasion * 0.9)
+            self.evasion = round_mod(self.evasion * (1 - factor))
         if self.es:
-            self.es = round_mod(self.es * 0.9)
+            self.es = round_mod(self.es * (1 - factor))
 
-    def get_json(self):
-        json = super().get_json()
-        json["query"]["filters"]["armour_filters"] = {
-            "filters": {
-                "ar": {"min": self.armour},
-                "es": {"min": self.es},
-                "ev": {"min": self.evasion},
-            }
-        }
-        return json
+    def get_query(self):
+        query = super().get_query()
+        return query.set(
+            QUERY + ("filters", "armour_filters"),
+            {
+                "filters": {
+                    "ar": {"min": self.armour},
+                    "es": {"min": self.es},
+                    "ev": {"min": self.evasion},
+                }
+            },
+        )
 
     def get_item_stats(self):
         s = f"Armour: {self.armour} \nEvasion: {self.evasion} \nEnergy Shield: {self.es}"
@@ -732,21 +554,12 @@ class Weapon(Item):
         is_caster_weapon = 0
         nMods = []
         for mod in self.mods:
-            mod_text = mod.mod.text
-            if (
-                ("Adds # to #" in mod_text and "to Spells" not in mod_text)
-                or (mod_text == "#% increased Critical Strike Chance")
-                or ("increased Attack Speed" in mod_text)
-                or ("increased Physical Damage" in mod_text)
-                or ("total Attack Speed" in mod_text)
-            ):
+            flags = mod.flags
+            if flags & ModFlag.WEAPON:
                 continue
-            else:
-                nMods.append(mod)
+            nMods.append(mod)
 
-            if "Spell" in mod_text:
-                is_caster_weapon += 1
-            elif "Spells" in mod_text:
+            if flags & ModFlag.SPELL:
                 is_caster_weapon += 1
         self.mods = nMods
 
@@ -756,28 +569,30 @@ class Weapon(Item):
             self.crit = None
 
     # Relax weapon stats
-    def relax_modifiers(self):
-        super().relax_modifiers()
+    def relax_modifiers(self, factor=0.1):
+        super().relax_modifiers(factor)
         if self.pdps:
-            self.pdps = round_mod(self.pdps * 0.9)
+            self.pdps = round_mod(self.pdps * (1 - factor))
         if self.edps:
-            self.edps = round_mod(self.edps * 0.9)
+            self.edps = round_mod(self.edps * (1 - factor))
         if self.speed:
-            self.speed = round_mod(self.speed * 0.9)
+            self.speed = round_mod(self.speed * (1 - factor))
         if self.crit:
-            self.crit = round_mod(self.crit * 0.9)
+            self.crit = round_mod(self.crit * (1 - factor))
 
-    def get_json(self):
-        json = super().get_json()
-        json["query"]["filters"]["weapon_filters"] = {
-            "filters": {
-                "aps": {"min": self.speed},
-                "crit": {"min": self.crit},
-                "edps": {"min": self.edps},
-                "pdps": {"min": self.pdps},
-            }
-        }
-        return json
+    def get_query(self):
+        query = super().get_query()
+        return query.set(
+            QUERY + ("filters", "weapon_filters"),
+            {
+                "filters": {
+                    "aps": {"min": self.speed},
+                    "crit": {"min": self.crit},
+                    "edps": {"min": self.edps},
+                    "pdps": {"min": self.pdps},
+                }
+            },
+        )
 
     def get_item_stats(self):
         s = f"Physical DPS: {self.pdps} \nElemental DPS: {self.edps} \nSpeed: {self.speed}\nCrit: {self.crit}"
@@ -791,7 +606,9 @@ class Currency(BaseItem):
         super().__init__(name)
         self.text = text
 
-    def get_json(self):
+    def get_query(self):
+        from utils.currency import currency_global
+
         unsupportedCurrency = [
             "Warlord's Exalted Orb",
             "Crusader's Exalted Orb",
@@ -800,20 +617,15 @@ class Currency(BaseItem):
             "Awakener's Orb",
         ]
         if self.name not in unsupportedCurrency:
-            json = {
-                "exchange": {
-                    "status": {"option": "online"},
-                    "have": ["chaos"],
-                    "want": [currency_global[self.name]],
-                },
-            }
+            query = QueryBuilder(EXCHANGE)
+            query.set(("exchange", "want"), [currency_global[self.name]])
         else:
-            json = {
-                "query": {"type": self.name},
-                "status": {"option": "online"},
-                "sort": {"price": "asc"},
-            }
-        return json
+            query = QueryBuilder(NAME_SEARCH)
+            query = self.set_type(query, self.name)
+        return query
+
+    def get_ninja_price(self):
+        return ninja.get_stackable_price(self.name)
 
 
 class Prophecy(BaseItem):
@@ -823,12 +635,12 @@ class Prophecy(BaseItem):
         super().__init__(name)
         self.text = text
 
-    def get_json(self):
-        json = super().get_json()
-        json = self.set_name(json, self.name)
-        json = self.set_type(json, "Prophecy")
-        json = self.set_category(json, "prophecy")
-        return json
+    def get_query(self):
+        query = super().get_query()
+        query = self.set_name(query, self.name)
+        query = self.set_type(query, "Prophecy")
+        query = self.set_category(query, "prophecy")
+        return query
 
 
 class Organ(BaseItem):
@@ -842,16 +654,16 @@ class Organ(BaseItem):
 
     def print(self):
         super().print()
-        print(f"[Item Level] {self.ilevel}")
+        logging.info("[Item Level] %s", self.ilevel)
         for mod in self.mods:
-            print(f"[Mod] {mod.mod.text}")
+            logging.info("[Mod] %s", mod.mod.text)
 
-    def get_json(self):
-        json = super().get_json()
-        json = self.set_type(json, "Metamorph " + self.name.split(" ")[-1])
-        json = self.set_ilevel(json, self.ilevel)
-        json = self.add_mods(json, self.mods)
-        return json
+    def get_query(self):
+        query = super().get_query()
+        query = self.set_type(query, "Metamorph " + self.name.split(" ")[-1])
+        query = self.set_ilevel(query, self.ilevel)
+        query = self.add_mods(query, self.mods)
+        return query
 
 
 class Flask(BaseItem):
@@ -867,18 +679,23 @@ class Flask(BaseItem):
 
     def print(self):
         super().print()
-        print(f"[Base] {self.base}")
-        print(f"[Quality] {self.quality}")
+        logging.info("[Base] %s", self.base)
+        logging.info("[Quality] %s", self.quality)
         for mod in self.mods:
-            print(f"[Mod] {mod.mod.text}")
+            logging.info("[Mod] %s", mod.mod.text)
 
-    def get_json(self):
-        json = super().get_json()
-        json = self.set_type(json, self.base)
-        json = self.set_rarity(json, self.rarity)
-        json = self.set_quality(json, self.quality)
-        json = self.add_mods(json, self.mods)
-        return json
+    def get_query(self):
+        query = super().get_query()
+        query = self.set_type(query, self.base)
+        query = self.set_rarity(query, self.rarity)
+        query = self.set_quality(query, self.quality)
+        query = self.add_mods(query, self.mods)
+        return query
+
+    def get_ninja_price(self):
+        if self.rarity == "unique":
+            return ninja.get_unique_price(self.name, self.base)
+        return None
 
 
 class Gem(BaseItem):
@@ -893,21 +710,22 @@ class Gem(BaseItem):
 
     def print(self):
         super().print()
-        print(f"[Item Level] {self.level}")
-        print(f"[Quality] {self.quality}")
-
-    def get_json(self):
-        json = super().get_json()
-        json = self.set_type(json, self.name)
-        json = self.set_category(json, "gem")
-        json["query"]["filters"]["misc_filters"]["filters"]["gem_level"] = {
-            "min": int(self.level)
-        }
-        json = self.set_quality(json, self.quality)
-        json["query"]["filters"]["misc_filters"]["filters"]["corrupted"] = {
-            "option": self.corrupted
-        }
-        return json
+        logging.info("[Item Level] %s", self.level)
+        logging.info("[Quality] %s", self.quality)
+
+    def get_query(self):
+        query = super().get_query()
+        query = self.set_type(query, self.name)
+        query = self.set_category(query, "gem")
+        query.set(MISC_FILTERS + ("gem_level",), {"min": int(self.level)})
+        query = self.set_quality(query, self.quality)
+        query.set(MISC_FILTERS + ("corrupted",), {"option": self.corrupted})
+        return query
+
+    def get_ninja_price(self):
+        return ninja.get_gem_price(
+            self.name, int(self.level), self.quality, self.corrupted
+        )
 
 
 class Map(BaseItem):
@@ -939,29 +757,54 @@ class Map(BaseItem):
 
     def print(self):
         super().print()
-        print(f"[Base] {self.base}")
-        print(f"[Item Level] {self.ilevel}")
+        logging.info("[Base] %s", self.base)
+        logging.info("[Item Level] %s", self.ilevel)
         for mod in self.map_mods:
-            print(f"[Mod] {mod.mod.text}")
+            logging.info("[Mod] %s", mod.mod.text)
 
-    def get_json(self):
-        json = super().get_json()
-        json["query"]["filters"]["map_filters"] = {
-            "filters": {
-                "map_tier": {"min": self.ilevel},
-                "map_iiq": {"min": self.iiq},
-                "map_iir": {"min": self.iir},
-                "map_packsize": {"min": self.pack_size},
-                "map_blighted": {"option": self.name.startswith("Blighted")},
-            }
-        }
+    def is_blighted(self):
+        return ninja.get_map_kind(f"{self.name} {self.base}") == "Blighted"
+
+    def get_query(self):
+        query = super().get_query()
+        query.set(
+            QUERY + ("filters", "map_filters"),
+            {
+                "filters": {
+                    "map_tier": {"min": self.ilevel},
+                    "map_iiq": {"min": self.iiq},
+                    "map_iir": {"min": self.iir},
+                    "map_packsize": {"min": self.pack_size},
+                    "map_blighted": {"option": self.is_blighted()},
+                }
+            },
+        )
         if self.rarity == "unique" and self.identified:
-            json = self.set_name(json, self.name.replace(" " + self.base, ""))
+            query = self.set_name(
+                query, self.name.replace(" " + self.base, "")
+            )
+
+        query = self.set_type(query, self.base)
+        query = self.add_mods(query, self.map_mods)
+        query = self.set_rarity(query, self.rarity)
+        return query
 
-        json = self.set_type(json, self.base)
-        json = self.add_mods(json, self.map_mods)
-        json = self.set_rarity(json, self.rarity)
-        return json
+    def get_ninja_price(self):
+        if self.rarity == "unique":
+            if self.identified:
+                return ninja.get_unique_price(self.name, self.base)
+            return None
+        influence = next(
+            (
+                mod.min
+                for mod in self.map_mods
+                if mod.mod.text == "Area is influenced by #"
+            ),
+            None,
+        )
+        return ninja.get_map_price(
+            self.name, self.base, self.ilevel, influence
+        )
 
 
 class Beast(BaseItem):
@@ -975,27 +818,35 @@ class Beast(BaseItem):
 
     def print(self):
         super().print()
-        print(f"[Base] {self.base}")
-        print(f"[Item Level] {self.ilevel}")
+        logging.info("[Base] %s", self.base)
+        logging.info("[Item Level] %s", self.ilevel)
+
+    def get_query(self):
+        query = super().get_query()
+        query = self.set_ilevel(query, self.ilevel)
+        query = self.set_type(query, self.base)
+        return query
 
-    def get_json(self):
-        json = super().get_json()
-        json = self.set_ilevel(json, self.ilevel)
-        json = self.set_type(json, self.base)
-        return json
 
+class ParseContext:
+    """State carried between the mods of a single item while parsing it"""
 
-prev_mod = ""
+    def __init__(self):
+        # Text of the last mod that was found
+        self.prev_mod = ""
 
 
-def parse_mod(mod_text: str, mod_values, category=""):
+def parse_mod(mod_text: str, mod_values, category="", context=None):
     """Given the text of the mod, find the appropriate ItemModifier object
 
     :param mod_text: Text of the mod
     :param mod_values: Value of the referenced mod
     :param category: Specific category of mods to check
+    :param context: ParseContext of the item the mod is on, mods parsed
+        without one don't see the other mods of the item
     """
-    global prev_mod
+    if context is None:
+        context = ParseContext()
 
     can_reduce = True
     m_min = None
@@ -1073,7 +924,7 @@ def parse_mod(mod_text: str, mod_values, category=""):
             mod = get_item_modifiers_by_text((mod_text + " (Local)", mod_type))
         elif (
             "increased Damage with Poison" in mod_text
-            and "chance to Poison on Hit" not in prev_mod
+            and "chance to Poison on Hit" not in context.prev_mod
         ):
             mod = get_item_modifiers_by_text((mod_text + " (Local)", mod_type))
 
@@ -1139,31 +990,111 @@ def parse_mod(mod_text: str, mod_values, category=""):
         m_max = float(mod_values)
         m_min = None
 
-    prev_mod = mod_text
+    context.prev_mod = mod_text
     m = ModInfo(mod, m_min, m_max, option, can_reduce)
     return m
 
 
-def isCurrency(name: str, rarity: str, regions: list):
+MAP_TEXT = "Travel to this Map by using it in a personal Map Device. Maps can only be used once."
+PROPHECY_TEXT = "Right-click to add this prophecy to your character."
+ORGAN_TEXT = (
+    "Combine this with four other different samples in Tane's Laboratory."
+)
+FLASK_TEXT = "Right click to drink. Can only hold charges while in belt. Refills as you kill monsters."
+BEAST_TEXT = "Right-click to add this to your bestiary."
+
+# Number of parsed items kept by parse_item_info
+PARSED_CACHE_SIZE = 32
+
+parsed_items = OrderedDict()
+parsed_lock = Lock()
+
+# Parsers of item classes, by a description line or by rarity
+marker_parsers = {}
+rarity_parsers = {}
+
+
+def register_item_class(marker=None, rarity=None):
+    """Register a parser for a class of items.
+
+    The parser is called as parser(regions, rarity, name, quality, text)
+    for items that have a region starting with the marker line, or that
+    have the given rarity. Markers are checked first.
+
+    :param marker: First line of a region that only this class has
+    :param rarity: Rarity (lower case) that only this class has
+    """
+
+    def register(parser):
+        if marker:
+            marker_parsers[marker] = parser
+        if rarity:
+            rarity_parsers[rarity] = parser
+        # Items parsed before may belong to the new class
+        with parsed_lock:
+            parsed_items.clear()
+        return parser
+
+    return register
+
+
+def isCurrency(name: str, regions: list):
     """Determine if given item is a currency"""
-    if rarity == "currency" or rarity == "divination card":
-        return Currency(name, regions)
+    from utils.currency import currency_global
+
     if name in currency_global:
         return Currency(name, regions)
 
-    mapText = "Travel to this Map by using it in a personal Map Device. Maps can only be used once."
     for i in range(len(regions) - 3, len(regions)):
-        if "Map Device" in regions[i][0] and mapText not in regions[i][0]:
+        if "Map Device" in regions[i][0] and MAP_TEXT not in regions[i][0]:
             return Currency(name, regions)
     return None
 
 
-def parse_map(regions: list, rarity, name):
+@register_item_class(rarity="currency")
+@register_item_class(rarity="divination card")
+def parse_currency(regions: list, rarity, name, quality, text: list):
+    return Currency(name, text)
+
+
+@register_item_class(PROPHECY_TEXT)
+def parse_prophecy(regions: list, rarity, name, quality, text: list):
+    return Prophecy(name, text)
+
+
+@register_item_class(rarity="gem")
+def parse_gem(regions: list, rarity, name, quality, text: list):
+    """Parse gem text and construct the Gem object"""
+    level = text[1][1].replace(" (Max)", "")
+    level = level.replace("Level: ", "")
+    corrupted = text[-1] == ["Corrupted"]
+    if "Vaal" in text[1][0]:
+        name = "Vaal " + name
+    return Gem(name, quality, level, corrupted, text)
+
+
+@register_item_class(MAP_TEXT)
+def parse_map(regions: list, rarity, name, quality, text: list):
     """Parse map text and construct the Map object"""
     map_mods = []
     identified = True
-    for i in range(2, len(regions)):
-        for line in regions[i]:
+    ilevel = 0
+    iiq = 0
+    iir = 0
+    pack_size = 0
+    for token in regions[1].tokens():
+        line = token.text
+        if line.startswith("Map Tier"):
+            ilevel = int(token.value)
+        elif line.startswith("Item Quantity: +"):
+            iiq = int(line[16:-13])
+        elif line.startswith("Item Rarity: +"):
+            iir = int(line[14:-13])
+        elif line.startswith("Monster Pack Size: +"):
+            pack_size = int(line[19:-13])
+
+    for region in regions[2:]:
+        for line in region.lines:
             if line == "Unidentified":
                 identified = False
             mod_text = line[:-11]
@@ -1183,18 +1114,6 @@ def parse_map(regions: list, rarity, name):
                 mod = ModInfo(mod, mod_value, None, None)
                 map_mods.append(mod)
 
-    ilevel = int(regions[1][0][10:])
-    iiq = 0
-    iir = 0
-    pack_size = 0
-    for line in regions[1]:
-        if line.startswith("Item Quantity: +"):
-            iiq = int(line[16:-13])
-        elif line.startswith("Item Rarity: +"):
-            iir = int(line[14:-13])
-        elif line.startswith("Monster Pack Size: +"):
-            pack_size = int(line[19:-13])
-
     base = get_base("Maps", name)
 
     return Map(
@@ -1207,14 +1126,19 @@ def parse_map(regions: list, rarity, name):
         pack_size,
         map_mods,
         identified,
-        regions,
+        text,
     )
 
 
-def parse_organ(regions: list, name):
+@register_item_class(ORGAN_TEXT)
+def parse_organ(regions: list, rarity, name, quality, text: list):
     """Parse text and construct the Organ object"""
     mods = {}
-    for line in regions[3]:
+    ilevel = 0
+    for region in regions:
+        if region.type == TokenType.ITEM_LEVEL:
+            ilevel = int(region.tokens()[0].value)
+    for line in regions[3].lines:
         line = line.lstrip(" ").rstrip(" ")
         mod = get_item_modifiers_by_text((line, ItemModifierType.MONSTER))
         if mod:
@@ -1232,19 +1156,21 @@ def parse_organ(regions: list, name):
         m = ModInfo(mod, value, None, None)
         nMods.append(m)
 
-    ilevel = int(regions[2][0][11:])
-    return Organ(name, ilevel, nMods, regions)
+    return Organ(name, ilevel, nMods, text)
 
 
-def parse_flask(regions: list, rarity: str, quality: int, name: str):
+@register_item_class(FLASK_TEXT)
+def parse_flask(regions: list, rarity, name, quality, text: list):
     """Parse text and construct Flask object"""
     mods = []
-    for i in range(4, len(regions)):
-        for line in regions[i]:
-            mod_values = re.findall(r"[+-]?\d+\.?\d?\d?", line)
-            mod_values = ",".join(["".join(v) for v in mod_values])
-            mod_text = re.sub(r"[+-]?\d+\.?\d?\d?", "#", line)
-            mod = parse_mod(mod_text, mod_values)
+    context = ParseContext()
+    for region in regions[4:]:
+        if region.type != TokenType.MOD:
+            continue
+        for token in region.tokens():
+            mod = parse_mod(
+                token.template, ",".join(token.values), context=context
+            )
             if mod:
                 mods.append(mod)
 
@@ -1252,34 +1178,76 @@ def parse_flask(regions: list, rarity: str, quality: int, name: str):
         base = get_base("Flasks", name)
     else:
         base = name
-    return Flask(name, base, rarity, quality, mods, regions)
+    return Flask(name, base, rarity, quality, mods, text)
 
 
-def parse_beast(name: str, regions: str):
+@register_item_class(BEAST_TEXT)
+def parse_beast(regions: list, rarity, name, quality, text: list):
     """Parse text and construct Beast object"""
-    base = get_base("Itemised Monsters", name + " " + regions[0][2])
-    ilevel = int(regions[2][0][12:])
-    return Beast(name, base, ilevel, regions)
+    base = None
+    ilevel = 0
+    for token in regions[0].tokens():
+        if token.key == "Base":
+            base = get_base("Itemised Monsters", name + " " + token.value)
+    for region in regions:
+        if region.type == TokenType.ITEM_LEVEL:
+            ilevel = int(region.tokens()[0].value)
+    return Beast(name, base, ilevel, text)
+
+
+def get_item_key(text: str) -> bytes:
+    """Hash of the item text, ignoring line endings and trailing spaces"""
+    text = "\n".join(line.rstrip() for line in text.strip().splitlines())
+    return hashlib.blake2b(text.encode("utf-8"), digest_size=16).digest()
 
 
 def parse_item_info(text: str):
+    """Parse given text and construct the approriate object.
+
+    The last PARSED_CACHE_SIZE items are kept, so pressing several
+    hotkeys on the same item only parses it once. Every call returns its
+    own copy, as pricing changes the item in place.
+    """
+    key = get_item_key(text)
+    with parsed_lock:
+        item = parsed_items.get(key)
+        if item is not None:
+            parsed_items.move_to_end(key)
+    journal.record_cache("parse", item is not None)
+
+    if item is None:
+        item = build_item(text)
+        if item is None:
+            return None
+        with parsed_lock:
+            parsed_items[key] = item
+            if len(parsed_items) > PARSED_CACHE_SIZE:
+                parsed_items.popitem(last=False)
+
+    return copy.deepcopy(item)
+
+
+def build_item(text: str):
     """Parse given text and construct the approriate object."""
-    regions = text.split("--------")
+    regions = lex(text)
 
     if len(regions) < 2:
         logging.info("Not a PoE Item")
         return None
 
-    for i, region in enumerate(regions):
-        regions[i] = region.strip().splitlines()
-        if len(regions[i]) <= 0:
-            del regions[i]
-            i -= 1
+    header = {token.key: token.value for token in regions[0].tokens()}
 
-    if "Note" in regions[-1][0]:
-        del regions[-1]
+    quality = 0
+    if regions[1].type == TokenType.PROPERTY:
+        for token in regions[1].tokens():
+            if token.key.startswith("Quality"):
+                quality = int(token.text[token.text.find("+") + 1 : -13])
+                break
 
-    rarity = regions[0][0][8:].lower()
+    # The plain lines of every region, kept on the item as its text
+    lines = [region.lines for region in regions]
+
+    rarity = header.get("Rarity", "").lower()
 
     validRarity = [
         "currency",
@@ -1295,58 +1263,34 @@ def parse_item_info(text: str):
         logging.info("Not a PoE Item")
         return None
 
-    name = re.sub(r"<<set:M?S?>>", "", regions[0][1])
+    name = header.get("Name", "")
+    modname = None
 
-    if len(regions[0]) > 2:
+    if "Base" in header:
         if rarity == "rare":
-            modname = name + " " + regions[0][2]
-            name = regions[0][2]
+            modname = name + " " + header["Base"]
+            name = header["Base"]
         else:
-            name += " " + regions[0][2]
+            name += " " + header["Base"]
 
     if len(name) > 60:
         logging.info("Not a PoE Item")
         return None
 
-    quality = 0
+    # Descriptions are at the end, so look from the last region back
+    for i in range(len(lines) - 1, 0, -1):
+        parser = marker_parsers.get(lines[i][0])
+        if parser:
+            return parser(regions, rarity, name, quality, lines)
 
-    for line in regions[1]:
-        if line.startswith("Quality"):
-            quality = int(line[line.find("+") + 1 : -13])
-            break
+    parser = rarity_parsers.get(rarity)
+    if parser:
+        return parser(regions, rarity, name, quality, lines)
 
-    mapText = "Travel to this Map by using it in a personal Map Device. Maps can only be used once."
-    prophecyText = "Right-click to add this prophecy to your character."
-    organText = (
-        "Combine this with four other different samples in Tane's Laboratory."
-    )
-    flaskText = "Right click to drink. Can only hold charges while in belt. Refills as you kill monsters."
-    beastText = "Right-click to add this to your bestiary."
-
-    for i in range(len(regions) - 1, 0, -1):
-        if mapText in regions[i][0]:
-            return parse_map(regions, rarity, name)
-        elif prophecyText in regions[i][0]:
-            return Prophecy(name, regions)
-        elif organText in regions[i][0]:
-            return parse_organ(regions, name)
-        elif flaskText in regions[i][0]:
-            return parse_flask(regions, rarity, quality, name)
-        elif beastText in regions[i][0]:
-            return parse_beast(name, regions)
-
-    c = isCurrency(name, rarity, regions)
+    c = isCurrency(name, lines)
     if c:
         return c
 
-    if rarity == "gem":
-        level = regions[1][1].replace(" (Max)", "")
-        level = level.replace("Level: ", "")
-        corrupted = regions[-1] == ["Corrupted"]
-        if "Vaal" in regions[1][0]:
-            name = "Vaal " + name
-        return Gem(name, quality, level, corrupted, regions)
-
     sockets = []
     corrupted = False
     mirrored = False
@@ -1378,99 +1322,53 @@ def parse_item_info(text: str):
         logging.info("[!] Pathofexile.com might be down")
         return None
 
-    if "modname" in locals():
+    if modname:
         name = modname
 
-    influenceText = {
-        "Elder",
-        "Shaper",
-        "Hunter",
-        "Redeemer",
-        "Warlord",
-        "Crusader",
-    }
-
     foundExplicit = False
-
-    for i in range(len(regions)):
-        first_line = regions[i][0]
-        if first_line.startswith("Requirements"):
-            pass
-        elif first_line.startswith("Sockets"):
-            sockets = first_line[9:]
-        elif first_line == "Corrupted":
-            corrupted = True
-        elif first_line == "Mirrored":
-            mirrored = True
-        elif first_line == "Unidentified":
-            identified = False
-        elif first_line.startswith("Item Level"):
-            ilevel = int(first_line[12:])
-        elif first_line.startswith(
-            "Place into an allocated Jewel Socket on the Passive Skill Tree. Right click to remove from the Socket."
-        ):
-            continue
-        elif first_line.count(" ") == 1 and first_line.endswith("Item"):
-            if first_line[:-5] in influenceText:
-                influences.append(first_line[:-5].lower())
-                if len(regions[i]) > 1:
-                    if regions[i][1].count(" ") == 1 and regions[i][
-                        1
-                    ].endswith("Item"):
-                        if regions[i][1][:-5] in influenceText:
-                            influences.append(regions[i][1][:-5].lower())
-
-        elif i > 1 and not foundExplicit:
-            for line in regions[i]:
+    context = ParseContext()
+
+    for region in regions:
+        kind = region.type
+        if kind == TokenType.SOCKETS:
+            sockets = region.tokens()[0].value
+        elif kind == TokenType.FLAG:
+            flag = region.lines[0]
+            if flag == "Corrupted":
+                corrupted = True
+            elif flag == "Mirrored":
+                mirrored = True
+            elif flag == "Unidentified":
+                identified = False
+        elif kind == TokenType.ITEM_LEVEL:
+            ilevel = int(region.tokens()[0].value)
+        elif kind == TokenType.INFLUENCE:
+            for token in region.tokens():
+                if token.type == TokenType.INFLUENCE:
+                    influences.append(token.value)
+        elif kind == TokenType.MOD and not foundExplicit:
+            for token in region.tokens():
+                line = token.text
                 if "Veiled Prefix" in line or "Veiled Suffix" in line:
                     veiled = True
+                    continue
+
+                if len(token.values) > 1:
+                    mod_values = (
+                        float(token.values[0]) + float(token.values[1])
+                    ) / 2
+                elif token.values:
+                    mod_values = token.values[0]
                 else:
-                    if (
-                        "if you have at least" in line
-                        or "inflicted with this Weapon to deal" in line
-                    ):
-                        mod_values = re.search(
-                            r"[+-]?\d+\.?\d?\d?", line
-                        ).group(0)
-                        numberIndex = re.search(
-                            r"[+-]?\d+\.?\d?\d?", line
-                        ).start()
-                        textIndex = line.find("if you have at least")
-                        if textIndex == -1:
-                            textIndex = line.find(
-                                "inflicted with this Weapon to deal"
-                            )
-                        if numberIndex < textIndex:
-                            mod_text = re.sub(
-                                r"[+-]?\d+\.?\d?\d?", "#", line, 1
-                            )
-                        else:
-                            mod_text = line
-                    else:
-                        mod_values = re.findall(r"[+-]?\d+\.?\d?\d?", line)
-                        if len(mod_values) > 1:
-                            try:
-                                mod_values = (
-                                    (float(mod_values[0]))
-                                    + float(mod_values[1])
-                                ) / 2
-                            except ValueError:
-                                mod_values = None
-                        else:
-                            if mod_values:
-                                mod_values = mod_values[0]
-                        mod_text = re.sub(r"[+-]?\d+\.?\d?\d?", "#", line)
-
-                    mod = None
-                    if not mod_text:
-                        mod_text = line
-                    mod = parse_mod(mod_text, mod_values, category)
-                    if mod:
-                        mods.append(mod)
-                        if mod.mod.type == ItemModifierType.EXPLICIT:
-                            foundExplicit = True  # Dont parse flavor text
-                    else:
-                        logging.info(f"Unable to find mod: {line}")
+                    mod_values = []
+
+                mod = parse_mod(token.template, mod_values, category, context)
+                if mod:
+                    mods.append(mod)
+                    if mod.mod.type == ItemModifierType.EXPLICIT:
+                        foundExplicit = True  # Dont parse flavor text
+                else:
+                    logging.info("Unable to find mod: %s", line)
 
     if rarity == "unique" and identified:
         name = name.replace(" " + base, "")
@@ -1493,7 +1391,7 @@ def parse_item_info(text: str):
             synthesised,
             text,
         )
-        weapon.merge_mods(regions)
+        weapon.merge_mods(lines)
         return weapon
 
     if category == "armour":
@@ -1514,7 +1412,7 @@ def parse_item_info(text: str):
             synthesised,
             text,
         )
-        armour.merge_mods(regions)
+        armour.merge_mods(lines)
         return armour
 
     return Item(
@@ -1,7 +1,12 @@
 from enum import Enum
+from types import MappingProxyType
 
 from attr import attrs
 
+# Options of every mod without any, read only as every mod shares it
+EMPTY_OPTIONS = MappingProxyType({})
+
+
 class ItemModifierType(Enum):
     PSEUDO = "pseudo"
     EXPLICIT = "explicit"
@@ -14,10 +19,27 @@ class ItemModifierType(Enum):
     DELVE = "delve"
 
 
-@attrs(auto_attribs=True, frozen=True)
+@attrs(auto_attribs=True, frozen=True, slots=True)
 class ItemModifier:
     type: ItemModifierType
     id: str
     text: str
     options: dict
+    # Marked "(Local)" by the stats API, only applies to its own item
+    local: bool = False
+
+    def __deepcopy__(self, memo):
+        # Shared by every item with the mod and never changed
+        return self
+
+    def __reduce__(self):
+        # EMPTY_OPTIONS can not be pickled, which item.batch needs
+        return (
+            load_modifier,
+            (self.type, self.id, self.text, self.options or None, self.local),
+        )
+
 
+def load_modifier(type, id, text, options, local):
+    """Unpickle an ItemModifier, sharing EMPTY_OPTIONS again"""
+    return ItemModifier(type, id, text, options or EMPTY_OPTIONS, local)
@@ -0,0 +1,228 @@
+import re
+from enum import Enum
+from typing import NamedTuple
+
+SEPARATOR = "--------"
+
+# Numeric values of a mod line, e.g. "+45", "-10" or "1.55". Captured so
+# that splitting a line gives the text and the numbers in between.
+# Matches the same as [+-]?\d+\.?\d?\d? but starts with a character set,
+# which lets the regex engine skip ahead to the next sign or digit.
+NUMBER = re.compile(r"([+\-\d](?:(?<=\d)\d*|\d+)\.?\d?\d?)")
+
+# Mods where only the first number is the value, the number after the
+# condition is part of the mod text.
+CONDITIONS = ("if you have at least", "inflicted with this Weapon to deal")
+
+SET_MARKUP = re.compile(r"<<set:M?S?>>")
+
+INFLUENCES = {
+    "Elder",
+    "Shaper",
+    "Hunter",
+    "Redeemer",
+    "Warlord",
+    "Crusader",
+}
+
+FLAGS = {"Corrupted", "Mirrored", "Unidentified"}
+
+JEWEL_TEXT = "Place into an allocated Jewel Socket on the Passive Skill Tree. Right click to remove from the Socket."
+
+HEADER_KEYS = ("Rarity", "Name", "Base")
+
+
+class TokenType(Enum):
+    HEADER = "header"
+    PROPERTY = "property"
+    REQUIREMENT = "requirement"
+    SOCKETS = "sockets"
+    ITEM_LEVEL = "item_level"
+    INFLUENCE = "influence"
+    FLAG = "flag"
+    MOD = "mod"
+    TEXT = "text"
+
+
+class Token(NamedTuple):
+    """A single line of item text.
+
+    key and value hold the parts of "Key: value" lines, for headers the
+    key is one of HEADER_KEYS. Mod lines have their numbers in values and
+    the text with those numbers replaced by # in template.
+    """
+
+    type: TokenType
+    region: int
+    text: str
+    key: str = ""
+    value: str = ""
+    template: str = ""
+    values: tuple = ()
+
+
+def split_property(line: str):
+    key, _, value = line.partition(": ")
+    return key, value
+
+
+def text_tokens(region: int, lines: list) -> list:
+    return [Token(TokenType.TEXT, region, line) for line in lines]
+
+
+def get_influence(line: str):
+    """Influence of an "<Influence> Item" line, or None"""
+    if line.count(" ") == 1 and line.endswith(" Item"):
+        influence = line[:-5]
+        if influence in INFLUENCES:
+            return influence.lower()
+    return None
+
+
+def lex_mod(region: int, line: str) -> Token:
+    """Extract the numbers of a mod line and replace them with #
+
+    The line is scanned once, except for mods with a condition.
+    """
+    for condition in CONDITIONS:
+        index = line.find(condition)
+        if index == -1:
+            continue
+        number = NUMBER.search(line)
+        if not number:
+            return Token(TokenType.MOD, region, line, template=line)
+        template = line
+        if number.start() < index:
+            template = line[: number.start()] + "#" + line[number.end() :]
+        return Token(
+            TokenType.MOD,
+            region,
+            line,
+            template=template,
+            values=(number.group(),),
+        )
+
+    parts = NUMBER.split(line)
+    return Token(
+        TokenType.MOD,
+        region,
+        line,
+        template="#".join(parts[::2]),
+        values=tuple(parts[1::2]),
+    )
+
+
+def get_region_type(index: int, first_line: str) -> TokenType:
+    """Type of a region, decided by its first line"""
+    if index == 0:
+        return TokenType.HEADER
+    if first_line.startswith("Requirements"):
+        return TokenType.REQUIREMENT
+    if first_line.startswith("Sockets"):
+        return TokenType.SOCKETS
+    if first_line in FLAGS:
+        return TokenType.FLAG
+    if first_line.startswith("Item Level"):
+        return TokenType.ITEM_LEVEL
+    if first_line.startswith(JEWEL_TEXT):
+        return TokenType.TEXT
+    if first_line.count(" ") == 1 and first_line.endswith("Item"):
+        if get_influence(first_line):
+            return TokenType.INFLUENCE
+        return TokenType.TEXT
+    if index == 1:
+        return TokenType.PROPERTY
+    return TokenType.MOD
+
+
+class Region:
+    """The lines between two separators.
+
+    Regions are typed by their first line and their tokens are lexed, both
+    only when asked for as most builders just need a few of the regions.
+    """
+
+    def __init__(self, index: int, lines: list):
+        self.index = index
+        self.lines = lines
+        self._type = None
+
+    @property
+    def type(self) -> TokenType:
+        if self._type is None:
+            self._type = get_region_type(self.index, self.lines[0])
+        return self._type
+
+    def tokens(self) -> list:
+        """Lex all lines of the region"""
+        index = self.index
+        lines = self.lines
+        kind = self.type
+
+        if kind == TokenType.HEADER:
+            tokens = []
+            for key, line in zip(HEADER_KEYS, lines):
+                if key == "Rarity":
+                    value = split_property(line)[1]
+                elif "<<set:" in line:
+                    value = SET_MARKUP.sub("", line)
+                else:
+                    value = line
+                tokens.append(
+                    Token(TokenType.HEADER, index, line, key, value)
+                )
+            return tokens
+
+        if kind in (TokenType.REQUIREMENT, TokenType.PROPERTY):
+            return [
+                Token(kind, index, line, *split_property(line))
+                for line in lines
+            ]
+
+        if kind == TokenType.SOCKETS:
+            token = Token(kind, index, lines[0], value=lines[0][9:])
+            return [token] + text_tokens(index, lines[1:])
+
+        if kind == TokenType.FLAG:
+            token = Token(kind, index, lines[0], value=lines[0])
+            return [token] + text_tokens(index, lines[1:])
+
+        if kind == TokenType.ITEM_LEVEL:
+            key, value = split_property(lines[0])
+            token = Token(kind, index, lines[0], key, value)
+            return [token] + text_tokens(index, lines[1:])
+
+        if kind == TokenType.INFLUENCE:
+            # Items can have two influences, the second one on the next line
+            tokens = text_tokens(index, lines)
+            for i, line in enumerate(lines[:2]):
+                influence = get_influence(line)
+                if not influence:
+                    break
+                tokens[i] = Token(kind, index, line, value=influence)
+            return tokens
+
+        if kind == TokenType.MOD:
+            return [lex_mod(index, line) for line in lines]
+
+        return text_tokens(index, lines)
+
+
+def lex(text: str) -> list:
+    """Split the text of an item into typed regions.
+
+    Empty regions and the note of a priced item are dropped.
+
+    :param text: Item text, as copied from the game
+    :return: list of Region
+    """
+    regions = []
+    for region in text.split(SEPARATOR):
+        lines = region.strip().splitlines()
+        if lines:
+            regions.append(lines)
+
+    if regions and "Note" in regions[-1][0]:
+        del regions[-1]
+
+    return [Region(i, lines) for i, lines in enumerate(regions)]
@@ -0,0 +1,175 @@
+from array import array
+from collections import Counter
+from enum import IntFlag
+
+from item.itemModifier import ItemModifierType
+from utils import web
+
+MOD_TYPES = list(ItemModifierType)
+
+# Number of mods without one, like pseudo mods we could not look up
+NO_MOD = -1
+
+database = None
+
+
+class ModFlag(IntFlag):
+    """What the pricing rules need to know about a mod
+
+    Pseudo mods go by mod id instead, see item.pseudo.
+    """
+
+    BAD = 1  # Removed first when a search finds nothing
+    DEFENCE = 2  # Searched for by the armour values of the item
+    WEAPON = 4  # Searched for by the DPS of the weapon
+    SPELL = 8  # Counts towards a weapon being a caster weapon
+
+
+# Mods to remove first if no matches are found before relaxing
+# TODO Add more, move to config ( config parse does not support multiple lines atm, prob need to write a custom one)
+BAD_MODS = (
+    "Physical Attack Damage Leeched as Life",
+    "to maximum Mana",
+    "Life gained for each Enemy hit by Attacks",
+    "of Physical Attack Damage Leeched as Mana",
+    "increased Mana Regeneration Rate",
+    "Life gained on Kill",
+    "Mana gained on Kill",
+    "Reflects # Physical Damage to Melee Attackers",
+    "to Armour",
+    "increased Rarity of Items found",
+    "increased Stun Duration",
+    "Regenerate",
+    "Regeneration",
+    "increased Stun and Block Recovery",
+    "Minions have",
+    "additional Physical Damage Reduction against Abyssal Monsters",
+    "reduced Enemy Stun Threshold",
+    "increased Damage against Abyssal Monsters",
+    "increased Movement Speed if you haven't taken Damage Recently",
+    "increased Projectile Speed",
+)
+
+# Mods already covered by the armour, evasion and energy shield values
+DEFENCE_STATS = (
+    "maximum Energy Shield",
+    "increased Energy Shield",
+    "increased Armour",
+    "to Armour",
+    "to Evasion Rating",
+    "increased Evasion Rating",
+)
+
+# Mods already covered by the DPS, speed and crit values of a weapon
+WEAPON_STATS = (
+    "increased Attack Speed",
+    "increased Physical Damage",
+    "total Attack Speed",
+)
+
+
+def classify(text: str) -> ModFlag:
+    """Flags of a mod, from its text"""
+    flags = ModFlag(0)
+    if any(bad in text for bad in BAD_MODS):
+        flags |= ModFlag.BAD
+    if any(stat in text for stat in DEFENCE_STATS):
+        flags |= ModFlag.DEFENCE
+    if (
+        ("Adds # to #" in text and "to Spells" not in text)
+        or text == "#% increased Critical Strike Chance"
+        or any(stat in text for stat in WEAPON_STATS)
+    ):
+        flags |= ModFlag.WEAPON
+    if "Spell" in text:
+        flags |= ModFlag.SPELL
+    return flags
+
+
+class ModDatabase:
+    """All mods of the stats API by a dense number.
+
+    A mod's number indexes the arrays, so checks on a mod are a list
+    lookup instead of a dict probe on its text:
+
+    types: index of the ItemModifierType in MOD_TYPES
+    stats: number of the stat, shared by the explicit, implicit,
+        crafted... versions of a mod
+    local: 1 if the mod only applies to the item it is on
+    duplicate: 1 if other mods of the same type have the same text, so
+        the text does not tell which one the item has
+    options: index in option_tables, or -1 if the mod has no options
+    flags: ModFlag of the mod
+    """
+
+    def __init__(self, mods):
+        # The mod list this was built from, to notice it was replaced
+        self.source = mods
+        self.mods = list(mods or ())
+        self.numbers = {mod.id: i for i, mod in enumerate(self.mods)}
+
+        stat_numbers = {}
+        self.types = array("B")
+        self.stats = array("I")
+        self.local = array("B")
+        self.duplicate = array("B")
+        self.options = array("i")
+        self.flags = array("I")
+        self.option_tables = []
+
+        texts = Counter(
+            (mod.text, mod.type)
+            for mod in self.mods
+            # Left out of the text index, see web.build_text_index
+            if "Allocates # (Additional)" not in mod.text
+        )
+        for mod in self.mods:
+            stat = mod.id.partition(".")[2]
+            self.types.append(MOD_TYPES.index(mod.type))
+            self.stats.append(stat_numbers.setdefault(stat, len(stat_numbers)))
+            self.local.append(mod.local)
+            self.duplicate.append(texts[(mod.text, mod.type)] > 1)
+            self.flags.append(classify(mod.text))
+            if mod.options:
+                self.options.append(len(self.option_tables))
+                self.option_tables.append(mod.options)
+            else:
+                self.options.append(-1)
+
+    def __len__(self):
+        return len(self.mods)
+
+    def get_number(self, mod) -> int:
+        """Number of an ItemModifier, or NO_MOD"""
+        if mod is None:
+            return NO_MOD
+        return self.numbers.get(mod.id, NO_MOD)
+
+
+def get_mod_database() -> ModDatabase:
+    """The database of the currently loaded mods, built on first use
+
+    Rebuilt when the mods are loaded again, like in a worker process
+    seeded with web.load_index_snapshot.
+    """
+    global database
+    current = database
+    if current is None or current.source is not web.mod_list:
+        with web.index_lock:
+            web.get_item_modifiers()
+            if database is None or database.source is not web.mod_list:
+                database = ModDatabase(web.mod_list)
+            current = database
+    return current
+
+
+def get_mod_number(mod) -> int:
+    """Number of an ItemModifier in the mod database, or NO_MOD"""
+    return get_mod_database().get_number(mod)
+
+
+def get_mod_flags(number: int) -> int:
+    """ModFlag bits of the mod with the given number"""
+    if number == NO_MOD:
+        return 0
+    return get_mod_database().flags[number]
@@ -0,0 +1,217 @@
+from types import MappingProxyType
+from typing import NamedTuple
+
+from item.itemModifier import ItemModifierType
+from item.modDatabase import ModFlag
+
+# Mod types that count towards pseudo mods
+SOURCE_TYPES = (
+    ItemModifierType.EXPLICIT,
+    ItemModifierType.IMPLICIT,
+    ItemModifierType.CRAFTED,
+    ItemModifierType.FRACTURED,
+)
+
+
+class PseudoRule(NamedTuple):
+    """Mods that add up to a pseudo mod, by the stat part of their id.
+
+    The sources are replaced by the pseudo mod in the search. The extra
+    mods add to it but are kept, as they do more than that. The pseudo
+    mod is only made for items that have one of its sources.
+    """
+
+    pseudo: str
+    sources: dict  # stat -> weight
+    extra: dict = MappingProxyType({})  # stat -> weight
+
+
+PSEUDO_RULES = (
+    PseudoRule(
+        "pseudo.pseudo_total_elemental_resistance",
+        {
+            "stat_3372524247": 1,  # Fire resist
+            "stat_4220027924": 1,  # Cold resist
+            "stat_1671376347": 1,  # Lightning resist
+            "stat_2915988346": 2,  # Fire and cold resists
+            "stat_3441501978": 2,  # Fire and lightning resists
+            "stat_4277795662": 2,  # Cold and lightning resists
+            "stat_2901986750": 3,  # All resists
+            "stat_378817135": 1,  # Fire and chaos resists
+            "stat_3393628375": 1,  # Cold and chaos resists
+            "stat_3465022881": 1,  # Lightning and chaos resists
+        },
+    ),
+    PseudoRule(
+        "pseudo.pseudo_total_chaos_resistance",
+        {
+            "stat_2923486259": 1,  # Chaos resist
+            "stat_378817135": 1,  # Fire and chaos resists
+            "stat_3393628375": 1,  # Cold and chaos resists
+            "stat_3465022881": 1,  # Lightning and chaos resists
+        },
+    ),
+    PseudoRule(
+        "pseudo.pseudo_total_strength",
+        {
+            "stat_4080418644": 1,  # Strength
+            "stat_538848803": 1,  # Strength and dexterity
+            "stat_1535626285": 1,  # Strength and intelligence
+            "stat_1379411836": 1,  # All attributes
+        },
+    ),
+    PseudoRule(
+        "pseudo.pseudo_total_dexterity",
+        {
+            "stat_3261801346": 1,  # Dexterity
+            "stat_538848803": 1,  # Strength and dexterity
+            "stat_2300185227": 1,  # Dexterity and intelligence
+            "stat_1379411836": 1,  # All attributes
+        },
+    ),
+    PseudoRule(
+        "pseudo.pseudo_total_intelligence",
+        {
+            "stat_328541901": 1,  # Intelligence
+            "stat_1535626285": 1,  # Strength and intelligence
+            "stat_2300185227": 1,  # Dexterity and intelligence
+            "stat_1379411836": 1,  # All attributes
+        },
+    ),
+    PseudoRule(
+        "pseudo.pseudo_total_life",
+        {"stat_3299347043": 1},  # Maximum life
+        # Every 10 strength gives 5 life
+        {
+            "stat_4080418644": 0.5,  # Strength
+            "stat_538848803": 0.5,  # Strength and dexterity
+            "stat_1535626285": 0.5,  # Strength and intelligence
+            "stat_1379411836": 0.5,  # All attributes
+        },
+    ),
+    PseudoRule(
+        "pseudo.pseudo_total_mana",
+        {"stat_1050105434": 1},  # Maximum mana
+        # Every 10 intelligence gives 5 mana
+        {
+            "stat_328541901": 0.5,  # Intelligence
+            "stat_1535626285": 0.5,  # Strength and intelligence
+            "stat_2300185227": 0.5,  # Dexterity and intelligence
+            "stat_1379411836": 0.5,  # All attributes
+        },
+    ),
+    PseudoRule(
+        "pseudo.pseudo_total_energy_shield",
+        {"stat_3489782002": 1},  # Maximum energy shield
+    ),
+    PseudoRule(
+        "pseudo.pseudo_increased_energy_shield",
+        {"stat_2482852589": 1},  # Increased maximum energy shield
+    ),
+    PseudoRule(
+        "pseudo.pseudo_increased_movement_speed",
+        {"stat_2250533757": 1},  # Movement speed
+    ),
+    PseudoRule(
+        "pseudo.pseudo_total_attack_speed",
+        {"stat_681332047": 1},  # Attack speed
+    ),
+    PseudoRule(
+        "pseudo.pseudo_total_cast_speed",
+        {"stat_2891184298": 1},  # Cast speed
+    ),
+    PseudoRule(
+        "pseudo.pseudo_critical_strike_chance_for_spells",
+        {"stat_737908626": 1},  # Critical strike chance for spells
+        {"stat_587431675": 1},  # Global critical strike chance
+    ),
+    PseudoRule(
+        "pseudo.pseudo_global_critical_strike_multiplier",
+        {"stat_3556824919": 1},  # Global critical strike multiplier
+    ),
+    PseudoRule(
+        "pseudo.pseudo_increased_elemental_damage_with_attack_skills",
+        {"stat_387439868": 1},  # Elemental damage with attack skills
+    ),
+    PseudoRule(
+        "pseudo.pseudo_increased_elemental_damage",
+        {"stat_3141070085": 1},  # Elemental damage
+    ),
+    PseudoRule(
+        "pseudo.pseudo_increased_fire_damage",
+        {"stat_3962278098": 1},  # Fire damage
+    ),
+    PseudoRule(
+        "pseudo.pseudo_increased_cold_damage",
+        {"stat_3291658075": 1},  # Cold damage
+    ),
+    PseudoRule(
+        "pseudo.pseudo_increased_lightning_damage",
+        {"stat_2231156303": 1},  # Lightning damage
+    ),
+    PseudoRule(
+        "pseudo.pseudo_increased_spell_damage",
+        {"stat_2974417149": 1},  # Spell damage
+    ),
+)
+
+
+def compile_rules(rules) -> dict:
+    """Turn pseudo rules into a lookup by mod id
+
+    :param rules: PseudoRule objects
+    :return: dict of mod id to a tuple of (pseudo, weight, is source)
+        for every pseudo mod the mod adds to
+    """
+    feeds = {}
+    for rule in rules:
+        for stats, is_source in ((rule.sources, True), (rule.extra, False)):
+            for stat, weight in stats.items():
+                for mod_type in SOURCE_TYPES:
+                    mod_id = f"{mod_type.value}.{stat}"
+                    feeds.setdefault(mod_id, []).append(
+                        (rule.pseudo, weight, is_source)
+                    )
+    return {mod_id: tuple(feed) for mod_id, feed in feeds.items()}
+
+
+PSEUDO_FEEDS = compile_rules(PSEUDO_RULES)
+
+
+def aggregate(mods: list):
+    """Add up the mods of an item into pseudo mods, in one pass
+
+    :param mods: ModInfo objects of the item
+    :return: tuple of the mods to keep, the mods replaced by pseudo mods,
+        a dict of pseudo mod id to its total, in the order of
+        PSEUDO_RULES, and the set of pseudo mods all of whose sources are
+        flagged ModFlag.BAD, which are as bad as their sources
+    """
+    kept = []
+    replaced = []
+    totals = {}
+    found = set()
+    good = set()
+    for mod in mods:
+        feed = PSEUDO_FEEDS.get(mod.mod.id) if mod.mod else None
+        if not feed or mod.min is None:
+            kept.append(mod)
+            continue
+
+        is_replaced = False
+        value = float(mod.min)
+        for pseudo, weight, is_source in feed:
+            totals[pseudo] = totals.get(pseudo, 0) + weight * value
+            if is_source:
+                found.add(pseudo)
+                if not mod.flags & ModFlag.BAD:
+                    good.add(pseudo)
+                is_replaced = True
+        (replaced if is_replaced else kept).append(mod)
+
+    totals = {
+        rule.pseudo: totals[rule.pseudo]
+        for rule in PSEUDO_RULES
+        if rule.pseudo in found and totals[rule.pseudo] > 0
+    }
+    return kept, replaced, totals, found - good
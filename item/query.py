@@ -0,0 +1,121 @@
+import hashlib
+import json
+from types import MappingProxyType
+
+# Paths of the parts of a trade query that filters are added to
+QUERY = ("query",)
+MISC_FILTERS = ("query", "filters", "misc_filters", "filters")
+TYPE_FILTERS = ("query", "filters", "type_filters", "filters")
+SOCKET_FILTERS = ("query", "filters", "socket_filters", "filters")
+STAT_FILTERS = ("query", "stats", 0, "filters")
+
+
+def freeze(value):
+    """Read only copy of a JSON value, to share between queries"""
+    if isinstance(value, dict):
+        return MappingProxyType({k: freeze(v) for k, v in value.items()})
+    if isinstance(value, list):
+        return tuple(freeze(v) for v in value)
+    return value
+
+
+def thaw(value):
+    """Editable copy of a value made by freeze"""
+    if isinstance(value, MappingProxyType):
+        return {k: thaw(v) for k, v in value.items()}
+    if isinstance(value, tuple):
+        return [thaw(v) for v in value]
+    return value
+
+
+# Search for items on pathofexile.com/trade
+SEARCH = freeze(
+    {
+        "query": {
+            "status": {"option": "online"},
+            "filters": {
+                "misc_filters": {"filters": {}},
+                "type_filters": {"filters": {}},
+                "socket_filters": {
+                    "filters": {"sockets": {}, "links": {}},
+                },
+            },
+            "stats": [{"type": "and", "filters": []}],
+        },
+        "sort": {"price": "asc"},
+    }
+)
+
+# Bulk exchange of currency for chaos
+EXCHANGE = freeze(
+    {
+        "exchange": {
+            "status": {"option": "online"},
+            "have": ["chaos"],
+            "want": [],
+        },
+    }
+)
+
+# Search by name only, for currency the bulk exchange does not list
+NAME_SEARCH = freeze(
+    {
+        "query": {},
+        "status": {"option": "online"},
+        "sort": {"price": "asc"},
+    }
+)
+
+
+def canonical_json(query) -> bytes:
+    """Encode a query the same way every time, sorted and compact
+
+    The result is what we send to the trade API, and can be used to tell
+    whether two queries are the same.
+    """
+    return json.dumps(
+        query, sort_keys=True, separators=(",", ":"), ensure_ascii=False
+    ).encode("utf-8")
+
+
+def get_query_hash(query) -> str:
+    """Short digest of a query, the same for queries that are the same"""
+    return hashlib.blake2b(canonical_json(query), digest_size=16).hexdigest()
+
+
+class QueryBuilder:
+    """A trade query as a list of edits to a shared skeleton.
+
+    Each edit sets the value at a path of keys (and list indexes). Missing
+    dicts along a path are created, paths must not go through a value set
+    by another edit.
+    """
+
+    def __init__(self, skeleton=SEARCH):
+        self.skeleton = skeleton
+        self.edits = []
+
+    def set(self, path: tuple, value):
+        """Set the value at path, later edits win
+
+        :return: this builder, so edits can be chained
+        """
+        self.edits.append((path, value))
+        return self
+
+    def build(self) -> dict:
+        """The query as a dict, ready to be encoded"""
+        query = thaw(self.skeleton)
+        for path, value in self.edits:
+            target = query
+            for key in path[:-1]:
+                if isinstance(target, list):
+                    target = target[key]
+                else:
+                    target = target.setdefault(key, {})
+            target[path[-1]] = value
+        return query
+
+    def to_bytes(self) -> bytes:
+        """The query encoded by canonical_json"""
+        return canonical_json(self.build())
@@ -1,8 +1,17 @@
+import calendar
+import configparser
 import io
 import json
+import os
+import random
+import re
+import shutil
 import sys
+import tempfile
+import time
 import unittest
 from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timezone
 from unittest.mock import patch
 
@@ -11,14 +20,43 @@ from colorama import Fore, deinit, init
 
 import Accounting
 from gui.gui import close_all_windows, init_gui
+from item import generator
+from item.batch import parse_items
+from item.itemModifier import EMPTY_OPTIONS, ItemModifier, ItemModifierType
+from item.lexer import TokenType, lex, lex_mod
+from item.modDatabase import NO_MOD, ModFlag, classify, get_mod_database
+from item.pseudo import PSEUDO_FEEDS, PSEUDO_RULES, aggregate
+from item.query import (
+    MISC_FILTERS,
+    SEARCH,
+    QueryBuilder,
+    canonical_json,
+    get_query_hash,
+)
 from tests.mocks import *
 from tests.sampleItems import items
-from utils import config, web
+from utils import (
+    common,
+    config,
+    history,
+    journal,
+    ninja,
+    planner,
+    pricing,
+    web,
+)
 
 LOOKUP_URL = "https://www.pathofexile.com/api/trade/search/Standard"
 EXCHANGE_URL = "https://www.pathofexile.com/api/trade/exchange/Standard"
 
 
+def make_temp_dir(test) -> str:
+    """A temporary directory that is removed when the test is done"""
+    directory = tempfile.mkdtemp()
+    test.addCleanup(shutil.rmtree, directory)
+    return directory
+
+
 class TestItemLookup(unittest.TestCase):
     @patch("tkinter.Tk", TkMock)
     @patch("tkinter.Toplevel", ToplevelMock)
@@ -113,16 +151,7 @@ class TestItemLookup(unittest.TestCase):
                 # Mockup response
                 with requests_mock.Mocker() as mock:
                     mock.post(expected[i][2], json=expected[i][0])
-                    with open("tests/mockModifiers.txt") as f:
-                        mock.get(
-                            "https://www.pathofexile.com/api/trade/data/stats",
-                            json=json.load(f),
-                        )
-                    with open("tests/mockItems.txt") as f:
-                        mock.get(
-                            "https://www.pathofexile.com/api/trade/data/items",
-                            json=json.load(f),
-                        )
+                    mockTradeData(mock)
 
                     poePricesRes = {
                         "min": 57.760000000000005,
@@ -326,16 +355,7 @@ class TestBaseLookup(unittest.TestCase):
                 "https://poe.ninja/api/data/itemoverview?league=Standard&type=BaseType&language=en",
                 json=data,
             )
-            with open("tests/mockModifiers.txt") as f:
-                mock.get(
-                    "https://www.pathofexile.com/api/trade/data/stats",
-                    json=json.load(f),
-                )
-            with open("tests/mockItems.txt") as f:
-                mock.get(
-                    "https://www.pathofexile.com/api/trade/data/items",
-                    json=json.load(f),
-                )
+            mockTradeData(mock)
 
             for i in range(len(items[:2])):
                 item = items[i]
@@ -366,6 +386,842 @@ class TestBaseLookup(unittest.TestCase):
         close_all_windows()
 
 
+class TestItemLexer(unittest.TestCase):
+    def test_lex_regions(self):
+        regions = lex(items[1])
+        types = [region.type for region in regions]
+        self.assertEqual(
+            types,
+            [
+                TokenType.HEADER,
+                TokenType.PROPERTY,
+                TokenType.REQUIREMENT,
+                TokenType.SOCKETS,
+                TokenType.ITEM_LEVEL,
+                TokenType.MOD,
+                TokenType.FLAG,
+            ],
+        )
+        header = {t.key: t.value for t in regions[0].tokens()}
+        self.assertEqual(header["Base"], "Destroyer Regalia")
+        self.assertEqual(regions[4].tokens()[0].value, "82")
+
+    def test_lex_mod(self):
+        token = lex_mod(5, "Adds 5 to 10.5 Physical Damage to Attacks")
+        self.assertEqual(token.template, "Adds # to # Physical Damage to Attacks")
+        self.assertEqual(token.values, ("5", "10.5"))
+
+        token = lex_mod(
+            5,
+            "Skills which throw Mines throw up to 1 additional Mine if you have at least 800 Dexterity",
+        )
+        self.assertEqual(
+            token.template,
+            "Skills which throw Mines throw up to # additional Mine if you have at least 800 Dexterity",
+        )
+        self.assertEqual(token.values, ("1",))
+
+
+class TestItemClasses(unittest.TestCase):
+    def test_register_item_class(self):
+        marker = "Right-click to add this prophecy to your character."
+        prophecy = generator.marker_parsers[marker]
+        try:
+
+            @generator.register_item_class(marker)
+            def parse_custom(regions, rarity, name, quality, text):
+                return (name, len(regions))
+
+            self.assertEqual(
+                generator.parse_item_info(items[10]),
+                ("The Jeweller's Touch", 4),
+            )
+        finally:
+            generator.register_item_class(marker)(prophecy)
+
+
+class TestBatchParse(unittest.TestCase):
+    def test_parse_items(self):
+        broken = "Rarity: Gem\nBroken\n--------\nSpell"
+        texts = items + [broken, "Not an item"]
+        with requests_mock.Mocker() as mock:
+            mockTradeData(mock)
+            with self.assertLogs(level="INFO"):
+                expected = [generator.parse_item_info(t) for t in items]
+            results = parse_items(texts, workers=2)
+
+        self.assertEqual(len(results), len(texts))
+        for (item, error), other in zip(results, expected):
+            self.assertIsNone(error)
+            self.assertEqual(type(item), type(other))
+            self.assertEqual(item.name, other.name)
+        self.assertIsNone(results[-2][0])
+        self.assertIsInstance(results[-2][1], IndexError)
+        self.assertEqual(results[-1], (None, None))
+
+
+def describe_item(item):
+    """Everything parsing decides about an item, to compare results"""
+    if item is None:
+        return None
+    mods = getattr(item, "mods", [])
+    return (
+        type(item).__name__,
+        item.name,
+        [(m.mod.id, m.min, m.max, m.option) for m in mods],
+    )
+
+
+class TestModDatabase(unittest.TestCase):
+    def test_mod_database(self):
+        def mod(id, text, local=False):
+            kind = ItemModifierType(id.partition(".")[0])
+            return ItemModifier(kind, id, text, EMPTY_OPTIONS, local)
+
+        mods = [
+            mod("explicit.stat_1", "# to maximum Life"),
+            mod("implicit.stat_1", "# to maximum Life"),
+            mod("explicit.stat_2", "#% increased Physical Damage", True),
+            mod("explicit.stat_3", "#% increased Physical Damage"),
+        ]
+        with patch.object(web, "mod_list", mods):
+            db = get_mod_database()
+            self.assertIs(get_mod_database(), db)
+            self.assertEqual(
+                [db.get_number(m) for m in mods] + [db.get_number(None)],
+                [0, 1, 2, 3, NO_MOD],
+            )
+            self.assertEqual(list(db.stats), [0, 0, 1, 2])
+            self.assertEqual(list(db.local), [0, 0, 1, 0])
+            self.assertEqual(list(db.duplicate), [0, 0, 1, 1])
+
+        # A new mod list gets a new database
+        with patch.object(web, "mod_list", mods[:1]):
+            self.assertEqual(len(get_mod_database()), 1)
+
+    def test_classify(self):
+        self.assertEqual(
+            classify("#% increased Critical Strike Chance for Spells"),
+            ModFlag.SPELL,
+        )
+        self.assertEqual(
+            classify("# to Armour"), ModFlag.BAD | ModFlag.DEFENCE
+        )
+        self.assertEqual(
+            classify("Adds # to # Physical Damage"), ModFlag.WEAPON
+        )
+        self.assertEqual(
+            classify("Adds # to # Fire Damage to Spells"), ModFlag.SPELL
+        )
+        self.assertEqual(classify("+# to maximum Life"), 0)
+
+
+class TestPseudoMods(unittest.TestCase):
+    def test_create_pseudo_mods(self):
+        with requests_mock.Mocker() as mock:
+            mockTradeData(mock)
+            # Every rule is about mods the stats API knows
+            for rule in PSEUDO_RULES:
+                self.assertIsNotNone(web.get_item_modifiers_by_id(rule.pseudo))
+            known = [
+                mod_id
+                for mod_id in PSEUDO_FEEDS
+                if web.get_item_modifiers_by_id(mod_id)
+            ]
+            for rule in PSEUDO_RULES:
+                for stat in list(rule.sources) + list(rule.extra):
+                    self.assertTrue(
+                        any(mod_id.endswith(stat) for mod_id in known)
+                    )
+
+            with self.assertLogs(level="INFO"):
+                item = generator.build_item(items[2])
+                replaced = item.create_pseudo_mods()
+                intelligence = generator.build_item(items[6])
+                intelligence.create_pseudo_mods()
+            chaos = web.get_item_modifiers_by_id("explicit.stat_2923486259")
+            # Negative totals are no pseudo mod worth searching for
+            negative = generator.ModInfo(chaos, -20, None, None)
+            self.assertEqual(aggregate([negative])[2], {})
+
+        self.assertEqual(
+            sorted(mod.mod.text for mod in replaced),
+            [
+                "# to maximum Life",
+                "#% to Fire and Cold Resistances",
+                "#% to Lightning Resistance",
+            ],
+        )
+        totals = {
+            mod.mod.id: mod.min
+            for mod in item.mods
+            if mod.mod.type == ItemModifierType.PSEUDO
+        }
+        self.assertEqual(
+            totals,
+            {
+                "pseudo.pseudo_total_elemental_resistance": 61,
+                "pseudo.pseudo_total_life": 94,
+            },
+        )
+        # Intelligence adds to mana, but only items with mana get the
+        # pseudo mod
+        self.assertNotIn(
+            "pseudo.pseudo_total_mana",
+            [mod.mod.id for mod in intelligence.mods],
+        )
+
+    def test_bad_pseudo_mods(self):
+        with requests_mock.Mocker() as mock:
+            mockTradeData(mock)
+            with self.assertLogs(level="INFO"):
+                item = generator.build_item(items[2])
+                mana = web.get_item_modifiers_by_id("explicit.stat_1050105434")
+                item.mods.append(generator.ModInfo(mana, 40, None, None))
+                item.create_pseudo_mods()
+
+        def pseudo_ids():
+            return [
+                mod.mod.id
+                for mod in item.mods
+                if mod.mod.type == ItemModifierType.PSEUDO
+            ]
+
+        # Maximum mana is a bad mod, so its total is one too
+        self.assertIn("pseudo.pseudo_total_mana", pseudo_ids())
+        item.remove_bad_mods()
+        self.assertNotIn("pseudo.pseudo_total_mana", pseudo_ids())
+        self.assertIn("pseudo.pseudo_total_life", pseudo_ids())
+
+
+class TestQueryBuilder(unittest.TestCase):
+    def test_query_builder(self):
+        query = QueryBuilder()
+        query.set(("query", "type"), "Two-Stone Ring")
+        query.set(MISC_FILTERS + ("ilvl",), {"min": 84})
+        query.set(("query", "filters", "armour_filters", "filters"), {})
+        built = query.build()
+
+        self.assertEqual(built["query"]["type"], "Two-Stone Ring")
+        self.assertEqual(
+            built["query"]["filters"]["misc_filters"]["filters"],
+            {"ilvl": {"min": 84}},
+        )
+        self.assertIn("armour_filters", built["query"]["filters"])
+        # The skeleton is shared, building must not change it
+        self.assertNotIn("type", SEARCH["query"])
+        self.assertNotIn("type", QueryBuilder().build()["query"])
+
+        # Same query, same bytes, whatever order the keys were set in
+        other = QueryBuilder()
+        other.set(("query", "filters", "armour_filters", "filters"), {})
+        other.set(MISC_FILTERS + ("ilvl",), {"min": 84})
+        other.set(("query", "type"), "Two-Stone Ring")
+        self.assertEqual(query.to_bytes(), other.to_bytes())
+        self.assertEqual(query.to_bytes(), canonical_json(built))
+
+
+class TestPriceStats(unittest.TestCase):
+    def test_get_price_stats(self):
+        def listing(account, amount, currency="chaos", hours=0):
+            return {
+                "listing": {
+                    "account": {"name": account},
+                    "price": {"amount": amount, "currency": currency},
+                    "indexed": datetime.fromtimestamp(
+                        1600000000 - hours * 3600, tz=timezone.utc
+                    ).strftime("%Y-%m-%dT%H:%M:%SZ"),
+                }
+            }
+
+        trade_info = [
+            listing("fixer", 1),  # Price fixer, far below everyone else
+            listing("a", 10),
+            listing("a", 11),  # Same seller again
+            listing("b", 12, hours=24),
+            listing("c", 14, hours=24),
+            listing("d", 16),
+            listing("e", 1, "exa"),  # No rate for exalts
+        ]
+        with patch.object(pricing, "numpy", None):
+            stats = pricing.get_price_stats(trade_info)
+
+        self.assertEqual(stats.listings, 4)
+        self.assertEqual(stats.outliers, 1)
+        self.assertEqual(stats.median, 13)
+        self.assertEqual((stats.q1, stats.q3), (11.5, 14.5))
+        self.assertEqual(stats.min_of_k, 12)
+        # The listings of a day ago count half
+        self.assertEqual(stats.weighted, (10 + 16 + (12 + 14) / 2) / 3)
+        self.assertIsNone(pricing.get_price_stats(trade_info[-1:]))
+
+    @unittest.skipIf(pricing.numpy is None, "NumPy is not installed")
+    def test_numpy_matches_python(self):
+        rng = random.Random(7)
+        for size in (1, 2, pricing.MIN_TO_TRIM - 1, pricing.MIN_TO_TRIM, 50):
+            prices = [rng.choice((1, 5, 20, 1000)) for _ in range(size)]
+            prices = [price * rng.uniform(0.5, 2) for price in prices]
+            ages = [rng.uniform(0, 5 * 86400) for _ in range(size)]
+            python = pricing.get_stats_python(prices, ages)
+            numpy = pricing.get_stats_numpy(prices, ages)
+            self.assertEqual(python[:2], numpy[:2])
+            for a, b in zip(python[2:], numpy[2:]):
+                self.assertAlmostEqual(a, b)
+
+    def test_trade_data_in_chaos(self):
+        def listing(account, amount, currency):
+            return {
+                "listing": {
+                    "account": {"name": account},
+                    "price": {"amount": amount, "currency": currency},
+                    "indexed": "2020-09-13T12:26:40Z",
+                }
+            }
+
+        trade_info = [
+            listing("a", 1, "exa"),
+            listing("b", 40, "alch"),
+            listing("c", 20, "chaos"),
+            listing("d", 1, "mir"),  # No rate for mirrors
+            listing("b", 45, "alch"),  # Same seller again
+        ]
+        item = unittest.mock.Mock()
+        item.get_json.return_value = {"query": {"name": "Chaos test"}}
+        rates = {"chaos": 1.0, "alch": 0.25, "exa": 150.0}
+        with patch.object(common, "get_response") as get_response, patch(
+            "utils.common.fetch", return_value=trade_info
+        ), patch("utils.common.get_currency_rates", return_value=rates):
+            get_response.return_value = {"result": ["x"] * 4}
+            data, count, stats = common.get_trade_data(item)
+
+        self.assertEqual(count, 4)
+        self.assertEqual(
+            [(price, values[2]) for price, values in data.items()],
+            [
+                ("40 Alch (10 chaos)", 10),
+                ("20 Chaos", 20),
+                ("1 Exalt (150 chaos)", 150),
+                ("1 Mirror", None),
+            ],
+        )
+        self.assertEqual(stats.listings, 3)
+
+    def test_parse_timestamp(self):
+        for text in (
+            "1970-01-01T00:00:00Z",
+            "2000-02-29T23:59:59Z",
+            "2020-12-31T12:34:56Z",
+        ):
+            expected = calendar.timegm(
+                datetime.strptime(text, "%Y-%m-%dT%H:%M:%SZ").timetuple()
+            )
+            self.assertEqual(pricing.parse_timestamp(text), expected)
+
+
+class TestPriceIndexes(unittest.TestCase):
+    def refresh(self, overviews):
+        """Load every price index from mocked poe.ninja overviews
+
+        :param overviews: dict of overview type to its lines
+        """
+        config.LEAGUE = "Standard"
+        self.addCleanup(web.clear_league_caches)
+        with requests_mock.Mocker() as mock:
+            mock.get(re.compile("https://poe.ninja/"), json={"lines": []})
+            for name, lines in overviews.items():
+                mock.get(
+                    re.compile(f"overview\\?league=Standard&type={name}&"),
+                    json={"lines": lines},
+                )
+            for index in ninja.indexes:
+                index.refresh("Standard")
+
+    def test_stackable_prices(self):
+        self.refresh(
+            {
+                "Currency": [
+                    {"currencyTypeName": name, "chaosEquivalent": chaos}
+                    for name, chaos in (
+                        ("Exalted Orb", 150),
+                        ("Orb of Alchemy", 0.5),
+                        ("Unknown Orb", 3),
+                    )
+                ],
+                "DivinationCard": [{"name": "The Wolf", "chaosValue": 2}],
+            }
+        )
+        self.assertEqual(ninja.get_stackable_price("The Wolf").chaos, 2)
+        self.assertIsNone(ninja.get_stackable_price("Unknown Orb"))
+        self.assertEqual(ninja.format_price(300), "2.00 exalted (300 chaos)")
+
+        rates = ninja.get_currency_rates()
+        self.assertEqual(rates, {"chaos": 1, "exa": 150, "alch": 0.5})
+
+        trade_info = [
+            {
+                "listing": {
+                    "account": {"name": account},
+                    "price": {"amount": amount, "currency": currency},
+                    "indexed": "2020-01-01T00:00:00Z",
+                }
+            }
+            for account, amount, currency in (
+                ("a", 1, "exa"),
+                ("b", 100, "chaos"),
+                ("c", 40, "alch"),
+            )
+        ]
+        stats = pricing.get_price_stats(trade_info, rates)
+        self.assertEqual((stats.listings, stats.median), (3, 100))
+
+        web.clear_league_caches()
+        self.assertEqual(ninja.get_currency_rates(), pricing.DEFAULT_RATES)
+
+    def test_unique_prices(self):
+        def line(name, base, chaos, links=0, variant=None, itemClass=3):
+            return {
+                "name": name,
+                "baseType": base,
+                "chaosValue": chaos,
+                "links": links,
+                "variant": variant,
+                "itemClass": itemClass,
+            }
+
+        self.refresh(
+            {
+                "UniqueArmour": [
+                    line("Tabula Rasa", "Simple Robe", 10),
+                    line("Tabula Rasa", "Simple Robe", 1, itemClass=9),
+                    line("Belly of the Beast", "Full Wyrmscale", 2),
+                    line("Belly of the Beast", "Full Wyrmscale", 40, 6),
+                ],
+                "UniqueJewel": [
+                    line("Watcher's Eye", "Prismatic Jewel", 900, 0, "Haste"),
+                    line("Watcher's Eye", "Prismatic Jewel", 5, 0, "Wrath"),
+                ],
+            }
+        )
+        self.assertEqual(
+            ninja.get_unique_price("Tabula Rasa Simple Robe", "Simple Robe"),
+            (10, ninja.unique_prices.updated, ()),
+        )
+        belly = ninja.get_unique_price(
+            "Belly of the Beast", "Full Wyrmscale", 6
+        )
+        self.assertEqual((belly.chaos, belly.details), (40, ("6 links",)))
+        eye = ninja.get_unique_price("Watcher's Eye", "Prismatic Jewel")
+        self.assertEqual(eye.chaos, 5)
+        self.assertEqual(
+            eye.details, ("Wrath: 5 chaos", "Haste: 900 chaos"),
+        )
+        self.assertIsNone(ninja.get_unique_price("Kaom's Heart", "Glorious"))
+
+    def test_gem_prices(self):
+        self.refresh(
+            {
+                "SkillGem": [
+                    {
+                        "name": "Empower Support",
+                        "gemLevel": level,
+                        "gemQuality": quality,
+                        "corrupted": corrupted,
+                        "chaosValue": chaos,
+                    }
+                    for level, quality, corrupted, chaos in (
+                        (1, 0, False, 5),
+                        (3, 0, False, 300),
+                        (4, 0, True, 2000),
+                        (3, 20, False, 400),
+                    )
+                ]
+                # Lines may leave out that the gem is not corrupted
+                + [{"name": "Enhance Support", "gemLevel": 1, "chaosValue": 9}]
+            }
+        )
+
+        def price(level, quality, corrupted=False):
+            return ninja.get_gem_price(
+                "Empower Support", level, quality, corrupted
+            ).chaos
+
+        self.assertEqual(price(3, 0), 300)
+        # Rounded down to the quality poe.ninja lists
+        self.assertEqual(price(3, 22), 400)
+        # Nearest version that is not better than the gem
+        self.assertEqual(price(2, 20), 5)
+        self.assertEqual(price(3, 20, True), 2000)
+        self.assertIsNone(ninja.get_gem_price("Unknown", 20, 20, False))
+        self.assertEqual(
+            ninja.get_gem_price("Enhance Support", 1, 0, False).chaos, 9
+        )
+
+    def test_map_prices(self):
+        def line(name, tier, chaos, variant=None):
+            return {
+                "name": name,
+                "baseType": "Strand Map",
+                "mapTier": tier,
+                "variant": variant,
+                "chaosValue": chaos,
+            }
+
+        self.refresh(
+            {
+                "Map": [
+                    line("Strand Map", 13, 4),
+                    line("Strand Map", 14, 6),
+                    line("Strand Map", 13, 30, "Shaper"),
+                ],
+                "BlightedMap": [line("Blighted Strand Map", 13, 9)],
+            }
+        )
+
+        def price(name, tier, influence=None):
+            return ninja.get_map_price(name, "Strand Map", tier, influence)
+
+        self.assertEqual(price("Strand Map", 13).chaos, 4)
+        self.assertEqual(price("Blighted Strand Map", 13).chaos, 9)
+        self.assertEqual(price("Strand Map", 13, "The Shaper").chaos, 30)
+        elder = price("Strand Map", 14, "The Elder")
+        self.assertEqual(elder.chaos, 6)
+        self.assertIn("Priced without influence", elder.details)
+        self.assertIsNone(price("Blighted Strand Map", 14))
+        # Magic maps have a prefix before the kind, rare maps a name of
+        # their own
+        magic = "Fecund Blighted Strand Map of Bameth"
+        self.assertEqual(price(magic, 13).chaos, 9)
+        rare = generator.Map(
+            "Whispering Cage",
+            "Blighted Strand Map",
+            "rare",
+            13,
+            0,
+            0,
+            0,
+            [],
+            True,
+            [],
+        )
+        self.assertTrue(rare.is_blighted())
+        self.assertEqual(rare.get_ninja_price().chaos, 9)
+
+
+class TestParsedItemCache(unittest.TestCase):
+    def test_parse_item_info_copies(self):
+        generator.parsed_items.clear()
+        with requests_mock.Mocker() as mock:
+            mockTradeData(mock)
+            with patch.object(
+                generator, "build_item", wraps=generator.build_item
+            ) as build:
+                first = generator.parse_item_info(items[0])
+                first.mods.clear()
+                second = generator.parse_item_info(
+                    items[0].replace("\n", "\r\n") + "\n"
+                )
+
+        build.assert_called_once()
+        self.assertIsNot(first, second)
+        self.assertTrue(second.mods)
+        self.assertIs(
+            second.mods[0].mod,
+            generator.parsed_items[generator.get_item_key(items[0])]
+            .mods[0]
+            .mod,
+        )
+
+
+class TestParallelParse(unittest.TestCase):
+    def test_parallel_matches_serial(self):
+        texts = [items[i % len(items)] for i in range(len(items) * 20)]
+        random.Random(0).shuffle(texts)
+
+        with requests_mock.Mocker() as mock:
+            mockTradeData(mock)
+            with self.assertLogs(level="INFO"):
+                serial = [
+                    describe_item(generator.build_item(t)) for t in texts
+                ]
+
+            # Start from empty caches, so the threads also race to build
+            # them
+            with patch.multiple(
+                web,
+                mod_list=[],
+                mod_list_dict_id={},
+                mod_list_dict_text={},
+                item_cache=[],
+            ):
+                with self.assertLogs(level="INFO"):
+                    with ThreadPoolExecutor(max_workers=8) as executor:
+                        threaded = list(
+                            executor.map(
+                                lambda t: describe_item(
+                                    generator.build_item(t)
+                                ),
+                                texts,
+                            )
+                        )
+
+            processes = [
+                describe_item(item) for item, _ in parse_items(texts, 4)
+            ]
+
+        self.assertEqual(threaded, serial)
+        self.assertEqual(processes, serial)
+
+
+class TestRateLimit(unittest.TestCase):
+    def test_get_retry_after(self):
+        def retry_after(value):
+            headers = {} if value is None else {"Retry-After": value}
+            return web.get_retry_after(unittest.mock.Mock(headers=headers))
+
+        self.assertEqual(retry_after("12"), 12)
+        self.assertEqual(retry_after(None), web.RATE_LIMIT_WAIT)
+        self.assertEqual(retry_after("soon"), web.RATE_LIMIT_WAIT)
+        self.assertEqual(retry_after("Wed, 21 Oct 2015 07:28:00 GMT"), 0)
+        later = time.strftime(
+            "%a, %d %b %Y %H:%M:%S GMT", time.gmtime(time.time() + 60)
+        )
+        self.assertAlmostEqual(retry_after(later), 60, delta=2)
+
+    @patch("time.sleep")
+    def test_long_rate_limit(self, sleep):
+        url = "https://www.pathofexile.com/api/trade/data/static"
+        limited = {
+            "status_code": 429,
+            "json": {"error": {"message": "Rate limit exceeded"}},
+        }
+        with requests_mock.Mocker() as mock:
+            mock.get(
+                url,
+                [
+                    dict(limited, headers={"Retry-After": "2"}),
+                    {"json": {"result": []}},
+                ],
+            )
+            with self.assertLogs(level="INFO"):
+                self.assertEqual(web.get_request(url, 1, 2), {"result": []})
+            sleep.assert_called_once_with(2)
+
+            sleep.reset_mock()
+            wait = str(web.MAX_RATE_LIMIT_WAIT + 1)
+            mock.get(url, **limited, headers={"Retry-After": wait})
+            with self.assertLogs(level="ERROR") as logs:
+                web.get_request(url, 1, 2)
+            self.assertIn("try again later", logs.output[0])
+            sleep.assert_not_called()
+            self.assertEqual(mock.call_count, 3)
+
+
+class TestLookupJournal(unittest.TestCase):
+    @patch("tkinter.Tk", TkMock)
+    @patch("tkinter.Toplevel", ToplevelMock)
+    @patch("tkinter.Frame", FrameMock)
+    @patch("tkinter.Label", LabelMock)
+    @patch("tkinter.Button", ButtonMock)
+    @patch("screeninfo.get_monitors", mock_get_monitors)
+    @patch("utils.config.USE_GUI", True)
+    def test_journal_records_lookup(self):
+        init_gui()
+        config.LEAGUE = "Standard"
+        # Forget the searches of other tests that found nothing
+        web.clear_league_caches()
+        path = os.path.join(make_temp_dir(self), "lookups.jsonl")
+
+        with requests_mock.Mocker() as mock:
+            mockTradeData(mock)
+            mock.post(LOOKUP_URL, json=mockResponse(0))
+            mock.get(makePoePricesURL(2), json={})
+
+            journal.start_journal(path)
+            with self.assertLogs(level="INFO"):
+                Accounting.basic_search(items[2])
+                # Known to find nothing, so only poeprices is asked again
+                searches = mock.call_count
+                Accounting.basic_search(items[2])
+                self.assertEqual(mock.call_count, searches + 1)
+            journal.stop_journal()
+
+        with open(path) as f:
+            records = [json.loads(line) for line in f]
+
+        self.assertEqual(len(records), 2)
+        self.assertEqual(records[1]["queries"], [])
+        self.assertEqual(records[1]["cache"]["empty"], {"hit": 3, "miss": 0})
+        record = records[0]
+        self.assertEqual(record["outcome"], "ml")
+        self.assertEqual(record["rung"], "offline")
+        self.assertTrue(all(q["results"] == 0 for q in record["queries"]))
+        self.assertEqual(record["queries"][-1]["rung"], "offline")
+        for stage in ("total", "parse", "search"):
+            self.assertIn(stage, record["stages"])
+        close_all_windows()
+
+
+class TestPriceHistory(unittest.TestCase):
+    def setUp(self):
+        self.path = os.path.join(make_temp_dir(self), "history.sqlite")
+        history.start_history(self.path)
+        self.addCleanup(history.stop_history)
+
+    def test_history(self):
+        ring = generator.BaseItem("Doom Loop")
+        ring.base = "Two-Stone Ring"
+        stats = pricing.PriceStats(3, 0, 10, 9, 11, 9, 10)
+        data = {"10 Chaos": [3, 1600000000]}
+        history.record(ring, "Standard", "a", 3, data, stats)
+        history.record(ring, "Standard", "b", 0, {}, None)
+        # Reopening writes out everything that was queued
+        history.stop_history()
+        history.start_history(self.path)
+
+        entry = history.get_recent("a", "Standard", 60)
+        self.assertEqual((entry.data, entry.stats), (data, stats))
+        self.assertIsNone(history.get_recent("a", "Hardcore", 60))
+        self.assertIsNone(history.get_recent("c", "Standard", 60))
+
+        entries = history.get_base_history(
+            "Two-Stone Ring", "Standard", time.time() - 60
+        )
+        self.assertEqual([e.results for e in entries], [0, 3])
+        self.assertIsNone(entries[0].stats)
+        self.assertEqual(
+            history.get_base_history("Two-Stone Ring", "Standard", 0, 1), []
+        )
+
+    def test_empty_searches_are_not_kept(self):
+        web.clear_league_caches()
+        self.addCleanup(web.clear_league_caches)
+        item = unittest.mock.Mock()
+        item.get_json.return_value = {"query": {"name": "Nothing"}}
+        query_hash = get_query_hash(item.get_json())
+        # Left by an older version, which kept empty searches too
+        nothing = generator.BaseItem("Nothing")
+        history.record(nothing, config.LEAGUE, query_hash, 0, {}, None)
+        history.stop_history()
+        history.start_history(self.path)
+
+        with patch.object(
+            common, "get_response", return_value={"result": []}
+        ) as get_response, patch.object(history, "record") as record:
+            self.assertEqual(common.get_trade_data(item), ({}, 0, None))
+        get_response.assert_called_once()
+        record.assert_not_called()
+
+
+class TestEmptyQueries(unittest.TestCase):
+    def setUp(self):
+        common.clear_empty_queries()
+        self.addCleanup(common.clear_empty_queries)
+
+    @patch("time.monotonic")
+    def test_expired_are_forgotten(self, monotonic):
+        monotonic.return_value = 1000
+        common.remember_empty("old", common.FAILED_QUERY_TTL)
+        common.remember_empty("new", common.EMPTY_QUERY_TTL)
+        self.assertTrue(common.is_known_empty("old"))
+
+        # Inserting drops the searches that expired since
+        monotonic.return_value += common.FAILED_QUERY_TTL
+        common.remember_empty("other", common.EMPTY_QUERY_TTL)
+        self.assertEqual(set(common.empty_queries), {"new", "other"})
+        self.assertTrue(common.is_known_empty("new"))
+
+
+class TestRelaxationPlanner(unittest.TestCase):
+    def setUp(self):
+        planner.clear_outcomes()
+        self.addCleanup(planner.clear_outcomes)
+
+    def test_plan(self):
+        ring = generator.BaseItem("Doom Loop")
+        ring.base = "Two-Stone Ring"
+        plan = planner.get_plan(ring)
+        self.assertEqual(plan, planner.FULL_PLAN._replace(signature=plan[0]))
+
+        # Strict searches of rings like it never find enough
+        for _ in range(planner.MIN_SAMPLES):
+            planner.record(plan, [("strict", 0), ("no_duplicates", 20)])
+        plan = planner.get_plan(ring)
+        self.assertEqual((plan.factor, plan.start), (0.2, 0))
+        for _ in range(planner.MIN_SAMPLES):
+            planner.record(plan, [("strict", 0)])
+        plan = planner.get_plan(ring)
+        self.assertEqual((plan.factor, plan.start), (0.2, 1))
+        self.assertFalse(plan.searches("strict"))
+        self.assertTrue(plan.searches("no_duplicates"))
+
+        # Offline sellers are always searched
+        for rung in planner.RUNGS[1:3]:
+            for _ in range(planner.MIN_SAMPLES):
+                planner.record(plan, [(rung, 0)])
+        plan = planner.get_plan(ring)
+        self.assertEqual(plan.start, len(planner.RUNGS) - 1)
+
+        # Now and then the whole ladder is searched again
+        plans = [planner.get_plan(ring) for _ in range(planner.EXPLORE_EVERY)]
+        self.assertEqual(sum(p.start == 0 for p in plans), 1)
+
+    def test_few_results_are_hits(self):
+        ring = generator.BaseItem("Doom Loop")
+        ring.base = "Two-Stone Ring"
+        plan = planner.get_plan(ring)
+
+        # price_item stops at a rung that found anything at all
+        for _ in range(planner.MIN_SAMPLES):
+            planner.record(plan, [("strict", 3)])
+        plan = planner.get_plan(ring)
+        self.assertEqual((plan.factor, plan.start), (0.1, 0))
+        self.assertTrue(plan.searches("strict"))
+
+
+class TestSettingsReload(unittest.TestCase):
+    def setUp(self):
+        self.settings = config.get_config()
+        self.path = os.path.join(make_temp_dir(self), "settings.cfg")
+        config.update_settings_file(self.path)
+
+    def tearDown(self):
+        config.settings = self.settings
+        config.__dict__.pop("LEAGUE", None)
+
+    def edit(self, section, key, value):
+        parser = configparser.ConfigParser()
+        parser.read(self.path)
+        parser[section][key] = value
+        with open(self.path, "w") as f:
+            parser.write(f)
+        # Make sure the change is noticed on coarse mtime filesystems
+        stat = os.stat(self.path)
+        os.utime(self.path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+
+    def test_reload_changed_settings(self):
+        config.settings = config.read_settings(self.path)
+        config.LEAGUE = "Standard"
+        watcher = config.SettingsWatcher(self.path, interval=0)
+
+        self.assertEqual(watcher.poll(), set())
+
+        # LEAGUE resolved at runtime is kept when something else changes
+        self.edit("HOTKEYS", "basicSearch", "alt+b")
+        self.assertEqual(watcher.poll(), {"BASIC_SEARCH"})
+        self.assertEqual(config.BASIC_SEARCH, "alt+b")
+        self.assertEqual(config.LEAGUE, "Standard")
+
+        self.edit("GENERAL", "league", "Hardcore")
+        self.assertEqual(watcher.poll(), {"LEAGUE"})
+        self.assertEqual(config.LEAGUE, "Hardcore")
+
+        with open(self.path, "a") as f:
+            f.write("[GUI\n")
+        os.utime(self.path, ns=(0, 0))
+        self.assertEqual(watcher.poll(), set())
+        self.assertEqual(config.LEAGUE, "Hardcore")
+
+
 if __name__ == "__main__":
     init(autoreset=True)  # Colorama
     unittest.main(failfast=True)
@@ -1,4 +1,5 @@
 import base64
+import json
 import os
 import sys
 
@@ -43,6 +44,22 @@ def makePoePricesURL(i):
     )
 
 
+# A helper that answers the trade stats and items APIs with the saved
+# responses in tests/, so items are parsed without going online.
+#
+# mock: The requests_mock Mocker to register the responses with
+def mockTradeData(mock):
+    for name, api in (
+        ("mockModifiers.txt", "stats"),
+        ("mockItems.txt", "items"),
+    ):
+        with open(os.path.join(BASE_DIR, name)) as f:
+            mock.get(
+                f"https://www.pathofexile.com/api/trade/data/{api}",
+                json=json.load(f),
+            )
+
+
 class TkMockObject:
     def __init__(self, *args, **kwargs):
         pass
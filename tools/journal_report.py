@@ -0,0 +1,101 @@
+"""Summarize a lookup journal written by Path of Accounting.
+
+Usage: python tools/journal_report.py [lookups.jsonl ...]
+
+Rotated files (lookups.jsonl.1, lookups.jsonl.2, ...) are read as well.
+"""
+import json
+import os
+import sys
+from collections import Counter, defaultdict
+
+PERCENTILES = (50, 90, 95, 99)
+
+
+def read_journal(path):
+    """Yield every record of the journal and its rotated files"""
+    paths = [path]
+    i = 1
+    while os.path.exists(f"{path}.{i}"):
+        paths.append(f"{path}.{i}")
+        i += 1
+    # Oldest file first
+    for p in reversed(paths):
+        with open(p, encoding="utf-8") as f:
+            for line in f:
+                line = line.strip()
+                if line:
+                    yield json.loads(line)
+
+
+def percentile(values, p):
+    """Nearest-rank percentile of a sorted list"""
+    if not values:
+        return 0.0
+    k = max(0, min(len(values) - 1, round(p / 100 * len(values)) - 1))
+    return values[k]
+
+
+def report(records):
+    stages = defaultdict(list)
+    rungs = Counter()
+    outcomes = Counter()
+    queries = []
+    results = []
+    cache = defaultdict(Counter)
+    waited = 0.0
+
+    for record in records:
+        for name, seconds in record["stages"].items():
+            stages[name].append(seconds * 1000)
+        outcomes[record["outcome"]] += 1
+        if record["outcome"] == "listed":
+            rungs[record["rung"]] += 1
+        queries.append(len(record["queries"]))
+        results += [q["results"] or 0 for q in record["queries"]]
+        for name, counts in record["cache"].items():
+            cache[name].update(counts)
+        waited += record["rate_limit_wait"]
+
+    lookups = len(queries)
+    print(f"Lookups: {lookups}")
+    if not lookups:
+        return
+
+    print("\nLatency (ms)")
+    header = "".join(f"{'p%d' % p:>10}" for p in PERCENTILES)
+    print(f"{'stage':<16}{'count':>8}{header}{'max':>10}")
+    for name in sorted(stages, key=lambda n: n != "total"):
+        values = sorted(stages[name])
+        row = "".join(f"{percentile(values, p):>10.1f}" for p in PERCENTILES)
+        print(f"{name:<16}{len(values):>8}{row}{values[-1]:>10.1f}")
+
+    print("\nOutcomes")
+    for outcome, count in outcomes.most_common():
+        print(f"{str(outcome):<16}{count:>8}{count / lookups:>10.1%}")
+
+    listed = sum(rungs.values())
+    if listed:
+        print("\nFallback ladder hits (lookups priced from /trade)")
+        for rung, count in rungs.most_common():
+            print(f"{str(rung):<16}{count:>8}{count / listed:>10.1%}")
+
+    print(f"\nQueries per lookup: {sum(queries) / lookups:.2f}")
+    if results:
+        print(f"Results per query:  {sum(results) / len(results):.2f}")
+
+    if cache:
+        print("\nCache hit rates")
+        for name, counts in sorted(cache.items()):
+            total = counts["hit"] + counts["miss"]
+            print(f"{name:<16}{total:>8}{counts['hit'] / total:>10.1%}")
+
+    print(f"\nRate limit waits: {waited:.1f}s")
+
+
+if __name__ == "__main__":
+    paths = sys.argv[1:] or ["lookups.jsonl"]
+    records = []
+    for path in paths:
+        records += read_journal(path)
+    report(records)
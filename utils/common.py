@@ -1,7 +1,6 @@
 import logging
 import time
 import traceback
-from datetime import datetime, timezone
 from typing import Dict
 
 from colorama import Fore
@@ -9,30 +8,79 @@ from colorama import Fore
 from gui.windows import (
     baseResults,
     information,
+    ninjaPrice,
     notEnoughInformation,
     priceInformation,
 )
 from item.generator import *
-from utils import config
-from utils.config import MIN_RESULTS, PROJECT_URL
+from item.query import canonical_json, get_query_hash
+from utils import config, history, journal, planner
+from utils.config import MIN_RESULTS
 from utils.exceptions import InvalidAPIResponseException
+from utils.ninja import format_chaos, format_price, get_currency_rates
+from utils.pricing import MIN_OF_K, get_price_stats, parse_timestamp
 from utils.web import (
     exchange_currency,
     fetch,
     get_poe_prices_info,
+    league_cache,
     open_exchange_site,
     open_trade_site,
     query_item,
 )
 
+# Seconds a search that found nothing is not sent again
+EMPTY_QUERY_TTL = 120
 
-def get_response(item):
+# Seconds a search the API refused is not sent again
+FAILED_QUERY_TTL = 30
+
+# dict{query hash: time.monotonic() the search may be sent again} of
+# searches that found nothing or failed
+empty_queries = {}
+
+
+@league_cache
+def clear_empty_queries():
+    empty_queries.clear()
+
+
+def is_known_empty(query_hash) -> bool:
+    """Whether a search found nothing or failed a short while ago"""
+    expires = empty_queries.get(query_hash)
+    if expires is not None and expires <= time.monotonic():
+        empty_queries.pop(query_hash, None)
+        expires = None
+    journal.record_cache("empty", expires is not None)
+    return expires is not None
+
+
+def remember_empty(query_hash, ttl):
+    """Skip a search for ttl seconds, forgetting the ones that expired
+
+    :param query_hash: Hash of the search, see get_query_hash
+    :param ttl: Seconds the search is not sent again
+    """
+    now = time.monotonic()
+    # Most searches are never sent again, without this their entries
+    # would pile up for the whole session
+    for key, expires in list(empty_queries.items()):
+        if expires <= now:
+            empty_queries.pop(key, None)
+    empty_queries[query_hash] = now + ttl
+
+
+def get_response(item, json=None):
     """Based on the item given, get the response from the API
 
     :param item: Item to get response for
+    :param json: The trade query of the item, built if not given
     :return: Response from approriate API
     """
-    json = item.get_json()
+    if json is None:
+        json = item.get_json()
+    # Sent as is, no need for requests to encode it again
+    body = canonical_json(json)
     unsupportedCurrency = [
         "Warlord's Exalted Orb",
         "Crusader's Exalted Orb",
@@ -41,10 +89,15 @@ def get_response(item):
         "Awakener's Orb",
     ]
 
-    if isinstance(item, Currency) and item.name not in unsupportedCurrency:
-        response = exchange_currency(json, config.LEAGUE)
-    else:
-        response = query_item(json, config.LEAGUE)
+    with journal.stage("search"):
+        if (
+            isinstance(item, Currency)
+            and item.name not in unsupportedCurrency
+        ):
+            response = exchange_currency(body, config.LEAGUE)
+        else:
+            response = query_item(body, config.LEAGUE)
+    journal.record_query(json, len(response["result"]) if response else None)
 
     return response
 
@@ -52,80 +105,91 @@ def get_response(item):
 def get_trade_data(item):
     """For the given item, find current listings and retrieve prices & times
 
+    Searches that found something in the last HISTORY_FRESHNESS minutes
+    are answered from the price history instead. Searches that found
+    nothing are left to the empty_queries cache.
+
     :param item: Item to process
-    :return: dict of count and prices, length of prices
+    :return: dict of count and prices, length of prices and the
+        PriceStats of the listings (or None)
     """
-
-    def pretty_currency(curr):
-        currency = curr
-        # TODO: Add more currency types
-        if "mir" in currency:
-            currency = "Mirror"
-        elif "exa" in currency:
-            currency = "Exalt"
-        elif "chaos" in currency:
-            currency = "Chaos"
-        elif "alch" in currency:
-            currency = "Alch"
-        elif "alt" in currency:
-            currency = "Alt"
-        elif "fuse" in currency:
-            currency = "Fuse"
-        return currency
+    from utils.currency import SHORT_NAMES
 
     trade_info = None
 
-    response = get_response(item)
+    query = item.get_json()
+    query_hash = get_query_hash(query)
+    # Steps of the fallback ladder known to find nothing are skipped
+    if is_known_empty(query_hash):
+        return {}, 0, None
+    if history.reader and float(config.HISTORY_FRESHNESS) > 0:
+        entry = history.get_recent(
+            query_hash, config.LEAGUE, float(config.HISTORY_FRESHNESS) * 60
+        )
+        found = entry is not None and entry.results > 0
+        journal.record_cache("history", found)
+        if found:
+            return entry.data, entry.results, entry.stats
+
+    response = get_response(item, query)
     if not response:
-        return {}
+        remember_empty(query_hash, FAILED_QUERY_TTL)
+        return {}, 0, None
 
     if len(response["result"]) > 0:
-        trade_info = fetch(response, isinstance(item, Currency))
-
+        with journal.stage("fetch"):
+            trade_info = fetch(response, isinstance(item, Currency))
+
+    # dict{price: [count, time listed, chaos value]}, times in seconds
+    # since the epoch, summed up first and averaged at the end. The chaos
+    # value is None for currencies we have no rate of.
+    merged = {}
+    count = 0
+    stats = None
     if trade_info:
-        prev_account_name = ""
-        # Modify data to usable status.
-        times = []
-        prices = []
-        for trade in trade_info:  # Stop price fixers
-            if trade["listing"]["price"]:
-                if trade["listing"]["account"]["name"] != prev_account_name:
-                    price = (
-                        str(trade["listing"]["price"]["amount"])
-                        + " "
-                        + pretty_currency(
-                            trade["listing"]["price"]["currency"]
-                        )
-                    )
-                    prices.append(price)
-                    times.append(
-                        datetime.strptime(
-                            trade["listing"]["indexed"], "%Y-%m-%dT%H:%M:%SZ"
-                        )
-                    )
-                prev_account_name = trade["listing"]["account"]["name"]
-
-        merged = {}
-        for i in range(len(prices)):
-            if prices[i] in merged:
-                merged[prices[i]].append(times[i].replace(tzinfo=timezone.utc))
+        rates = get_currency_rates()
+        # Stop price fixers, only the cheapest listing of every seller
+        # counts, like in the price statistics
+        seen = set()
+        for trade in trade_info:
+            listing = trade["listing"]
+            account = listing["account"]["name"]
+            if not listing["price"] or account in seen:
+                continue
+            seen.add(account)
+
+            amount = listing["price"]["amount"]
+            currency = listing["price"]["currency"]
+            price = str(amount) + " " + SHORT_NAMES.get(currency, currency)
+            rate = rates.get(currency)
+            chaos = None if rate is None else amount * rate
+            if chaos is not None and currency != "chaos":
+                price += f" ({format_chaos(chaos)})"
+            indexed = parse_timestamp(listing["indexed"])
+            if price in merged:
+                merged[price][0] += 1
+                merged[price][1] += indexed
             else:
-                merged[prices[i]] = [times[i].replace(tzinfo=timezone.utc)]
+                merged[price] = [1, indexed, chaos]
+            count += 1
+
+        for values in merged.values():
+            values[1] //= values[0]
+        # Cheapest first, prices we can not convert last
+        merged = dict(
+            sorted(
+                merged.items(),
+                key=lambda entry: (entry[1][2] is None, entry[1][2] or 0),
+            )
+        )
 
-        for key, value in merged.items():
-            combined = 0
-            count = 0
-            for t in value:
-                combined += t.timestamp()
-                count += 1
-            combined = combined / count
-            merged[key] = [
-                count,
-                datetime.fromtimestamp(combined, tz=timezone.utc),
-            ]
+        stats = get_price_stats(trade_info, rates)
 
-        return merged, len(prices)
-    return {}, 0
+    if count:
+        history.record(item, config.LEAGUE, query_hash, count, merged, stats)
+    else:
+        remember_empty(query_hash, EMPTY_QUERY_TTL)
+    return merged, count, stats
 
 
 def print_info(info):
@@ -135,148 +199,226 @@ def print_info(info):
         information.create_at_cursor_left()
 
 
-def price_item(item):
+def price_from_ninja(item) -> bool:
+    """Show the price of an item in the poe.ninja price indexes
+
+    Takes no round trips, the prices are loaded in the background.
+
+    :param item: Item to price
+    :return: True if that is the price, False if /trade has to be
+        searched, to refine the price or because poe.ninja has none
+    """
+    if not config.USE_NINJA_PRICES:
+        return False
+    price = item.get_ninja_price()
+    if price is None:
+        return False
+
+    journal.set_rung("ninja")
+    journal.set_outcome("ninja")
+    logging.info(
+        "[$] poe.ninja: %s%s%s%s",
+        Fore.YELLOW,
+        format_price(price.chaos),
+        Fore.RESET,
+        "".join(", " + line for line in price.details),
+    )
+    ninjaPrice.add_ninja_price(
+        item.name, price.chaos, price.updated, price.details
+    )
+    ninjaPrice.create_at_cursor()
+    # Currency is worth the same everywhere, there is nothing to refine
+    return isinstance(item, Currency) or not config.REFINE_NINJA_PRICES
+
+
+def price_item(item, plan=planner.FULL_PLAN):
     """Pricing utility. Tries to price items by searching the API
 
     :param item: The item to search
+    :param plan: planner.Plan of the rung to start searching at, rungs
+        before it are not searched but still drop what they drop
     """
-    try:
-
-        data, results = get_trade_data(item)
-
-        info = ""
-        logging.debug(item.text)
-        if results <= 0:
-            info += item.remove_duplicate_mods()
-            data, results = get_trade_data(item)
-
-        if results <= 0:
-            try:
-                if item.rarity == "unique":
-                    item2 = item
-                    item2.remove_all_mods()
-                    logging.info(f"[!] Re-pricing {item2.name} without mods.")
-                    logging.debug(item2.get_json())
-                    data, results = get_trade_data(item)
-            except AttributeError:
-                pass
-
-        if results < MIN_RESULTS:
-            info += item.remove_bad_mods()
-
-        offline = False
-        if results <= 0:
-            info += f"[!] Checking offline sellers\n"
-            item.set_offline()
-            offline = True
-            data, results = get_trade_data(item)
-
-        if data:
-            item.print()
-            print_info(info)
-
-            print_text = "[$] Prices: "
-            for price, values in data.items():
-                print_text += (
-                    f"{Fore.YELLOW}{price}{Fore.RESET} x {values[0]}, "
-                )
+    with journal.lookup(item):
+        try:
+            # (rung, results) of every search, for the planner
+            searched = []
+
+            def search(rung):
+                journal.set_rung(rung)
+                data, results, stats = get_trade_data(item)
+                searched.append((rung, results))
+                return data, results, stats
+
+            data, results, stats = {}, 0, None
+            if plan.searches("strict"):
+                data, results, stats = search("strict")
+
+            info = ""
+            logging.debug(item.text)
+            if results <= 0:
+                info += item.remove_duplicate_mods()
+                if plan.searches("no_duplicates"):
+                    data, results, stats = search("no_duplicates")
+
+            if results <= 0:
+                try:
+                    if item.rarity == "unique":
+                        item2 = item
+                        item2.remove_all_mods()
+                        if plan.searches("unique_no_mods"):
+                            logging.info(
+                                "[!] Re-pricing %s without mods.", item2.name
+                            )
+                            logging.debug(item2.get_json())
+                            data, results, stats = search("unique_no_mods")
+                except AttributeError:
+                    pass
 
-            print_text = print_text[:-2]
-            logging.info(print_text)
             if results < MIN_RESULTS:
-                logging.info(
-                    "[!] Not enough data to confidently price this item."
-                )
-            priceInformation.add_price_information(data, offline)
-            priceInformation.create_at_cursor()
-
-            return results
+                info += item.remove_bad_mods()
+
+            offline = False
+            if results <= 0:
+                info += f"[!] Checking offline sellers\n"
+                item.set_offline()
+                offline = True
+                data, results, stats = search("offline")
+
+            planner.record(plan, searched)
+
+            # Replaced by what /trade says, see price_from_ninja
+            ninjaPrice.close()
+
+            if data:
+                journal.set_outcome("listed")
+                item.print()
+                print_info(info)
+
+                if stats:
+                    logging.info(
+                        "[$] Chaos: median %s%.1f%s (IQR %.1f-%.1f), "
+                        "cheapest %d avg %.1f, recent avg %.1f, "
+                        "%d sellers, %d outliers",
+                        Fore.YELLOW,
+                        stats.median,
+                        Fore.RESET,
+                        stats.q1,
+                        stats.q3,
+                        MIN_OF_K,
+                        stats.min_of_k,
+                        stats.weighted,
+                        stats.listings,
+                        stats.outliers,
+                    )
 
-        else:
-            info += "[!] No results on /trade, using ML!"
-            print_info(info)
-            item.print()
-            price = get_poe_prices_info(item)
-
-            txt = ""
-
-            if "min" in price:
-                txt = txt + "Min: [" + str(round(price["min"], 2)) + "] "
-            if "max" in price:
-                txt = txt + "Max: [" + str(round(price["max"], 2)) + "] "
-            if "currency" in price:
-                txt = txt + "[" + price["currency"] + "] "
-            if "pred_confidence_score" in price:
-                txt = (
-                    txt
-                    + "Confidence: "
-                    + str(floor(price["pred_confidence_score"]))
-                    + "% "
+                logging.info(
+                    "[$] Prices: %s",
+                    ", ".join(
+                        "%s%s%s x %s"
+                        % (Fore.YELLOW, price, Fore.RESET, values[0])
+                        for price, values in data.items()
+                    ),
                 )
+                if results < MIN_RESULTS:
+                    logging.info(
+                        "[!] Not enough data to confidently price this item."
+                    )
+                priceInformation.add_price_information(data, offline)
+                priceInformation.create_at_cursor()
 
-            logging.info(txt)
-            if price:
-                notEnoughInformation.add_poe_info_price(price)
-            notEnoughInformation.create_at_cursor()
-
-            return 0
+                return results
 
-    except InvalidAPIResponseException:
-        logging.info(
-            f"{Fore.RED}================== LOOKUP FAILED, PLEASE READ INSTRUCTIONS BELOW =================={Fore.RESET}"
-        )
-        logging.info(
-            f"[!] Failed to parse response from POE API. If this error occurs again please open an issue at {PROJECT_URL}issues with the info below"
-        )
-        logging.info(
-            f"{Fore.GREEN}================== START ISSUE DATA =================={Fore.RESET}"
-        )
-        logging.info(f"{Fore.GREEN}Title:{Fore.RESET}")
-        logging.info("Failed to query item from trade API.")
-        logging.info(f"{Fore.GREEN}Body:{Fore.RESET}")
-        logging.info(
-            "Macro failed to lookup item from POE trade API. Here is the item in question."
-        )
-        logging.info("====== ITEM DATA=====")
-        if isinstance(item, Item):
-            logging.info(item)
-        else:
-            logging.info(text)
-        logging.info(
-            f"{Fore.GREEN}================== END ISSUE DATA =================={Fore.RESET}"
-        )
-        logging.info(
-            f"{Fore.RED}================== LOOKUP FAILED, PLEASE READ INSTRUCTIONS ABOVE =================={Fore.RESET}"
-        )
+            else:
+                journal.set_outcome("ml")
+                info += "[!] No results on /trade, using ML!"
+                print_info(info)
+                item.print()
+                with journal.stage("ml"):
+                    price = get_poe_prices_info(item)
+
+                txt = ""
+
+                if "min" in price:
+                    txt = txt + "Min: [" + str(round(price["min"], 2)) + "] "
+                if "max" in price:
+                    txt = txt + "Max: [" + str(round(price["max"], 2)) + "] "
+                if "currency" in price:
+                    txt = txt + "[" + price["currency"] + "] "
+                if "pred_confidence_score" in price:
+                    txt = (
+                        txt
+                        + "Confidence: "
+                        + str(floor(price["pred_confidence_score"]))
+                        + "% "
+                    )
 
-    except Exception:
-        exception = traceback.format_exc()
-        logging.info(
-            f"{Fore.RED}================== LOOKUP FAILED, PLEASE READ INSTRUCTIONS BELOW =================={Fore.RESET}"
-        )
-        logging.info(
-            f"[!] Something went horribly wrong. If this error occurs again please open an issue at {PROJECT_URL}issues with the info below"
-        )
-        logging.info(
-            f"{Fore.GREEN}================== START ISSUE DATA =================={Fore.RESET}"
-        )
-        logging.info(f"{Fore.GREEN}Title:{Fore.RESET}")
-        logging.info("Failed to query item from trade API.")
-        logging.info(f"{Fore.GREEN}Body:{Fore.RESET}")
-        logging.info("Here is the item in question.")
-        logging.info("====== ITEM DATA=====")
-        if isinstance(item, Item):
-            logging.info(item.text)
-        else:
-            if isinstance(text, list):
-                logging.info("\n".join(text))
+                logging.info(txt)
+                if price:
+                    notEnoughInformation.add_poe_info_price(price)
+                notEnoughInformation.create_at_cursor()
+
+                return 0
+
+        except InvalidAPIResponseException:
+            ninjaPrice.close()
+            journal.set_outcome("failed")
+            logging.info(
+                f"{Fore.RED}================== LOOKUP FAILED, PLEASE READ INSTRUCTIONS BELOW =================={Fore.RESET}"
+            )
+            logging.info(
+                f"[!] Failed to parse response from POE API. If this error occurs again please open an issue at {config.PROJECT_URL}issues with the info below"
+            )
+            logging.info(
+                f"{Fore.GREEN}================== START ISSUE DATA =================={Fore.RESET}"
+            )
+            logging.info(f"{Fore.GREEN}Title:{Fore.RESET}")
+            logging.info("Failed to query item from trade API.")
+            logging.info(f"{Fore.GREEN}Body:{Fore.RESET}")
+            logging.info(
+                "Macro failed to lookup item from POE trade API. Here is the item in question."
+            )
+            logging.info("====== ITEM DATA=====")
+            if isinstance(item, Item):
+                logging.info(item)
             else:
                 logging.info(text)
-        logging.info("====== TRACEBACK =====")
-        logging.info(exception)
-        logging.info(
-            f"{Fore.GREEN}================== END ISSUE DATA =================={Fore.RESET}"
-        )
-        logging.info(
-            f"{Fore.RED}================== LOOKUP FAILED, PLEASE READ INSTRUCTIONS ABOVE =================={Fore.RESET}"
-        )
+            logging.info(
+                f"{Fore.GREEN}================== END ISSUE DATA =================={Fore.RESET}"
+            )
+            logging.info(
+                f"{Fore.RED}================== LOOKUP FAILED, PLEASE READ INSTRUCTIONS ABOVE =================={Fore.RESET}"
+            )
+
+        except Exception:
+            ninjaPrice.close()
+            journal.set_outcome("failed")
+            exception = traceback.format_exc()
+            logging.info(
+                f"{Fore.RED}================== LOOKUP FAILED, PLEASE READ INSTRUCTIONS BELOW =================={Fore.RESET}"
+            )
+            logging.info(
+                f"[!] Something went horribly wrong. If this error occurs again please open an issue at {config.PROJECT_URL}issues with the info below"
+            )
+            logging.info(
+                f"{Fore.GREEN}================== START ISSUE DATA =================={Fore.RESET}"
+            )
+            logging.info(f"{Fore.GREEN}Title:{Fore.RESET}")
+            logging.info("Failed to query item from trade API.")
+            logging.info(f"{Fore.GREEN}Body:{Fore.RESET}")
+            logging.info("Here is the item in question.")
+            logging.info("====== ITEM DATA=====")
+            if isinstance(item, Item):
+                logging.info(item.text)
+            else:
+                if isinstance(text, list):
+                    logging.info("\n".join(text))
+                else:
+                    logging.info(text)
+            logging.info("====== TRACEBACK =====")
+            logging.info(exception)
+            logging.info(
+                f"{Fore.GREEN}================== END ISSUE DATA =================={Fore.RESET}"
+            )
+            logging.info(
+                f"{Fore.RED}================== LOOKUP FAILED, PLEASE READ INSTRUCTIONS ABOVE =================={Fore.RESET}"
+            )
@@ -1,15 +1,28 @@
 import configparser
-import json
+import os
+import sys
+import time
+from types import ModuleType
 
 VERSION = "0.95"
 
+SETTINGS_FILE = "settings.cfg"
+
 default_config = {
     "GENERAL": {
         "version": VERSION,
         "league": "League",
         "stashtabMacro": "yes",
+        "logFile": "",
+        "journalFile": "",
+        "historyFile": "",
+        "historyFreshness": "5",
         "projectURL": "https://github.com/Ethck/Path-of-Accounting/",
         "releaseURL": "https://api.github.com/repos/Ethck/Path-of-Accounting/releases",
+        "updateCheckInterval": "24",
+        "ninjaRefreshInterval": "30",
+        "ninjaPrices": "yes",
+        "refineNinjaPrices": "yes",
     },
     "GUI": {
         "useGUI": "yes",
@@ -32,95 +45,197 @@ default_config = {
     },
 }
 
-config = configparser.ConfigParser()
-config.read("settings.cfg")
-config2 = configparser.ConfigParser()
-
-needs_write = False
-
-try:
-    config2.set("GENERAL", "version", VERSION)
-except configparser.NoSectionError:
-    config2.add_section("GENERAL")
-    config2.set("GENERAL", "version", VERSION)
-
-try:
-    v = config["GENERAL"]["version"]
-    v.replace("v", "")
-    if float(v) <= 0.93:  # Incase of major change, delete settings
-        settings = open("settings.cfg", "w")
-        settings.truncate(0)
-        settings.close()
-        v = 0
-    if v != VERSION:
-        needs_write = True
-except Exception:
-    needs_write = True
-
-
-def read_config(section, key):
-    global needs_write
-    try:
-        value = config.get(section, key)
-        try:
-            config2.set(section, key, value)
-        except configparser.NoSectionError:
-            config2.add_section(section)
-            config2.set(section, key, value)
-        return value
-    except configparser.NoSectionError:
-        config.add_section(section)
-        needs_write = True
-        return read_config(section, key)
-    except configparser.NoOptionError:
-        needs_write = True
-        config.set(section, key, default_config[section][key])
-        return read_config(section, key)
-
-
-LEAGUE = read_config("GENERAL", "league")
-
-PROJECT_URL = read_config("GENERAL", "projectURL")
-
-RELEASE_URL = read_config("GENERAL", "releaseURL")
-
-USE_GUI = True if read_config("GUI", "useGUI") == "yes" else False
-TIMEOUT_GUI = read_config("GUI", "timeout")
-GUI_BG1 = read_config("GUI", "backgroundColor")
-GUI_BG2 = read_config("GUI", "backgroundColor2")
-GUI_FONT = read_config("GUI", "font")
-GUI_FONT_SIZE = read_config("GUI", "fontSize")
-GUI_FONT_COLOR = read_config("GUI", "fontColor")
-GUI_HEADER_COLOR = read_config("GUI", "headerColor")
+# Module attributes and where they are found in settings.cfg
+SETTINGS = {
+    "LEAGUE": ("GENERAL", "league"),
+    "PROJECT_URL": ("GENERAL", "projectURL"),
+    "RELEASE_URL": ("GENERAL", "releaseURL"),
+    # Hours until we ask github for a new release again
+    "UPDATE_CHECK_INTERVAL": ("GENERAL", "updateCheckInterval"),
+    # Minutes until we load the prices from poe.ninja again, 0 or less to
+    # only load them at startup
+    "NINJA_REFRESH_INTERVAL": ("GENERAL", "ninjaRefreshInterval"),
+    # Price currency and other stackables by poe.ninja instead of /trade
+    "USE_NINJA_PRICES": ("GENERAL", "ninjaPrices"),
+    # Search /trade after showing the poe.ninja price of anything but
+    # currency
+    "REFINE_NINJA_PRICES": ("GENERAL", "refineNinjaPrices"),
+    "LOG_FILE": ("GENERAL", "logFile"),
+    "JOURNAL_FILE": ("GENERAL", "journalFile"),
+    "HISTORY_FILE": ("GENERAL", "historyFile"),
+    # Minutes a price found before is used instead of searching again
+    "HISTORY_FRESHNESS": ("GENERAL", "historyFreshness"),
+    "STASHTAB_SCROLLING": ("GENERAL", "stashtabMacro"),
+    "USE_GUI": ("GUI", "useGUI"),
+    "TIMEOUT_GUI": ("GUI", "timeout"),
+    "GUI_BG1": ("GUI", "backgroundColor"),
+    "GUI_BG2": ("GUI", "backgroundColor2"),
+    "GUI_FONT": ("GUI", "font"),
+    "GUI_FONT_SIZE": ("GUI", "fontSize"),
+    "GUI_FONT_COLOR": ("GUI", "fontColor"),
+    "GUI_HEADER_COLOR": ("GUI", "headerColor"),
+    "BASIC_SEARCH": ("HOTKEYS", "basicSearch"),
+    "ADV_SEARCH": ("HOTKEYS", "advSearch"),
+    "BASE_SEARCH": ("HOTKEYS", "searchBase"),
+    "OPEN_WIKI": ("HOTKEYS", "openWiki"),
+    "OPEN_TRADE": ("HOTKEYS", "openTrade"),
+    "SHOW_INFO": ("HOTKEYS", "showInfo"),
+    "HIDEOUT": ("HOTKEYS", "hideout"),
+}
+
+# Settings that are turned on with "yes"
+FLAGS = {
+    "USE_GUI",
+    "STASHTAB_SCROLLING",
+    "USE_NINJA_PRICES",
+    "REFINE_NINJA_PRICES",
+}
 
 # This is what the API returns, so we can only be confident with
 # these 10 results.
 MIN_RESULTS = 10
 
-STASHTAB_SCROLLING = (
-    True if read_config("GENERAL", "stashtabMacro") == "yes" else False
-)
+settings = None
+
+
+def read_settings(path=SETTINGS_FILE) -> dict:
+    """Read the settings file, using defaults for anything missing.
+
+    Nothing is written, see update_settings_file for that.
+
+    :param path: Settings file to read
+    :return: dict of setting name to value
+    """
+    parser = configparser.ConfigParser()
+    parser.read(path)
+
+    values = {}
+    for name, (section, key) in SETTINGS.items():
+        value = parser.get(
+            section, key, fallback=default_config[section][key]
+        )
+        if name in FLAGS:
+            value = value == "yes"
+        values[name] = value
+    return values
+
+
+def get_config() -> dict:
+    """Settings from settings.cfg, read on first use and then cached."""
+    global settings
+    if settings is None:
+        settings = read_settings()
+    return settings
+
+
+class ConfigModule(ModuleType):
+    """This module, reading config.LEAGUE and friends from settings.cfg
+    on first use instead of at import time.
+
+    Attributes set at runtime are found first, __getattr__ is only asked
+    for the rest. A module level __getattr__ would do, but needs Python
+    3.7.
+    """
 
+    def __getattr__(self, name):
+        if name in SETTINGS:
+            return get_config()[name]
+        raise AttributeError(
+            f"module {__name__!r} has no attribute {name!r}"
+        )
 
-BASIC_SEARCH = read_config("HOTKEYS", "basicSearch")
-ADV_SEARCH = read_config("HOTKEYS", "advSearch")
-BASE_SEARCH = read_config("HOTKEYS", "searchBase")
 
-OPEN_WIKI = read_config("HOTKEYS", "openWiki")
-OPEN_TRADE = read_config("HOTKEYS", "openTrade")
+sys.modules[__name__].__class__ = ConfigModule
+
+
+def reload_config(path=SETTINGS_FILE) -> set:
+    """Read the settings file again and apply it.
+
+    Values set at runtime (like the resolved LEAGUE) are kept unless the
+    setting changed in the file.
+
+    :param path: Settings file to read
+    :return: Names of the settings that changed
+    """
+    global settings
+    old = get_config()
+    new = read_settings(path)
+    changed = {name for name in new if new[name] != old[name]}
+    settings = new
+    for name in changed:
+        globals().pop(name, None)
+    return changed
+
+
+class SettingsWatcher:
+    """Notice changes to the settings file by its modification time"""
+
+    def __init__(self, path=SETTINGS_FILE, interval=1.0):
+        self.path = path
+        self.interval = interval
+        self.checked = time.monotonic()
+        self.mtime = self.get_mtime()
+
+    def get_mtime(self):
+        try:
+            return os.stat(self.path).st_mtime_ns
+        except OSError:
+            return None
+
+    def poll(self) -> set:
+        """Reload the settings if the file changed since the last poll.
+
+        The file is only looked at once every interval seconds.
+
+        :return: Names of the settings that changed
+        """
+        now = time.monotonic()
+        if now - self.checked < self.interval:
+            return set()
+        self.checked = now
+
+        mtime = self.get_mtime()
+        if mtime == self.mtime:
+            return set()
+        try:
+            changed = reload_config(self.path)
+        except configparser.Error:
+            # Most likely caught while the file was being saved, try again
+            # on the next poll.
+            return set()
+        self.mtime = mtime
+        return changed
+
 
-SHOW_INFO = read_config("HOTKEYS", "showInfo")
-HIDEOUT = read_config("HOTKEYS", "hideout")
+def update_settings_file(path=SETTINGS_FILE):
+    """Bring the settings file up to date with this version.
 
+    Missing settings are added with their defaults and unknown ones are
+    dropped. The file is only written if anything changed.
 
-for section in config.sections():
-    for (key, value) in config.items(section):
-        if not config2.has_option(section, key):
-            needs_write = True
+    :param path: Settings file to update
+    """
+    current = configparser.ConfigParser()
+    current.read(path)
 
-if needs_write:
+    old = current
     try:
-        settings = open("settings.cfg", "w")
-        config2.write(settings)
-    finally:
-        settings.close()
+        version = float(current["GENERAL"]["version"].replace("v", ""))
+        if version <= 0.93:  # Incase of major change, reset settings
+            old = configparser.ConfigParser()
+    except (KeyError, ValueError):
+        pass
+
+    updated = configparser.ConfigParser()
+    for section, keys in default_config.items():
+        updated.add_section(section)
+        for key, default in keys.items():
+            updated.set(section, key, old.get(section, key, fallback=default))
+    updated.set("GENERAL", "version", VERSION)
+
+    def as_dict(parser):
+        return {s: dict(parser.items(s)) for s in parser.sections()}
+
+    if as_dict(updated) != as_dict(current):
+        with open(path, "w") as settings_file:
+            updated.write(settings_file)
@@ -1,6 +1,19 @@
 # Contains the following lookup dictionaries:
 # CURRENCY, OIL, CATALYSTS, FRAGMENTS_AND_SETS, INCUBATORS, SCARABS, RESONATORS
 # FOSSILS, VIALS, ESSENCES, DIV_CARDS
+# and SHORT_NAMES, what we call the currencies prices are listed in
+
+# Names to show prices in, by trade API id. Other currencies are shown
+# by their id.
+SHORT_NAMES = {
+    "mir": "Mirror",
+    "exa": "Exalt",
+    "chaos": "Chaos",
+    "alch": "Alch",
+    "alt": "Alt",
+    "fuse": "Fuse",
+}
+
 CURRENCY = {
     "Orb of Alteration": "alt",
     "Orb of Fusing": "fuse",
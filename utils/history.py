@@ -0,0 +1,246 @@
+"""Prices we found before, kept in a SQLite database.
+
+Every trade search that gets an answer is recorded with the prices it
+found. Searching the same query again soon after is answered from here,
+and the prices of a base over time can be looked up without the network.
+
+Records are written in batches by a background thread. The database is
+in WAL mode, so reading it never waits for the writer.
+"""
+import atexit
+import json
+import logging
+import queue
+import sqlite3
+import time
+import traceback
+from threading import Lock, Thread
+from typing import NamedTuple
+
+from utils.pricing import PriceStats
+
+# Most records written in one transaction
+BATCH_SIZE = 100
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS prices (
+    time REAL NOT NULL,
+    league TEXT NOT NULL,
+    query TEXT NOT NULL,
+    class TEXT,
+    name TEXT,
+    base TEXT,
+    results INTEGER NOT NULL,
+    data TEXT NOT NULL,
+    listings INTEGER,
+    outliers INTEGER,
+    median REAL,
+    q1 REAL,
+    q3 REAL,
+    min_of_k REAL,
+    weighted REAL
+);
+CREATE INDEX IF NOT EXISTS prices_query ON prices (query, league, time);
+CREATE INDEX IF NOT EXISTS prices_base ON prices (base, league, time);
+"""
+
+COLUMNS = (
+    "time, league, query, class, name, base, results, data, "
+    + ", ".join(PriceStats._fields)
+)
+
+INSERT = "INSERT INTO prices (%s) VALUES (%s)" % (
+    COLUMNS,
+    ", ".join("?" * (8 + len(PriceStats._fields))),
+)
+
+writer = None
+
+# Connection for reading, shared by the threads doing lookups
+reader = None
+reader_lock = Lock()
+
+
+class HistoryEntry(NamedTuple):
+    """A trade search we did before and what it found"""
+
+    time: float
+    item_class: str
+    name: str
+    base: str
+    results: int
+    data: dict  # Prices found, like get_trade_data returns them
+    stats: PriceStats  # Or None if no listing had a price in chaos
+
+
+class Writer(Thread):
+    """Write queued records to the database, many at a time"""
+
+    def __init__(self, path):
+        super().__init__(daemon=True)
+        self.path = path
+        self.records = queue.Queue()
+
+    def run(self):
+        connection = sqlite3.connect(self.path)
+        try:
+            stopping = False
+            while not stopping:
+                batch = [self.records.get()]
+                while len(batch) < BATCH_SIZE:
+                    try:
+                        batch.append(self.records.get_nowait())
+                    except queue.Empty:
+                        break
+                if None in batch:
+                    stopping = True
+                    batch = [record for record in batch if record]
+                try:
+                    with connection:
+                        connection.executemany(INSERT, batch)
+                except sqlite3.Error:
+                    logging.debug(traceback.format_exc())
+        finally:
+            connection.close()
+
+    def stop(self):
+        """Write out what is queued and stop"""
+        self.records.put(None)
+        self.join()
+
+
+def start_history(path):
+    """Open the price history, creating it if needed
+
+    :param path: SQLite database file, or empty to keep no history
+    """
+    global writer, reader
+    if writer or not path:
+        return
+    reader = sqlite3.connect(path, check_same_thread=False)
+    reader.execute("PRAGMA journal_mode=WAL")
+    reader.executescript(SCHEMA)
+
+    writer = Writer(path)
+    writer.start()
+    atexit.register(stop_history)
+
+
+def stop_history():
+    """Write out any pending records and close the database"""
+    global writer, reader
+    if writer:
+        writer.stop()
+        writer = None
+    with reader_lock:
+        if reader:
+            reader.close()
+            reader = None
+
+
+def record(item, league, query_hash, results, data, stats):
+    """Queue the result of a trade search to be written
+
+    :param item: Item that was searched for
+    :param league: League that was searched
+    :param query_hash: item.query.get_query_hash of the search
+    :param results: Number of results of the search
+    :param data: Prices found, as returned by get_trade_data
+    :param stats: PriceStats of the listings, or None
+    """
+    if not writer:
+        return
+    writer.records.put(
+        (
+            time.time(),
+            league,
+            query_hash,
+            type(item).__name__,
+            item.name,
+            getattr(item, "base", None),
+            results,
+            json.dumps(data),
+            *(stats or (None,) * len(PriceStats._fields)),
+        )
+    )
+
+
+def to_entry(row) -> HistoryEntry:
+    stats = row[6:]
+    return HistoryEntry(
+        *row[:5],
+        json.loads(row[5]),
+        None if stats[0] is None else PriceStats(*stats),
+    )
+
+
+def select(where, args, limit=-1) -> list:
+    """HistoryEntry objects of the records matching a WHERE clause"""
+    with reader_lock:
+        if not reader:
+            return []
+        rows = reader.execute(
+            "SELECT time, class, name, base, results, data, "
+            + ", ".join(PriceStats._fields)
+            + " FROM prices WHERE "
+            + where
+            + " ORDER BY time DESC, rowid DESC LIMIT ?",
+            (*args, limit),
+        ).fetchall()
+    return [to_entry(row) for row in rows]
+
+
+def get_recent(query_hash, league, max_age):
+    """The latest result of a search, if it is recent enough
+
+    :param max_age: Seconds the result may be old
+    :return: HistoryEntry, or None
+    """
+    entries = select(
+        "query = ? AND league = ? AND time >= ?",
+        (query_hash, league, time.time() - max_age),
+        limit=1,
+    )
+    return entries[0] if entries else None
+
+
+def get_base_history(base, league, since, until=None) -> list:
+    """Every search for items of a base in a span of time, newest first
+
+    :param since: Start of the span, in seconds since the epoch
+    :param until: End of the span, defaults to now
+    :return: list of HistoryEntry objects
+    """
+    return select(
+        "base = ? AND league = ? AND time BETWEEN ? AND ?",
+        (base, league, since, time.time() if until is None else until),
+    )
+
+
+def main():
+    """Print what the items of a base cost lately"""
+    import argparse
+
+    from utils import config
+
+    parser = argparse.ArgumentParser(description=main.__doc__)
+    parser.add_argument("base")
+    parser.add_argument("--hours", type=float, default=24)
+    parser.add_argument("--league", default=config.LEAGUE)
+    args = parser.parse_args()
+
+    start_history(config.HISTORY_FILE)
+    since = time.time() - args.hours * 60 * 60
+    for entry in get_base_history(args.base, args.league, since):
+        median = f"{entry.stats.median:.1f}c" if entry.stats else "-"
+        print(
+            time.strftime("%Y-%m-%d %H:%M", time.localtime(entry.time)),
+            entry.name,
+            f"median {median}",
+            f"{entry.results} results",
+        )
+    stop_history()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,200 @@
+import atexit
+import json
+import logging
+import logging.handlers
+import queue
+import threading
+import time
+from contextlib import contextmanager
+
+from utils.logger import LazyQueueHandler
+
+# Rotate the journal once it reaches 5MB, keeping 3 old files around.
+MAX_BYTES = 5 * 1024 * 1024
+BACKUP_COUNT = 3
+
+journal_logger = logging.getLogger("journal")
+journal_logger.propagate = False
+
+listener = None
+
+_local = threading.local()
+
+
+class JSONFormatter(logging.Formatter):
+    """Serialize the record's message (a dict) as a single JSON line"""
+
+    def format(self, record):
+        return json.dumps(record.msg, separators=(",", ":"), default=str)
+
+
+class Lookup:
+    """Everything we learn about a single lookup while it runs"""
+
+    def __init__(self):
+        self.time = time.time()
+        self.item_class = None
+        self.base = None
+        self.mods = 0
+        self.rung = None
+        self.plan = None
+        self.outcome = None
+        self.queries = []
+        self.stages = {}
+        self.cache = {}
+        self.rate_limit_wait = 0.0
+
+    def describe(self, item):
+        self.item_class = type(item).__name__
+        self.base = getattr(item, "base", item.name)
+        self.mods = len(item.mods)
+
+    def as_dict(self):
+        return {
+            "time": self.time,
+            "class": self.item_class,
+            "base": self.base,
+            "mods": self.mods,
+            "rung": self.rung,
+            "plan": self.plan,
+            "outcome": self.outcome,
+            "queries": self.queries,
+            "stages": self.stages,
+            "cache": self.cache,
+            "rate_limit_wait": self.rate_limit_wait,
+        }
+
+
+def start_journal(path):
+    """Start writing lookup records to the given JSONL file.
+
+    Records are serialized and written by a background thread.
+
+    :param path: File to append the journal to, rotated by size
+    """
+    global listener
+    if listener or not path:
+        return
+    handler = logging.handlers.RotatingFileHandler(
+        path, maxBytes=MAX_BYTES, backupCount=BACKUP_COUNT, encoding="utf-8"
+    )
+    handler.setFormatter(JSONFormatter())
+
+    journal_queue = queue.Queue()
+    journal_logger.addHandler(LazyQueueHandler(journal_queue))
+    journal_logger.setLevel(logging.INFO)
+
+    listener = logging.handlers.QueueListener(journal_queue, handler)
+    listener.start()
+    atexit.register(stop_journal)
+
+
+def stop_journal():
+    """Write out any pending records and stop the writer thread"""
+    global listener
+    if listener:
+        listener.stop()
+        for handler in listener.handlers:
+            handler.close()
+        for handler in journal_logger.handlers[:]:
+            journal_logger.removeHandler(handler)
+        listener = None
+
+
+def current():
+    """The Lookup being recorded on this thread, or None"""
+    return getattr(_local, "lookup", None)
+
+
+@contextmanager
+def lookup(item=None):
+    """Record everything done inside this block as one lookup.
+
+    Nested blocks add to the outermost lookup, which is the one that
+    gets written to the journal.
+
+    :param item: Item being looked up, if already known
+    """
+    record = current()
+    if record or not listener:
+        if record and item:
+            record.describe(item)
+        yield
+        return
+
+    record = Lookup()
+    if item:
+        record.describe(item)
+    _local.lookup = record
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        record.stages["total"] = time.perf_counter() - start
+        _local.lookup = None
+        journal_logger.info(record.as_dict())
+
+
+def describe(item):
+    """Set the item of the running lookup"""
+    record = current()
+    if record and item:
+        record.describe(item)
+
+
+@contextmanager
+def stage(name):
+    """Time the block and add it to the running lookup's stages"""
+    record = current()
+    if not record:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        record.stages[name] = record.stages.get(name, 0.0) + elapsed
+
+
+def set_rung(rung):
+    """Mark which step of the fallback ladder is being searched"""
+    record = current()
+    if record:
+        record.rung = rung
+
+
+def set_plan(plan):
+    """Note where the fallback ladder was started, see utils.planner"""
+    record = current()
+    if record:
+        record.plan = plan
+
+
+def set_outcome(outcome):
+    record = current()
+    if record:
+        record.outcome = outcome
+
+
+def record_query(query, results):
+    """Add an issued trade query and how many results it returned"""
+    record = current()
+    if record:
+        record.queries.append(
+            {"rung": record.rung, "query": query, "results": results}
+        )
+
+
+def record_cache(name, hit):
+    """Count a hit or miss of one of our caches"""
+    record = current()
+    if record:
+        counts = record.cache.setdefault(name, {"hit": 0, "miss": 0})
+        counts["hit" if hit else "miss"] += 1
+
+
+def record_rate_limit_wait(seconds):
+    record = current()
+    if record:
+        record.rate_limit_wait += seconds
@@ -0,0 +1,63 @@
+import atexit
+import logging
+import logging.handlers
+import queue
+
+listener = None
+
+
+class LazyQueueHandler(logging.handlers.QueueHandler):
+    """QueueHandler that hands the record over untouched.
+
+    The stock QueueHandler formats every record before enqueueing it so
+    it can be pickled. Our queue never leaves the process, so formatting
+    is left to the listener thread instead of the thread doing the lookup.
+    """
+
+    def prepare(self, record):
+        return record
+
+
+def start_logging(level=logging.INFO, log_file=None):
+    """Route all logging through a queue, console and file output are
+    written by a background listener thread.
+
+    :param level: Level of the root logger
+    :param log_file: Optional path of a file that also receives the log
+    :return: The running QueueListener
+    """
+    global listener
+    if listener:
+        return listener
+
+    formatter = logging.Formatter("%(message)s")
+
+    handlers = [logging.StreamHandler()]
+    if log_file:
+        handlers.append(logging.FileHandler(log_file, encoding="utf-8"))
+    for handler in handlers:
+        handler.setFormatter(formatter)
+
+    # queue.Queue, SimpleQueue needs Python 3.7
+    log_queue = queue.Queue()
+    root = logging.getLogger()
+    for handler in root.handlers[:]:
+        root.removeHandler(handler)
+    root.addHandler(LazyQueueHandler(log_queue))
+    root.setLevel(level)
+
+    listener = logging.handlers.QueueListener(log_queue, *handlers)
+    listener.start()
+    # Make sure queued records still get written if we exit early
+    atexit.register(stop_logging)
+    return listener
+
+
+def stop_logging():
+    """Flush everything still queued and stop the listener thread."""
+    global listener
+    if listener:
+        listener.stop()
+        for handler in listener.handlers:
+            handler.close()
+        listener = None
@@ -0,0 +1,449 @@
+"""Prices published by poe.ninja, kept up to date in the background.
+
+Every PriceIndex is a lookup table built from the overviews of a league.
+A refresh builds a whole new table and swaps it in, so lookups on other
+threads never see one that is half loaded.
+"""
+import logging
+import time
+import traceback
+from threading import Event, Thread
+from typing import NamedTuple
+
+from utils import config, journal, web
+from utils.pricing import DEFAULT_RATES
+
+NINJA_API = "https://poe.ninja/api/data"
+
+# Overviews listing the currency, fragments, cards and other stackable
+# items of utils/currency.py
+STACKABLE_OVERVIEWS = (
+    ("currency", "Currency"),
+    ("currency", "Fragment"),
+    ("item", "Oil"),
+    ("item", "Incubator"),
+    ("item", "Scarab"),
+    ("item", "Fossil"),
+    ("item", "Resonator"),
+    ("item", "Essence"),
+    ("item", "Vial"),
+    ("item", "DivinationCard"),
+)
+
+# Overviews of unique items
+UNIQUE_OVERVIEWS = (
+    "UniqueWeapon",
+    "UniqueArmour",
+    "UniqueAccessory",
+    "UniqueJewel",
+    "UniqueFlask",
+    "UniqueMap",
+)
+
+# itemClass of the relic versions of uniques in the overviews
+RELIC_CLASS = 9
+
+# Overviews of maps that are not unique
+MAP_OVERVIEWS = ("Map", "BlightedMap")
+
+# Versions of maps priced apart, by the start of their name
+MAP_KINDS = ("Blighted", "Shaped")
+
+# Map influences by the variant poe.ninja lists them as
+MAP_INFLUENCES = {"Shaper": "The Shaper", "Elder": "The Elder"}
+
+# Gem qualities poe.ninja prices apart, others are rounded down to these
+QUALITY_BUCKETS = (0, 20, 23)
+
+# Every PriceIndex, in the order they are refreshed
+indexes = []
+
+refresher = None
+
+
+def get_refresh_interval() -> float:
+    """Seconds between refreshes, 0 to only load the prices once"""
+    return max(float(config.NINJA_REFRESH_INTERVAL) * 60, 0.0)
+
+
+def get_max_age() -> float:
+    """Seconds after which prices are stale, when two refreshes failed
+
+    Prices that are only loaded once never go stale.
+    """
+    interval = get_refresh_interval()
+    return 2 * interval if interval else float("inf")
+
+
+def get_chaos_value(line: dict) -> float:
+    """Price of a line of a currency or item overview"""
+    if "chaosEquivalent" in line:
+        return line["chaosEquivalent"]
+    return line.get("chaosValue")
+
+
+def get_overview(league: str, kind: str, name: str) -> list:
+    """Lines of a poe.ninja overview
+
+    :param league: League to get the prices of
+    :param kind: "currency" or "item", the two kinds of overviews
+    :param name: Type of the overview, like Currency or DivinationCard
+    :return: list of the lines of the overview
+    """
+    addr = (
+        f"{NINJA_API}/{kind}overview?league={league}&type={name}"
+        "&language=en"
+    )
+    return web.get_request(addr, 10, 2)["lines"]
+
+
+class IndexPrice(NamedTuple):
+    """Price of an item found in a price index"""
+
+    chaos: float
+    updated: float  # time.time() of when the index was loaded
+    details: tuple = ()  # Lines telling which version of the item it is
+
+
+class PriceIndex:
+    """A lookup table of prices of a league, built from poe.ninja"""
+
+    def __init__(self, name, build):
+        self.name = name
+        # Function of the league that returns the new table
+        self.build = build
+        self.table = {}
+        self.league = None
+        self.updated = 0.0
+
+    def refresh(self, league: str):
+        """Load the table of a league again, keeping the old one on errors"""
+        table = self.build(league)
+        # The league was changed while we were loading
+        if league != config.LEAGUE:
+            return
+        self.table = table
+        self.league = league
+        self.updated = time.time()
+
+    def clear(self):
+        self.table = {}
+        self.league = None
+        self.updated = 0.0
+
+    def get(self, key, default=None):
+        return self.table.get(key, default)
+
+    def is_fresh(self, max_age: float) -> bool:
+        """Whether the table is of the current league and recent enough
+
+        :param max_age: Seconds since the last refresh that are fine
+        """
+        return (
+            self.league == config.LEAGUE
+            and time.time() - self.updated <= max_age
+        )
+
+
+def price_index(name):
+    """Decorator turning a function that builds a table into a PriceIndex
+
+    The index is refreshed by the refresher thread and emptied when the
+    league changes.
+    """
+
+    def register(build):
+        index = PriceIndex(name, build)
+        indexes.append(index)
+        web.league_cache(index.clear)
+        return index
+
+    return register
+
+
+class Refresher(Thread):
+    """Refresh every price index of a league now and then"""
+
+    def __init__(self, league: str, interval: float):
+        super().__init__(daemon=True)
+        self.league = league
+        self.interval = interval
+        self.stopped = Event()
+
+    def run(self):
+        while True:
+            for index in indexes:
+                if self.stopped.is_set():
+                    return
+                try:
+                    index.refresh(self.league)
+                except Exception:
+                    logging.debug(traceback.format_exc())
+                    logging.info(
+                        "[!] Could not load %s from poe.ninja", index.name
+                    )
+            if not self.interval or self.stopped.wait(self.interval):
+                return
+
+    def stop(self):
+        self.stopped.set()
+
+
+def start_refresh(league: str) -> Refresher:
+    """Load the price indexes of a league and keep them up to date
+
+    Any refresher of a previous league is stopped first. With a refresh
+    interval of 0 or less the prices are loaded once.
+    """
+    global refresher
+    stop_refresh()
+    refresher = Refresher(league, get_refresh_interval())
+    refresher.start()
+    return refresher
+
+
+def stop_refresh():
+    global refresher
+    if refresher:
+        refresher.stop()
+        refresher = None
+
+
+@price_index("stackable prices")
+def stackable_prices(league: str) -> dict:
+    """Chaos value of everything in utils/currency.py, by name"""
+    from utils.currency import currency_global
+
+    prices = {"Chaos Orb": 1.0}
+    for kind, overview in STACKABLE_OVERVIEWS:
+        for line in get_overview(league, kind, overview):
+            name = line.get("currencyTypeName") or line.get("name")
+            chaos = get_chaos_value(line)
+            if name in currency_global and chaos:
+                prices[name] = chaos
+    return prices
+
+
+@price_index("currency rates")
+def currency_rates(league: str) -> dict:
+    """Chaos value of currencies by their trade API id
+
+    Taken from the stackable prices, which are refreshed just before.
+    """
+    from utils.currency import CURRENCY
+
+    rates = dict(DEFAULT_RATES)
+    if stackable_prices.league == league:
+        for name, trade_id in CURRENCY.items():
+            if name in stackable_prices.table:
+                rates[trade_id] = stackable_prices.table[name]
+    return rates
+
+
+def get_currency_rates() -> dict:
+    """Chaos value of currencies by their trade API id
+
+    Only chaos is known until the rates are loaded.
+    """
+    return currency_rates.table or DEFAULT_RATES
+
+
+def format_chaos(chaos: float) -> str:
+    """A chaos value for showing"""
+    if chaos >= 100:
+        return f"{chaos:.0f} chaos"
+    return f"{chaos:.3g} chaos"
+
+
+def format_price(chaos: float) -> str:
+    """A chaos value for showing, in exalted orbs too if it is worth one"""
+    exalt = get_currency_rates().get("exa")
+    if exalt and chaos >= exalt:
+        return f"{chaos / exalt:.2f} exalted ({chaos:.0f} chaos)"
+    return format_chaos(chaos)
+
+
+def lookup(index: PriceIndex, key):
+    """Entry of a price index, or None if it is missing or stale"""
+    entry = None
+    if index.is_fresh(get_max_age()):
+        entry = index.get(key)
+    journal.record_cache("ninja", entry is not None)
+    return entry
+
+
+def get_stackable_price(name: str):
+    """Price of a currency, card or other stackable item
+
+    :return: IndexPrice, or None if it is unknown or stale
+    """
+    chaos = lookup(stackable_prices, name)
+    if chaos is None:
+        return None
+    return IndexPrice(chaos, stackable_prices.updated)
+
+
+@price_index("unique prices")
+def unique_prices(league: str) -> dict:
+    """Chaos values of unique items by (name, base, links)
+
+    Links are 5, 6 or 0 for anything less. Some uniques come in variants,
+    like the mods of a Watcher's Eye, so the values are tuples of
+    (variant, chaos value) pairs, cheapest first.
+    """
+    prices = {}
+    for overview in UNIQUE_OVERVIEWS:
+        for line in get_overview(league, "item", overview):
+            if line.get("itemClass") == RELIC_CLASS:
+                continue
+            key = (line["name"], line["baseType"], line.get("links") or 0)
+            prices.setdefault(key, []).append(
+                (line.get("variant"), line["chaosValue"])
+            )
+    return {
+        key: tuple(sorted(variants, key=lambda v: v[1]))
+        for key, variants in prices.items()
+    }
+
+
+def get_unique_price(name: str, base: str, links: int = 0):
+    """Price of an identified unique item
+
+    :param name: Name of the unique, with or without the base after it
+    :param base: Base type of the unique
+    :param links: Size of the largest group of linked sockets
+    :return: IndexPrice of the cheapest variant, or None if the unique is
+        unknown or the prices are stale
+    """
+    if name.endswith(" " + base):
+        name = name[: -len(base) - 1]
+    variants = lookup(unique_prices, (name, base, links if links >= 5 else 0))
+    if not variants:
+        return None
+
+    details = []
+    if links >= 5:
+        details.append(f"{links} links")
+    if len(variants) > 1:
+        details += [
+            f"{variant or 'Other'}: {format_price(chaos)}"
+            for variant, chaos in variants
+        ]
+    return IndexPrice(variants[0][1], unique_prices.updated, tuple(details))
+
+
+def get_quality_bucket(quality: int) -> int:
+    """The quality a gem is priced at, see QUALITY_BUCKETS"""
+    return max(bucket for bucket in QUALITY_BUCKETS if bucket <= quality)
+
+
+@price_index("gem prices")
+def gem_prices(league: str) -> dict:
+    """Chaos values of skill gems by (name, corrupted)
+
+    The values are tuples of (level, quality bucket, chaos value), one
+    for every version of the gem poe.ninja lists.
+    """
+    prices = {}
+    for line in get_overview(league, "item", "SkillGem"):
+        key = (line["name"], line.get("corrupted", False))
+        versions = prices.setdefault(key, {})
+        version = (
+            line["gemLevel"],
+            get_quality_bucket(line.get("gemQuality") or 0),
+        )
+        chaos = line["chaosValue"]
+        versions[version] = min(chaos, versions.get(version, chaos))
+    return {
+        key: tuple((*version, chaos) for version, chaos in versions.items())
+        for key, versions in prices.items()
+    }
+
+
+def get_gem_price(name: str, level: int, quality: int, corrupted: bool):
+    """Price of a skill gem, by the nearest version poe.ninja lists
+
+    Versions that are not better than the gem are preferred, as they are
+    what it is at least worth.
+
+    :return: IndexPrice, or None if the gem is unknown or the prices are
+        stale
+    """
+    versions = lookup(gem_prices, (name, corrupted))
+    if not versions:
+        return None
+
+    quality = get_quality_bucket(quality)
+    nearest = min(
+        versions,
+        key=lambda v: (
+            v[0] > level or v[1] > quality,
+            abs(v[0] - level),
+            abs(v[1] - quality),
+        ),
+    )
+    details = [f"Level {nearest[0]}, {nearest[1]}% quality"]
+    if corrupted:
+        details.append("Corrupted")
+    return IndexPrice(nearest[2], gem_prices.updated, tuple(details))
+
+
+def get_map_kind(name: str):
+    """Which of MAP_KINDS a map is, or None for a plain map
+
+    :param name: Name of the map, or its name and base type. The kind is
+        found anywhere in it, as magic maps have a prefix before it and
+        rare maps a name of their own.
+    """
+    words = name.split()
+    for kind in MAP_KINDS:
+        if kind in words:
+            return kind
+    return None
+
+
+@price_index("map prices")
+def map_prices(league: str) -> dict:
+    """Chaos values of maps by (base, tier, kind, influence)
+
+    Kind is one of MAP_KINDS or None, influence is what the map says it
+    is influenced by ("The Shaper"), or None.
+    """
+    prices = {}
+    for overview in MAP_OVERVIEWS:
+        for line in get_overview(league, "item", overview):
+            key = (
+                line["baseType"],
+                line["mapTier"],
+                get_map_kind(line["name"]),
+                MAP_INFLUENCES.get(line.get("variant")),
+            )
+            chaos = line["chaosValue"]
+            prices[key] = min(chaos, prices.get(key, chaos))
+    return prices
+
+
+def get_map_price(name: str, base: str, tier: int, influence=None):
+    """Price of a map that is not unique
+
+    Influenced maps poe.ninja has no price for are priced like the map
+    without influence, which is what they are at least worth.
+
+    :param name: Name of the map, for whether it is blighted or shaped
+    :param base: Base type of the map, with or without its kind
+    :param tier: Tier of the map
+    :param influence: What the map is influenced by, or None
+    :return: IndexPrice, or None if the map is unknown or the prices are
+        stale
+    """
+    kind = get_map_kind(f"{name} {base}")
+    if kind and base and base.startswith(kind + " "):
+        base = base[len(kind) + 1 :]
+    details = [f"Tier {tier}"]
+    chaos = lookup(map_prices, (base, tier, kind, influence))
+    if chaos is None and influence:
+        chaos = lookup(map_prices, (base, tier, kind, None))
+        details.append("Priced without influence")
+    if chaos is None:
+        return None
+    return IndexPrice(chaos, map_prices.updated, tuple(details))
@@ -13,9 +13,9 @@ from gui.windows import (
     priceInformation,
 )
 from item.generator import *
-from utils import config
-from utils.common import get_trade_data, price_item
-from utils.config import MIN_RESULTS, PROJECT_URL
+from utils import config, journal, planner
+from utils.common import price_from_ninja, price_item
+from utils.config import MIN_RESULTS
 from utils.exceptions import InvalidAPIResponseException
 from utils.web import (
     exchange_currency,
@@ -46,14 +46,21 @@ def basic_search(text):
 
     :param text: The raw text of the item to search
     """
-    item = parse_item_info(text)
-    if not item:
-        return
-    logging.debug(item.get_json())
-    item.create_pseudo_mods()
-    item.relax_modifiers()
-
-    price_item(item)
+    with journal.lookup():
+        with journal.stage("parse"):
+            item = parse_item_info(text)
+        if not item:
+            return
+        journal.describe(item)
+        if price_from_ninja(item):
+            return
+        logging.debug(item.get_json())
+        with journal.stage("pseudo"):
+            item.create_pseudo_mods()
+            plan = planner.get_plan(item)
+            item.relax_modifiers(plan.factor)
+
+        price_item(item, plan)
 
 
 def search_ninja_base(text):
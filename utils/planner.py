@@ -0,0 +1,147 @@
+"""Learn where on the fallback ladder of price_item searches succeed.
+
+price_item searches an item strictly first and drops what it asks for a
+step (rung) at a time until something is found. Items of the same class and
+base with as many mods tend to succeed at the same rung, so for every
+such signature we count how often a search of a rung found anything.
+Later lookups start at the first rung that is not hopeless, and relax
+the mods more when searching them with the usual factor rarely works.
+
+The counts are kept for the session and cleared when the league changes.
+"""
+from threading import Lock
+from typing import NamedTuple
+
+from utils import journal
+from utils.web import league_cache
+
+# Steps of price_item's fallback ladder, in the order they are searched
+RUNGS = ("strict", "no_duplicates", "unique_no_mods", "offline")
+
+# Fractions mods are relaxed by, the first is the usual one
+RELAX_FACTORS = (0.1, 0.2)
+
+# Searches of a rung needed before we trust its hit rate
+MIN_SAMPLES = 5
+
+# Rungs finding results less often than this are skipped
+SKIP_BELOW = 0.1
+
+# Every so many lookups of a signature search the whole ladder again,
+# in case a skipped rung has started finding things
+EXPLORE_EVERY = 10
+
+# dict{signature: Outcomes}
+outcomes = {}
+outcomes_lock = Lock()
+
+
+class Plan(NamedTuple):
+    """Where price_item starts searching an item"""
+
+    signature: tuple
+    factor: float  # Fraction the mods were relaxed by
+    start: int  # Index in RUNGS of the first rung searched
+
+    def searches(self, rung: str) -> bool:
+        return RUNGS.index(rung) >= self.start
+
+
+# Searches every rung with the usual factor, for when there is no plan
+FULL_PLAN = Plan(None, RELAX_FACTORS[0], 0)
+
+
+class Outcomes:
+    """How the searches of items of one signature went"""
+
+    def __init__(self):
+        self.lookups = 0
+        # dict{(factor, rung): [searches, hits]}
+        self.counts = {}
+
+    def get_hit_rate(self, factor: float, rung: str):
+        """Share of the searches that found any, or None if too few"""
+        searches, hits = self.counts.get((factor, rung), (0, 0))
+        if searches < MIN_SAMPLES:
+            return None
+        return hits / searches
+
+    def is_hopeless(self, factor: float, rung: str) -> bool:
+        rate = self.get_hit_rate(factor, rung)
+        return rate is not None and rate < SKIP_BELOW
+
+
+@league_cache
+def clear_outcomes():
+    with outcomes_lock:
+        outcomes.clear()
+
+
+def get_signature(item) -> tuple:
+    """What items that succeed at the same rung have in common"""
+    return (
+        type(item).__name__,
+        getattr(item, "rarity", None),
+        getattr(item, "base", item.name),
+        len(item.mods),
+    )
+
+
+def get_plan(item) -> Plan:
+    """Decide how much to relax the mods of an item and where to start
+
+    The last rung is always searched, we have nothing after it.
+
+    :param item: Item about to be priced
+    :return: Plan to give to item.relax_modifiers and price_item
+    """
+    signature = get_signature(item)
+    with outcomes_lock:
+        seen = outcomes.setdefault(signature, Outcomes())
+        seen.lookups += 1
+        if seen.lookups % EXPLORE_EVERY == 0:
+            plan = FULL_PLAN._replace(signature=signature)
+        else:
+            factor = next(
+                (
+                    factor
+                    for factor in RELAX_FACTORS
+                    if not seen.is_hopeless(factor, RUNGS[0])
+                ),
+                RELAX_FACTORS[-1],
+            )
+            start = 0
+            while start < len(RUNGS) - 1 and seen.is_hopeless(
+                factor, RUNGS[start]
+            ):
+                start += 1
+            plan = Plan(signature, factor, start)
+        rates = {
+            rung: seen.get_hit_rate(plan.factor, rung) for rung in RUNGS
+        }
+
+    journal.set_plan(
+        {
+            "start": RUNGS[plan.start],
+            "factor": plan.factor,
+            "skipped": list(RUNGS[: plan.start]),
+            "hit_rates": rates,
+        }
+    )
+    return plan
+
+
+def record(plan: Plan, searched: list):
+    """Count how the searches of a lookup went
+
+    :param plan: Plan the lookup was done with
+    :param searched: list of (rung, results) of every search it did
+    """
+    if plan.signature is None:
+        return
+    with outcomes_lock:
+        seen = outcomes.setdefault(plan.signature, Outcomes())
+        for rung, results in searched:
+            counts = seen.counts.setdefault((plan.factor, rung), [0, 0])
+            counts[0] += 1
+            counts[1] += results > 0
@@ -0,0 +1,186 @@
+from datetime import date
+from functools import lru_cache
+from math import floor
+from typing import NamedTuple
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+# Chaos value of the currencies listings are priced in, by the trade API's
+# short ids. Listings in other currencies are left out of the statistics.
+DEFAULT_RATES = {"chaos": 1.0}
+
+# Number of cheapest listings averaged for the min of k estimate
+MIN_OF_K = 3
+
+# Listings outside this many IQRs from the middle half are trimmed, which
+# gets rid of price fixers and of forgotten listings at silly prices
+OUTLIER_FENCE = 1.5
+
+# Trimming needs a few listings to tell what is normal
+MIN_TO_TRIM = 4
+
+# Seconds after which a listing counts half in the age weighted estimate
+AGE_HALF_LIFE = 24 * 60 * 60
+
+EPOCH_ORDINAL = date(1970, 1, 1).toordinal()
+
+
+class PriceStats(NamedTuple):
+    """Distribution of the chaos prices of the listings of a search"""
+
+    listings: int  # Listings the statistics are over, one per seller
+    outliers: int  # Listings trimmed before computing the rest
+    median: float
+    q1: float
+    q3: float
+    min_of_k: float  # Average of the MIN_OF_K cheapest listings
+    weighted: float  # Average with newer listings counting more
+
+    @property
+    def iqr(self) -> float:
+        return self.q3 - self.q1
+
+
+@lru_cache(maxsize=64)
+def get_epoch_day(text: str) -> int:
+    """Days since the epoch of a date like 2020-01-31"""
+    day = date(int(text[:4]), int(text[5:7]), int(text[8:10]))
+    return day.toordinal() - EPOCH_ORDINAL
+
+
+def parse_timestamp(text: str) -> int:
+    """Seconds since the epoch of a time of the trade API
+
+    Only reads the one format the API uses, "2020-01-31T12:00:00Z" (UTC),
+    which is a lot faster than strptime. Listings of a search are mostly
+    from the same few days, so the days are cached.
+    """
+    return (
+        get_epoch_day(text[:10]) * 86400
+        + int(text[11:13]) * 3600
+        + int(text[14:16]) * 60
+        + int(text[17:19])
+    )
+
+
+def get_listings(trade_info: list, rates: dict = DEFAULT_RATES):
+    """Chaos prices and listing times of fetched trade results
+
+    Only the first listing of every seller counts, results come sorted by
+    price so that is their cheapest one.
+
+    :param trade_info: Results of web.fetch
+    :param rates: Chaos value of a currency by its trade API id
+    :return: tuple of the list of chaos prices and the list of the times
+        they were listed at, in seconds since the epoch
+    """
+    seen = set()
+    prices = []
+    times = []
+    for trade in trade_info:
+        listing = trade["listing"]
+        price = listing["price"]
+        account = listing["account"]["name"]
+        if not price or account in seen:
+            continue
+        seen.add(account)
+
+        rate = rates.get(price["currency"])
+        if rate is None:
+            continue
+        prices.append(price["amount"] * rate)
+        times.append(parse_timestamp(listing["indexed"]))
+    return prices, times
+
+
+def percentile(ordered: list, q: float) -> float:
+    """Percentile of sorted values, interpolated like numpy.percentile"""
+    position = (len(ordered) - 1) * q / 100
+    low = floor(position)
+    high = min(low + 1, len(ordered) - 1)
+    return ordered[low] + (ordered[high] - ordered[low]) * (position - low)
+
+
+def get_stats_python(prices: list, ages: list) -> PriceStats:
+    listings = sorted(zip(prices, ages))
+    ordered = [price for price, _ in listings]
+
+    outliers = 0
+    if len(ordered) >= MIN_TO_TRIM:
+        q1 = percentile(ordered, 25)
+        q3 = percentile(ordered, 75)
+        fence = OUTLIER_FENCE * (q3 - q1)
+        listings = [
+            (price, age)
+            for price, age in listings
+            if q1 - fence <= price <= q3 + fence
+        ]
+        outliers = len(ordered) - len(listings)
+        ordered = [price for price, _ in listings]
+
+    cheapest = ordered[:MIN_OF_K]
+    weights = [0.5 ** (age / AGE_HALF_LIFE) for _, age in listings]
+    weighted = sum(p * w for p, w in zip(ordered, weights)) / sum(weights)
+    return PriceStats(
+        len(ordered),
+        outliers,
+        percentile(ordered, 50),
+        percentile(ordered, 25),
+        percentile(ordered, 75),
+        sum(cheapest) / len(cheapest),
+        weighted,
+    )
+
+
+def get_stats_numpy(prices: list, ages: list) -> PriceStats:
+    prices = numpy.asarray(prices, dtype=float)
+    ages = numpy.asarray(ages, dtype=float)
+
+    outliers = 0
+    if len(prices) >= MIN_TO_TRIM:
+        q1, q3 = numpy.percentile(prices, [25, 75])
+        fence = OUTLIER_FENCE * (q3 - q1)
+        keep = (prices >= q1 - fence) & (prices <= q3 + fence)
+        outliers = int(len(prices) - keep.sum())
+        prices = prices[keep]
+        ages = ages[keep]
+
+    q1, median, q3 = numpy.percentile(prices, [25, 50, 75])
+    k = min(MIN_OF_K, len(prices))
+    cheapest = numpy.partition(prices, k - 1)[:k]
+    weights = numpy.exp2(-ages / AGE_HALF_LIFE)
+    return PriceStats(
+        len(prices),
+        outliers,
+        float(median),
+        float(q1),
+        float(q3),
+        float(cheapest.mean()),
+        float((prices * weights).sum() / weights.sum()),
+    )
+
+
+def get_price_stats(trade_info: list, rates: dict = DEFAULT_RATES):
+    """Statistics over the chaos prices of fetched trade results
+
+    Uses NumPy when it is installed, plain Python otherwise.
+
+    :param trade_info: Results of web.fetch
+    :param rates: Chaos value of a currency by its trade API id
+    :return: PriceStats, or None if no listing has a price in chaos
+    """
+    prices, times = get_listings(trade_info, rates)
+    if not prices:
+        return None
+
+    # Only how much older a listing is than the others matters to the
+    # weights. Counting from the newest keeps the weights of listings
+    # that are years old from all rounding down to zero.
+    newest = max(times)
+    ages = [newest - t for t in times]
+    if numpy is not None:
+        return get_stats_numpy(prices, ages)
+    return get_stats_python(prices, ages)
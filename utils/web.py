@@ -1,25 +1,36 @@
 import base64
+import email.utils
+import hashlib
+import json
 import logging
 import os
 import pathlib
 import re
 import subprocess
 import sys
+import time
 import traceback
 import webbrowser
 import zipfile
+from datetime import datetime, timezone
 from itertools import chain
+from threading import Event, RLock, Thread
 
 import requests
-from tqdm import tqdm
 
-from item.itemModifier import ItemModifier, ItemModifierType
-from utils import config
-from utils.config import RELEASE_URL, VERSION
+from item.itemModifier import EMPTY_OPTIONS, ItemModifier, ItemModifierType
+from utils import config, journal
+from utils.config import VERSION
 from utils.exceptions import InvalidAPIResponseException
 
+UPDATE_CACHE = "update_check.json"
+UPDATE_ZIP = "Path-of-Accounting.zip"
+
 ninja_bases = []
 
+# Functions that empty caches holding data of the current league
+league_caches = []
+
 item_cache = []
 map_cache = set()
 
@@ -27,8 +38,61 @@ mod_list = []
 mod_list_dict_id = {}
 mod_list_dict_text = {}
 
-# contains all mods there exist more than 1 off
-dup_mod_list_text = {}
+# Held while filling the caches above, so that items parsed on several
+# threads at once never see a half built cache.
+index_lock = RLock()
+
+# Seconds to wait when rate limited and the API does not say how long
+RATE_LIMIT_WAIT = 5
+
+# Longest we block a lookup for a rate limit, when asked to wait longer
+# we give up on the request instead
+MAX_RATE_LIMIT_WAIT = 60
+
+
+def get_retry_after(r) -> float:
+    """Seconds a rate limited response tells us to wait
+
+    Retry-After is either a number of seconds or a HTTP date.
+
+    :param r: The rate limited response
+    :return: Seconds to wait, RATE_LIMIT_WAIT if the API does not say
+    """
+    value = r.headers.get("Retry-After")
+    if value is None:
+        return RATE_LIMIT_WAIT
+    try:
+        return max(float(value), 0.0)
+    except ValueError:
+        pass
+    try:
+        retry_at = email.utils.parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return RATE_LIMIT_WAIT
+    if retry_at.tzinfo is None:
+        retry_at = retry_at.replace(tzinfo=timezone.utc)
+    return max((retry_at - datetime.now(timezone.utc)).total_seconds(), 0.0)
+
+
+def rate_limit_wait(r) -> bool:
+    """Wait out a HTTP 429 response before retrying
+
+    :param r: The rate limited response
+    :return: Whether to retry, False if the wait is over
+        MAX_RATE_LIMIT_WAIT
+    """
+    wait = get_retry_after(r)
+    if wait > MAX_RATE_LIMIT_WAIT:
+        logging.error(
+            "[!] Rate limited by the trade API for %d seconds, "
+            "try again later.",
+            wait,
+        )
+        return False
+    logging.info(f"[!] Rate limited, retrying in {wait} seconds.")
+    journal.record_rate_limit_wait(wait)
+    time.sleep(wait)
+    return True
 
 
 def search_url(league: str) -> str:
@@ -41,9 +105,24 @@ def exchange_url(league: str) -> str:
     return f"https://www.pathofexile.com/api/trade/exchange/{league}"
 
 
-def post_request(addr: str, timeout: int, max_tries: int, json=None):
+def post_request(
+    addr: str, timeout: int, max_tries: int, json=None, data: bytes = None
+):
+    """POST to the given address
+
+    :param json: Body to encode as JSON
+    :param data: Body that is JSON encoded already, see item.query
+    """
+    headers = None
+    if data is not None:
+        headers = {"Content-Type": "application/json"}
     try:
-        r = requests.post(addr, timeout=timeout, json=json)
+        r = requests.post(
+            addr, timeout=timeout, json=json, data=data, headers=headers
+        )
+
+        if r.status_code == 429 and max_tries > 0 and rate_limit_wait(r):
+            return post_request(addr, timeout, max_tries - 1, json, data)
 
         if r.status_code != 200:
             logging.error(
@@ -64,7 +143,7 @@ def post_request(addr: str, timeout: int, max_tries: int, json=None):
                 + str(max_tries)
                 + " more times"
             )
-            return post_request(addr, timeout, max_tries - 1, json)
+            return post_request(addr, timeout, max_tries - 1, json, data)
         else:
             logging.info("Could not connect to: " + site + ".")
             return None
@@ -75,6 +154,9 @@ def get_request(addr: str, timeout: int, max_tries: int, stream=False):
     try:
         r = requests.get(addr, timeout=timeout, stream=stream)
 
+        if r.status_code == 429 and max_tries > 0 and rate_limit_wait(r):
+            return get_request(addr, timeout, max_tries - 1, stream)
+
         if r.status_code != 200:
             logging.error(
                 f"[!] Trade result retrieval failed: HTTP {r.status_code}! "
@@ -100,15 +182,15 @@ def get_request(addr: str, timeout: int, max_tries: int, stream=False):
             return None
 
 
-def exchange_currency(query: dict, league: str) -> dict:
+def exchange_currency(query: bytes, league: str) -> dict:
     """Queries the Exchange API and returns the results
 
-    :param query: A JSON query to send to the currency trade api
+    :param query: A JSON encoded query to send to the currency trade api
     :param league: the league to search in
     :return results: return a JSON object with the amount of items found and a key to get
      item details
     """
-    results = post_request(exchange_url(league), 10, 2, query)
+    results = post_request(exchange_url(league), 10, 2, data=query)
     if "error" in results.keys():
         msg = results["error"]["message"]
         logging.info(f"[Error] {msg}")
@@ -116,15 +198,15 @@ def exchange_currency(query: dict, league: str) -> dict:
     return results
 
 
-def query_item(query: dict, league: str) -> dict:
+def query_item(query: bytes, league: str) -> dict:
     """Queries the API and returns the results
 
-    :param query: A JSON query to send to the trade api
+    :param query: A JSON encoded query to send to the trade api
     :param league: the league to search in
     :return results: return a JSON object with the amount of items found and a key to get
      item details
     """
-    results = post_request(search_url(league), 10, 2, query)
+    results = post_request(search_url(league), 10, 2, data=query)
 
     if "error" in results.keys():
         msg = results["error"]["message"]
@@ -195,37 +277,29 @@ def get_item_modifiers_by_text(element: tuple) -> ItemModifier:
     :return: ItemModifier that matches
     """
     global mod_list_dict_text
-    global dup_mod_list_text
     if len(mod_list_dict_text) == 0:
-        item_modifiers = get_item_modifiers()
-        found = {}
-        for mod in item_modifiers:
-            if "Allocates # (Additional)" in mod.text:  # Gives no results ATM
-                continue
-            if (mod.text, mod.type) in mod_list_dict_text:
-                if not (mod.text, mod.type) in found:
-                    found[(mod.text, mod.type)] = {}
-                found[(mod.text, mod.type)][mod.id] = ""
-                found[(mod.text, mod.type)][
-                    mod_list_dict_text[(mod.text, mod.type)].id
-                ] = ""
-
-            mod_list_dict_text[(mod.text, mod.type)] = mod
-        for key, value in found.items():
-            dup_mod_list_text[key] = ""
+        with index_lock:
+            if len(mod_list_dict_text) == 0:
+                build_text_index()
     if element in mod_list_dict_text:
         return mod_list_dict_text[element]
 
 
-def is_duplicate_mod_type(mod):
-    """
-    Checks if a mod exist in the duplicate mod list
-    Return True if it does, false if it does not
+def build_text_index():
+    """Fill mod_list_dict_text from the mod list
+
+    Mods that share their text with another mod of the same type are
+    marked in the mod database, see item.modDatabase.
     """
-    global dup_mod_list_text
-    if (mod.text, mod.type) in dup_mod_list_text:
-        return True
-    return False
+    global mod_list_dict_text
+    item_modifiers = get_item_modifiers()
+    text_index = {}
+    for mod in item_modifiers:
+        if "Allocates # (Additional)" in mod.text:  # Gives no results ATM
+            continue
+        text_index[(mod.text, mod.type)] = mod
+    # Only publish the finished dict, readers check mod_list_dict_text
+    mod_list_dict_text = text_index
 
 
 def get_item_modifiers_by_id(element: str) -> ItemModifier:
@@ -239,18 +313,23 @@ def get_item_modifiers_by_id(element: str) -> ItemModifier:
     """
     global mod_list_dict_id
     if len(mod_list_dict_id) == 0:
-        item_modifiers = get_item_modifiers()
-        mod_list_dict_id = {e.id: e for e in item_modifiers}
+        with index_lock:
+            if len(mod_list_dict_id) == 0:
+                item_modifiers = get_item_modifiers()
+                mod_list_dict_id = {e.id: e for e in item_modifiers}
     if element in mod_list_dict_id:
         return mod_list_dict_id[element]
 
 
-def build_from_json(blob: dict) -> ItemModifier:
+def build_from_json(blob: dict, strings: dict) -> ItemModifier:
     """From the stats API construct ItemModifier objects for given entry
 
     :param blob: A modifier found in the stats API
+    :param strings: Texts seen so far, the same text is shared by the
+        explicit, implicit, crafted... versions of a mod
     :return: ItemModifier object for the given modifier
     """
+    options = EMPTY_OPTIONS
     if "option" in blob:
         # If the given modifier has an option section, add it.
         # This is necessary for the "Allocates #" modifier that
@@ -258,17 +337,8 @@ def build_from_json(blob: dict) -> ItemModifier:
         if "options" in blob["option"]:
             options = {}
             for i in blob["option"]["options"]:
-                options[i["text"]] = i["id"]
-
-            t = blob["text"].rstrip()
-            t = re.sub(r"\(([^)]*)\)", "", t)
-            t = t.rstrip()
-            return ItemModifier(
-                id=blob["id"],
-                text=t,
-                options=options,
-                type=ItemModifierType(blob["type"].lower()),
-            )
+                text = strings.setdefault(i["text"], i["text"])
+                options[text] = i["id"]
 
     t = blob["text"].rstrip()
     t = re.sub(r"\(([^)]*)\)", "", t)
@@ -276,9 +346,10 @@ def build_from_json(blob: dict) -> ItemModifier:
 
     return ItemModifier(
         id=blob["id"],
-        text=t,
+        text=strings.setdefault(t, t),
         type=ItemModifierType(blob["type"].lower()),
-        options={},
+        options=options,
+        local="(Local)" in blob["text"],
     )
 
 
@@ -288,16 +359,22 @@ def get_item_modifiers() -> tuple:
     :return: tuple of all available modifiers
     """
     global mod_list
+    journal.record_cache("mods", bool(mod_list))
     if mod_list:
         return mod_list
-    else:
+    with index_lock:
+        if mod_list:
+            return mod_list
         json_blob = get_request(
             "https://www.pathofexile.com/api/trade/data/stats", 10, 3
         )
         try:
+            mods = []
+            strings = {}
             for modType in json_blob["result"]:
                 for mod in modType["entries"]:
-                    mod_list.append(build_from_json(mod))
+                    mods.append(build_from_json(mod, strings))
+            mod_list = mods
 
             logging.info(f"[*] Loaded {len(mod_list)} item mods.")
             return mod_list
@@ -306,84 +383,315 @@ def get_item_modifiers() -> tuple:
             return None
 
 
-def find_latest_update():
-    """Search both local and remote versions, if different, prompt for update."""
+def get_index_snapshot() -> dict:
+    """Everything needed to parse items without going online.
+
+    Used to seed worker processes that parse items, see item.batch.
+
+    :return: dict of the mod and item caches and their lookup dicts
+    """
+    # Make sure the lookup dicts are built, so workers don't have to
+    get_item_modifiers_by_text(None)
+    get_item_modifiers_by_id(None)
+    get_items()
+    return {
+        "mod_list": mod_list,
+        "mod_list_dict_id": mod_list_dict_id,
+        "mod_list_dict_text": mod_list_dict_text,
+        "item_cache": item_cache,
+    }
+
+
+def load_index_snapshot(snapshot: dict):
+    """Use the caches of get_index_snapshot instead of downloading them"""
+    global mod_list
+    global mod_list_dict_id
+    global mod_list_dict_text
+    global item_cache
+    mod_list = snapshot["mod_list"]
+    mod_list_dict_id = snapshot["mod_list_dict_id"]
+    mod_list_dict_text = snapshot["mod_list_dict_text"]
+    item_cache = snapshot["item_cache"]
+
+
+def read_update_cache():
+    """Read the result of the last release check from disk
+
+    :return: (time of the check, release) or (0, None)
+    """
+    try:
+        with open(UPDATE_CACHE) as f:
+            cache = json.load(f)
+        return cache["checked"], cache["release"]
+    except Exception:
+        return 0, None
+
+
+def write_update_cache(release):
     try:
-        # Get the list of releases from github, choose newest (even pre-release)
-        remote = get_request(RELEASE_URL, 10, 2)[0]
+        with open(UPDATE_CACHE, "w") as f:
+            json.dump({"checked": time.time(), "release": release}, f)
+    except OSError:
+        logging.debug("Could not write the update cache.")
+
+
+def get_latest_release():
+    """Get the newest release on github, even pre-releases.
+
+    The result is cached on disk and github is only asked again once the
+    configured update check interval has passed.
+
+    :return: dict with the release's tag_name and assets, or None
+    """
+    checked, release = read_update_cache()
+    interval = float(config.UPDATE_CHECK_INTERVAL) * 60 * 60
+    if release and time.time() - checked < interval:
+        return release
+
+    releases = get_request(config.RELEASE_URL, 10, 2)
+    if not isinstance(releases, list) or not releases:
+        # Fall back to the outdated result, if we have one
+        return release
+
+    remote = releases[0]
+    release = {
+        "tag_name": remote["tag_name"],
+        "assets": [
+            {
+                "name": a["name"],
+                "browser_download_url": a["browser_download_url"],
+                "size": a.get("size", 0),
+                "digest": a.get("digest"),
+            }
+            for a in remote["assets"]
+        ],
+    }
+    write_update_cache(release)
+    return release
+
+
+class UpdateCheck(Thread):
+    """Look for a new release in the background
+
+    The user is only asked whether to update once the hotkeys are armed,
+    and on this thread, so the hotkeys keep working while they decide.
+    """
 
-        if not remote:
-            logging.error("[!] Could not check for new update!")
-            return
+    def __init__(self):
+        super().__init__(daemon=True)
+        self.release = None
+        # Set once the user may be asked about an update
+        self.armed = Event()
+        # Set once an update was installed and we should exit
+        self.installed = Event()
 
-        # local version
-        local = VERSION
+    def run(self):
+        try:
+            self.release = get_latest_release()
+        except Exception:
+            logging.debug(traceback.format_exc())
+        self.armed.wait()
+        if find_latest_update(self.release):
+            self.installed.set()
+
+
+def start_update_check() -> UpdateCheck:
+    """Start checking for a new release without blocking startup"""
+    check = UpdateCheck()
+    check.start()
+    return check
+
+
+def get_checksum(release, asset):
+    """Find the expected sha256 of a release asset.
+
+    Github reports a digest for newer uploads, older releases may ship
+    a "<name>.sha256" file next to the zip instead.
+
+    :return: hex digest, or None if the release has no checksum
+    """
+    digest = asset.get("digest")
+    if digest and digest.startswith("sha256:"):
+        return digest[7:].lower()
+
+    for a in release["assets"]:
+        if a["name"] == asset["name"] + ".sha256":
+            try:
+                r = requests.get(a["browser_download_url"], timeout=10)
+                return r.text.split()[0].lower()
+            except Exception:
+                return None
+    return None
+
+
+def get_part_file(release) -> str:
+    """File a release is downloaded into until it is complete"""
+    return f"{UPDATE_ZIP}.{release['tag_name']}.part"
+
+
+def remove_stale_parts(keep):
+    """Delete unfinished downloads of other releases"""
+    for path in pathlib.Path().glob(UPDATE_ZIP + ".*.part"):
+        if path.name != keep:
+            path.unlink()
+
+
+def download_update(release, max_tries=3) -> bool:
+    """Download the zip of the given release.
+
+    The download is streamed into a .part file of the release that is
+    resumed on the next try instead of starting over, and the finished
+    file is checked against the release's checksum. Releases without a
+    checksum are always downloaded from the start, as a resumed file
+    could not be checked.
+
+    :param release: Release as returned by get_latest_release
+    :param max_tries: How often to resume a broken download
+    :return: True if the zip was downloaded and verified
+    """
+    from tqdm import tqdm
+
+    asset = release["assets"][0]
+    part = get_part_file(release)
+    remove_stale_parts(part)
+    checksum = get_checksum(release, asset)
+
+    for _ in range(max_tries):
+        if not checksum and os.path.exists(part):
+            os.remove(part)
+        done = os.path.getsize(part) if os.path.exists(part) else 0
+        headers = {"Range": f"bytes={done}-"} if done else {}
+        try:
+            r = requests.get(
+                asset["browser_download_url"],
+                headers=headers,
+                timeout=10,
+                stream=True,
+            )
+        except requests.RequestException:
+            logging.info("[!] Download interrupted, resuming.")
+            continue
+
+        if r.status_code == 416:
+            # Already have all of it, the checksum tells if that is true
+            break
+        if r.status_code != 206:
+            if not r.ok:
+                logging.error(
+                    "[!] Error, could not download the update (HTTP %d).",
+                    r.status_code,
+                )
+                return False
+            # Server does not support resuming, start over
+            done = 0
+
+        total_size = done + int(r.headers.get("content-length", 0))
+        timer = tqdm(
+            total=total_size, initial=done, unit="iB", unit_scale=True
+        )
+        try:
+            with open(part, "ab" if done else "wb") as f:
+                for data in r.iter_content(1024 * 64):
+                    timer.update(len(data))
+                    f.write(data)
+        except requests.RequestException:
+            logging.info("[!] Download interrupted, resuming.")
+            continue
+        finally:
+            timer.close()
+        break
+    else:
+        logging.error("[!] Error, could not download the update.")
+        return False
+
+    if checksum:
+        sha = hashlib.sha256()
+        with open(part, "rb") as f:
+            for block in iter(lambda: f.read(1024 * 1024), b""):
+                sha.update(block)
+        if sha.hexdigest() != checksum:
+            os.remove(part)
+            logging.error(
+                "[!] Error, the downloaded update is corrupted. Please try again."
+            )
+            return False
+    else:
+        logging.info("[!] Release has no checksum, skipping verification.")
+
+    os.replace(part, UPDATE_ZIP)
+    return True
+
+
+def find_latest_update(remote) -> bool:
+    """Prompt for an update if there is a newer version.
+
+    Waits for the user to answer, so run it off the main thread.
+
+    :param remote: Latest release, as returned by get_latest_release
+    :return: True if an update was installed and we should exit
+    """
+    if not remote:
+        logging.error("[!] Could not check for new update!")
+        return False
+
+    try:
         # Check if the same-
-        # print(remote["tag_name"], local)
-        if float(local.replace("v", "")) < float(
+        if float(VERSION.replace("v", "")) >= float(
             remote["tag_name"].replace("v", "")
         ):
+            return False
+
+        logging.info(
+            "[!] You are not running the latest version of Path of Accounting. Would you like to update? (y/n)"
+        )
+        # Keep going till user makes a valid choice
+        while True:
+            user_choice = input()
+            if user_choice.lower() == "y":
+                break
+            elif user_choice.lower() == "n":
+                return False
+            else:
+                logging.error(
+                    "I did not understand your response. Please user either y or n."
+                )
+
+        if os.name != "nt":
             logging.info(
-                "[!] You are not running the latest version of Path of Accounting. Would you like to update? (y/n)"
+                "Auto updates are not supported on non windows systems at the moment."
             )
-            # Keep going till user makes a valid choice
-            choice_made = False
-            while not choice_made:
-                user_choice = input()
-                if user_choice.lower() == "y":
-                    choice_made = True
-                    if os.name == "nt":
-                        # Get the sole zip url
-                        url = remote["assets"][0]["browser_download_url"]
-                        r = get_request(url, 10, 2, True)
-                        # Set up a progress bar
-                        total_size = int(r.headers.get("content-length", 0))
-                        block_size = 1024
-                        timer = tqdm(
-                            total=total_size, unit="iB", unit_scale=True
-                        )
-
-                        # Write the file
-                        with open("Path-of-Accounting.zip", "wb") as f:
-                            for data in r.iter_content(block_size):
-                                timer.update(len(data))
-                                f.write(data)
-                        timer.close()
-
-                        # This means data got lost somewhere...
-                        if total_size != 0 and timer.n != total_size:
-                            logging.error(
-                                "[!] Error, something went wrong while downloading the file."
-                            )
-                        else:
-                            # Unzip it and tell the user where we unzipped it to.
-                            with zipfile.ZipFile(
-                                "Path-of-Accounting.zip", "wb+"
-                            ) as zip_file:
-                                zip_file.extractall()
-                            logging.info(
-                                f"[*] Extracted zip file to: {pathlib.Path().absolute()}"
-                            )
-
-                        # subprocess.Popen(f"{pathlib.Path().absolute()}\\Accounting.exe")
-                        sys.exit()
-                    else:
-                        logging.info(
-                            "Auto updates are not supported on non windows systems at the moment."
-                        )
-                        logging.info(
-                            "Please clone/pull the repo at https://github.com/Ethck/Path-of-Accounting.git"
-                        )
-
-                elif user_choice.lower() == "n":
-                    choice_made = True
-                else:
-                    logging.error(
-                        "I did not understand your response. Please user either y or n."
-                    )
+            logging.info(
+                "Please clone/pull the repo at https://github.com/Ethck/Path-of-Accounting.git"
+            )
+            return False
+
+        if not download_update(remote):
+            return False
+
+        # Unzip it and tell the user where we unzipped it to.
+        with zipfile.ZipFile(UPDATE_ZIP) as zip_file:
+            zip_file.extractall()
+        logging.info(f"[*] Extracted zip file to: {pathlib.Path().absolute()}")
+        # subprocess.Popen(f"{pathlib.Path().absolute()}\\Accounting.exe")
+        return True
     except Exception:
         traceback.print_exc()
         logging.error("[!] Could not check for new update!")
+        return False
+
+
+def league_cache(func):
+    """Register a function that clears a per-league cache"""
+    league_caches.append(func)
+    return func
+
+
+def clear_league_caches():
+    """Forget everything we loaded for the previous league"""
+    global ninja_bases
+    ninja_bases = []
+    for func in league_caches:
+        func()
 
 
 def get_ninja_bases(league: str):
@@ -426,14 +734,19 @@ def get_items() -> dict:
     :return: cache that contains all items
     """
     global item_cache
-    if not item_cache:
+    journal.record_cache("items", bool(item_cache))
+    if item_cache:
+        return item_cache
+    with index_lock:
+        if item_cache:
+            return item_cache
         try:
             items = get_request(
                 "https://www.pathofexile.com/api/trade/data/items", 10, 3
             )
-            item_cache = items["result"]
-            for i in item_cache:
+            for i in items["result"]:
                 i["entries"].sort(key=lambda x: len(x["type"]), reverse=True)
+            item_cache = items["result"]
         except Exception:
             return None
     return item_cache